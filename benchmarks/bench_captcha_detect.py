@@ -0,0 +1,130 @@
+"""
+Compare the old per-class captcha detection, one DETECT_SCRIPT evaluation
+per captcha class plus a DATA_SCRIPT, with the combined single-evaluation
+detector on the fixture pages in tests/fixtures/captcha, and with a
+detection cache hit where the page only computes the widget fingerprint.
+
+Remote CDP sessions pay a network round trip per evaluation; `--rtt-ms`
+adds that delay to every evaluate call to show its effect locally.
+
+Usage:
+    python -m benchmarks.bench_captcha_detect [--runs 20] [--rtt-ms 0]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.captchas import (
+    DETECT_CAPTCHA_SCRIPT,
+    DETECTION_PRIORITY,
+    FRAME_SCAN_DEPTH,
+    FunCaptcha,
+    GeetestV3,
+    GeetestV4,
+    HCaptcha,
+    ReCaptchaV2,
+    ReCaptchaV3,
+    Turnstile,
+)
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "captcha"
+)
+# Same order as CaptchaSolver.captcha_classes used to probe them
+LEGACY_CLASSES = {
+    "recaptcha_v2": ReCaptchaV2,
+    "recaptcha_v3": ReCaptchaV3,
+    "hcaptcha": HCaptcha,
+    "turnstile": Turnstile,
+    "funcaptcha": FunCaptcha,
+    "geetest_v3": GeetestV3,
+    "geetest_v4": GeetestV4,
+}
+
+
+class RoundTrips:
+    """Counts evaluate calls and adds a simulated network round trip to each"""
+
+    def __init__(self, page, rtt: float):
+        self.page = page
+        self.rtt = rtt
+        self.calls = 0
+
+    async def evaluate(self, script, arg=None):
+        self.calls += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return await self.page.evaluate(script, arg)
+
+
+async def legacy_detect(page: RoundTrips):
+    for name, captcha_class in LEGACY_CLASSES.items():
+        try:
+            if await page.evaluate(captcha_class.DETECT_SCRIPT):
+                return name, await page.evaluate(captcha_class.DATA_SCRIPT)
+        except Exception:
+            # The old DATA_SCRIPTs throw when their selector does not match
+            return name, None
+    return None
+
+
+async def combined_detect(page: RoundTrips, known=None):
+    detected = await page.evaluate(
+        DETECT_CAPTCHA_SCRIPT,
+        [list(DETECTION_PRIORITY), FRAME_SCAN_DEPTH, list(known or [])],
+    )
+    if not detected:
+        return None
+    return ("cached" if detected.get("cached") else detected["type"]), detected
+
+
+async def measure(page: RoundTrips, detect, runs: int):
+    timings = []
+    result = None
+    page.calls = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = await detect(page)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), page.calls / runs, result
+
+
+async def main(runs: int, rtt_ms: float) -> None:
+    manager = BrowserManager()
+    try:
+        await manager.init_browser(headless=True)
+        page = RoundTrips(manager.page, rtt_ms / 1000)
+        for filename in sorted(os.listdir(FIXTURES_DIR)):
+            with open(os.path.join(FIXTURES_DIR, filename)) as f:
+                await manager.page.set_content(f.read())
+            legacy = await measure(page, legacy_detect, runs)
+            combined = await measure(page, combined_detect, runs)
+            cached = None
+            if combined[2]:
+                # Detection cache hit: the page only computes the fingerprint
+                known = [combined[2][1]["fingerprint"]]
+                cached = await measure(
+                    page, lambda page: combined_detect(page, known), runs
+                )
+            print(
+                f"{filename:<24} "
+                f"legacy p50 {legacy[0]:7.2f} ms ({legacy[1]:.0f} evals) "
+                f"-> {legacy[2][0] if legacy[2] else None!s:<13} "
+                f"combined p50 {combined[0]:7.2f} ms ({combined[1]:.0f} eval) "
+                f"-> {combined[2][0] if combined[2] else None!s:<13} "
+                + (f"cache hit p50 {cached[0]:7.2f} ms" if cached else "")
+            )
+    finally:
+        await manager.close_browser()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.rtt_ms))
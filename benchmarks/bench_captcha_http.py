@@ -0,0 +1,85 @@
+"""
+Compare captcha provider request latency with a new aiohttp session per
+solve (the old CaptchaSolver behaviour) and with the shared pool.
+
+Each simulated solve is one createTask plus one getTaskResult against a
+local mock provider, so the numbers isolate connection setup cost.
+
+Usage:
+    python -m benchmarks.bench_captcha_http [--solves 500] [--concurrency 20] [--tls]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Optional
+
+import aiohttp
+
+from benchmarks.mock_captcha_provider import MockCaptchaProvider
+from om11.task.captcha_http import CaptchaHTTPPool
+
+
+async def solve(session: aiohttp.ClientSession, base_url: str) -> float:
+    started = time.perf_counter()
+    async with session.post(
+        f"{base_url}/createTask", json={"clientKey": "bench", "task": {}}, ssl=False
+    ) as resp:
+        task_id = (await resp.json())["taskId"]
+    async with session.post(
+        f"{base_url}/getTaskResult",
+        json={"clientKey": "bench", "taskId": task_id},
+        ssl=False,
+    ) as resp:
+        assert (await resp.json())["status"] == "ready"
+    return time.perf_counter() - started
+
+
+async def run(
+    base_url: str, solves: int, concurrency: int, pool: Optional[CaptchaHTTPPool]
+) -> List[float]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with slots:
+            if pool is not None:
+                return await solve(pool.session(), base_url)
+            async with aiohttp.ClientSession() as session:
+                return await solve(session, base_url)
+
+    return await asyncio.gather(*(one() for _ in range(solves)))
+
+
+def report(name: str, latencies: List[float], elapsed: float, stats: dict) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95)]
+    print(
+        f"{name:12} p50 {statistics.median(ordered) * 1000:6.2f} ms  "
+        f"p95 {p95 * 1000:6.2f} ms  {len(ordered) / elapsed:7.0f} solves/s  "
+        f"{stats['connections']} connections for {stats['requests']} requests"
+    )
+
+
+async def main(solves: int, concurrency: int, tls: bool) -> None:
+    for name in ("new-session", "pooled"):
+        provider = MockCaptchaProvider()
+        base_url = await provider.start(tls=tls)
+        pool = CaptchaHTTPPool() if name == "pooled" else None
+        try:
+            started = time.perf_counter()
+            latencies = await run(base_url, solves, concurrency, pool)
+            report(name, latencies, time.perf_counter() - started, provider.stats())
+        finally:
+            if pool is not None:
+                await pool.close()
+            await provider.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--solves", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tls", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.solves, args.concurrency, args.tls))
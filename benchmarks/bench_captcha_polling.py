@@ -0,0 +1,95 @@
+"""
+Compare fixed 5 and 1 second polling with the adaptive PollScheduler.
+
+Solves run in waves against a local mock provider whose tasks take
+`solve_time` plus up to `solve_jitter` seconds, so the scheduler can learn
+the distribution during the first waves.
+
+Usage:
+    python -m benchmarks.bench_captcha_polling [--waves 4] [--per-wave 50]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from benchmarks.mock_captcha_provider import MockCaptchaProvider
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_polling import PollScheduler
+
+
+async def create_task(base_url: str) -> int:
+    async with captcha_http.session().post(
+        f"{base_url}/createTask", json={"clientKey": "bench", "task": {}}
+    ) as resp:
+        return (await resp.json())["taskId"]
+
+
+def fetcher(base_url: str):
+    async def fetch(task_id: int):
+        async with captcha_http.session().post(
+            f"{base_url}/getTaskResult", json={"clientKey": "bench", "taskId": task_id}
+        ) as resp:
+            result = await resp.json()
+        return result["solution"] if result["status"] == "ready" else None
+
+    return fetch
+
+
+async def solve_fixed(base_url: str, interval: float) -> float:
+    started = time.monotonic()
+    task_id = await create_task(base_url)
+    fetch = fetcher(base_url)
+    while True:
+        await asyncio.sleep(interval)
+        if await fetch(task_id) is not None:
+            return time.monotonic() - started
+
+
+async def solve_scheduled(base_url: str, scheduler: PollScheduler) -> float:
+    started = time.monotonic()
+    task_id = await create_task(base_url)
+    await scheduler.wait("mock", "recaptcha_v2", task_id, fetcher(base_url))
+    return time.monotonic() - started
+
+
+async def run(name: str, args: argparse.Namespace) -> None:
+    provider = MockCaptchaProvider(args.solve_time, args.solve_jitter)
+    base_url = await provider.start()
+    scheduler = PollScheduler()
+    try:
+        for wave in range(1, args.waves + 1):
+            requests_before = provider.requests
+            if name.startswith("fixed"):
+                interval = float(name.split("-")[1].rstrip("s"))
+                solves = [solve_fixed(base_url, interval) for _ in range(args.per_wave)]
+            else:
+                solves = [
+                    solve_scheduled(base_url, scheduler) for _ in range(args.per_wave)
+                ]
+            latencies: List[float] = sorted(await asyncio.gather(*solves))
+            polls = provider.requests - requests_before - args.per_wave
+            print(
+                f"{name:9} wave {wave}: p50 {statistics.median(latencies):5.2f}s  "
+                f"p95 {latencies[int(len(latencies) * 0.95)]:5.2f}s  "
+                f"{polls / args.per_wave:4.1f} polls/solve"
+            )
+    finally:
+        await provider.stop()
+        await captcha_http.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    for name in ("fixed-5s", "fixed-1s", "adaptive"):
+        await run(name, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--waves", type=int, default=4)
+    parser.add_argument("--per-wave", type=int, default=50)
+    parser.add_argument("--solve-time", type=float, default=1.5)
+    parser.add_argument("--solve-jitter", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,274 @@
+"""
+Drive CaptchaSolver.solve end to end against the local mock provider at
+increasing concurrency and report throughput and tail latency.
+
+Every solve detects the widget on a fixture page from tests/fixtures/captcha,
+routes to a provider, creates the task, polls it and submits the token. The
+three providers get different log-normal solve times and failure rates, see
+PROFILES; `--time-scale` shrinks them, and the poll intervals with them, so
+a run takes seconds instead of minutes while keeping their proportions.
+
+`--provider-concurrency` caps every provider's solves at once, see
+captcha_solve_service, to show queueing under load. `--pageless` replaces
+the browser with pages that answer detection from the fixture's known
+result, for machines without Chromium. It measures the provider path only.
+
+Usage:
+    python -m benchmarks.bench_captcha_solve [--levels 1,4,16,64]
+        [--solves 64] [--time-scale 0.05] [--provider-concurrency N] [--pageless]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from benchmarks.mock_captcha_provider import MockCaptchaProvider, ProviderProfile
+from om11.task.captcha_cache import DetectionCache
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_manager import CaptchaSolver
+from om11.task.captcha_polling import (
+    DEFAULT_FIRST_POLL,
+    MAX_POLL_INTERVAL,
+    MIN_POLL_INTERVAL,
+    PollScheduler,
+    SolveTimeModel,
+)
+from om11.task.captcha_routing import ProviderRouter
+from om11.task.captcha_solve_service import CaptchaSolveService, ProviderLimit
+from om11.task.captcha_token_pool import TokenPool
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "captcha"
+)
+# Fixture pages every provider can solve, with what detection finds on them
+FIXTURES = {
+    "recaptcha_v2.html": ("recaptcha_v2", {"sitekey": "6LcV2fixture-sitekey"}),
+    "hcaptcha.html": ("hcaptcha", {"sitekey": "10000000-ffff-ffff-ffff-000000000001"}),
+    "recaptcha_v3.html": (
+        "recaptcha_v3",
+        {"sitekey": "6LcV3fixture-sitekey", "action": "signup"},
+    ),
+}
+# Real-world seconds, scaled down by --time-scale
+PROFILES = {
+    "capmonster": ProviderProfile(solve_time=12, spread=0.35, failure_rate=0.03),
+    "anticaptcha": ProviderProfile(solve_time=18, spread=0.5, failure_rate=0.02),
+    "capsolver": ProviderProfile(
+        solve_time=8, spread=0.6, failure_rate=0.08, error_rate=0.02
+    ),
+}
+API_KEYS = {name: f"bench-{name}" for name in PROFILES}
+
+
+def scaled_profiles(scale: float) -> Dict[str, ProviderProfile]:
+    return {
+        name: ProviderProfile(
+            solve_time=profile.solve_time * scale,
+            spread=profile.spread,
+            failure_rate=profile.failure_rate,
+            error_rate=profile.error_rate,
+            request_latency=profile.request_latency * scale,
+        )
+        for name, profile in PROFILES.items()
+    }
+
+
+class FixturePage:
+    """Stands in for a page in --pageless mode"""
+
+    def __init__(self, url: str, captcha_type: str, params: Dict[str, Any]):
+        self.url = url
+        self.detected = {
+            "type": captcha_type,
+            "params": {**params, "url": url},
+            "candidates": [captcha_type],
+            "fingerprint": f"{captcha_type}:{params['sitekey']}",
+        }
+
+    async def evaluate(self, script, arg=None):
+        # Detection gets the priority list, submits get the solution
+        if isinstance(arg, list):
+            return dict(self.detected)
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.providers: Counter = Counter()
+
+
+def recording_solver(page, recorder: Recorder, **kwargs) -> CaptchaSolver:
+    solver = CaptchaSolver(page, **kwargs)
+    call_service = solver._call_service
+
+    async def counted(service, *args):
+        solution = await call_service(service, *args)
+        recorder.providers[service] += 1
+        return solution
+
+    solver._call_service = counted
+    return solver
+
+
+async def solve_once(page, recorder: Recorder, **kwargs) -> None:
+    solver = recording_solver(page, recorder, **kwargs)
+    started = time.monotonic()
+    try:
+        solved = await solver.solve(api_keys=API_KEYS)
+    except Exception as e:
+        recorder.errors[str(e).split(":")[0]] += 1
+        return
+    if solved:
+        recorder.latencies.append(time.monotonic() - started)
+    else:
+        recorder.errors["not detected"] += 1
+
+
+def report(level: int, recorder: Recorder, wall: float, solves: int) -> None:
+    latencies = sorted(recorder.latencies)
+
+    def q(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    share = ", ".join(
+        f"{name} {count / max(1, sum(recorder.providers.values())):.0%}"
+        for name, count in recorder.providers.most_common()
+    )
+    if latencies:
+        tail = (
+            f"p50 {statistics.median(latencies):6.3f}s  "
+            f"p95 {q(0.95):6.3f}s  p99 {q(0.99):6.3f}s"
+        )
+    else:
+        tail = "no successful solves"
+    print(
+        f"concurrency {level:3}: {len(latencies) / wall:7.2f} solves/s  {tail}  "
+        f"errors {sum(recorder.errors.values())}/{solves} "
+        f"{dict(recorder.errors) or ''}  providers: {share}"
+    )
+
+
+async def serve_fixtures(port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_static("/", FIXTURES_DIR)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def open_pages(manager, count: int, base_url: str) -> List[Any]:
+    pages = []
+    fixtures = list(FIXTURES)
+    for i in range(count):
+        page = manager.page if i == 0 else await manager.page.context.new_page()
+        await page.goto(f"{base_url}/{fixtures[i % len(fixtures)]}")
+        pages.append(page)
+    return pages
+
+
+async def run_level(
+    level: int,
+    solves: int,
+    pages: List[Any],
+    scale: float,
+    urls: Dict[str, str],
+    provider_concurrency: Optional[int],
+) -> None:
+    # Fresh routing, polling and detection state so levels do not share history
+    scheduler = PollScheduler(
+        SolveTimeModel(
+            first_poll=DEFAULT_FIRST_POLL * scale,
+            min_interval=MIN_POLL_INTERVAL * scale,
+            max_interval=MAX_POLL_INTERVAL * scale,
+        ),
+        coalesce_window=0.25 * scale,
+    )
+    kwargs = {
+        "api_urls": urls,
+        "router": ProviderRouter(path=None),
+        "cache": DetectionCache(),
+        "pool": TokenPool(lambda key, api_key: None),
+        "scheduler": scheduler,
+        "solve_service": CaptchaSolveService(
+            {
+                name: ProviderLimit(concurrency=provider_concurrency)
+                for name in PROFILES
+                if provider_concurrency
+            }
+        ),
+    }
+    recorder = Recorder()
+    slots = asyncio.Semaphore(level)
+
+    async def worker(i: int) -> None:
+        async with slots:
+            await solve_once(pages[i % len(pages)], recorder, **kwargs)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker(i) for i in range(solves)))
+    report(level, recorder, time.monotonic() - started, solves)
+
+
+async def main(args: argparse.Namespace) -> None:
+    provider = MockCaptchaProvider(profiles=scaled_profiles(args.time_scale), seed=1)
+    await provider.start(port=args.port)
+    urls = provider.api_urls()
+    levels = [int(level) for level in args.levels.split(",")]
+    manager = fixtures = None
+    try:
+        if args.pageless:
+            # One page per concurrent solve, like one browser session each
+            entries = list(FIXTURES.items())
+            pages = [
+                FixturePage(f"http://fixtures.test/{name}", captcha_type, params)
+                for name, (captcha_type, params) in (
+                    entries[i % len(entries)] for i in range(max(levels))
+                )
+            ]
+        else:
+            from om11.task.browser_manager import BrowserManager
+
+            fixtures = await serve_fixtures(args.port + 1)
+            manager = BrowserManager()
+            await manager.init_browser(headless=True)
+            pages = await open_pages(
+                manager, max(levels), f"http://127.0.0.1:{args.port + 1}"
+            )
+        for level in levels:
+            await run_level(
+                level,
+                max(args.solves, level),
+                pages,
+                args.time_scale,
+                urls,
+                args.provider_concurrency,
+            )
+        print(f"mock provider: {provider.stats()}")
+    finally:
+        if manager is not None:
+            await manager.close_browser()
+        if fixtures is not None:
+            await fixtures.cleanup()
+        await captcha_http.close()
+        await provider.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", default="1,4,16,64")
+    parser.add_argument("--solves", type=int, default=64)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--provider-concurrency", type=int, default=None)
+    parser.add_argument("--pageless", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,94 @@
+"""
+Measure DOM snapshot size and extraction time on generated fixture pages.
+
+Usage:
+    python -m benchmarks.bench_dom_snapshot [--runs 10]
+"""
+
+import argparse
+import asyncio
+import statistics
+
+from om11.task.browser_manager import BrowserManager
+
+LOGIN_FORM = """
+<form id="login">
+  <label for="email">Email</label><input id="email" type="email">
+  <label for="password">Password</label><input id="password" type="password">
+  <input type="checkbox" name="remember"> Remember me
+  <button type="submit">Sign in</button>
+  <a href="/reset">Forgot password?</a>
+</form>
+"""
+
+
+def listing_page(rows: int) -> str:
+    cards = "".join(
+        f'<div class="card"><h2>Product {i}</h2><p>{"Description " * 20}</p>'
+        f'<a href="/product/{i}">Details</a><button data-testid="buy-{i}">Buy</button>'
+        f"</div>"
+        for i in range(rows)
+    )
+    return f"<nav><a href='/'>Home</a><input placeholder='Search'></nav>{cards}"
+
+
+def dashboard_page(widgets: int) -> str:
+    items = "".join(
+        f'<section style="display:{"none" if i % 3 == 0 else "block"}">'
+        f"<span>Widget {i}</span><select name='range-{i}'><option>7d</option></select>"
+        f"<div role='button' tabindex='0'>Refresh {i}</div></section>"
+        for i in range(widgets)
+    )
+    return f"<main>{items}</main>"
+
+
+FIXTURES = {
+    "login_form": LOGIN_FORM,
+    "listing_500": listing_page(500),
+    "dashboard_1000": dashboard_page(1000),
+}
+
+
+async def measure(manager: BrowserManager, name: str, html: str, runs: int) -> None:
+    await manager.page.set_content(html)
+    timings = []
+    snapshot = None
+    for _ in range(runs):
+        snapshot = await manager.extract_dom_snapshot()
+        timings.append(snapshot.extraction_ms)
+    stats = snapshot.stats()
+    # Measured here only, serializing the DOM is too slow for every snapshot
+    html_chars = await manager.page.evaluate(
+        "() => document.documentElement.outerHTML.length"
+    )
+
+    await manager.snapshot_dom(incremental=False)
+    await manager.page.evaluate(
+        "() => document.body.insertAdjacentHTML('beforeend',"
+        " '<button id=\"late\">Show more</button>')"
+    )
+    diff = await manager.snapshot_dom()
+
+    print(
+        f"{name:<16} elements={stats['elements']:<5} "
+        f"html={html_chars:>8} chars  "
+        f"snapshot={stats['snapshot_chars']:>7} chars (~{stats['snapshot_tokens']} tokens)  "
+        f"diff={len(diff):>4} chars  "
+        f"extract p50={statistics.median(timings):.1f}ms max={max(timings):.1f}ms"
+    )
+
+
+async def main(runs: int) -> None:
+    manager = BrowserManager()
+    try:
+        await manager.init_browser(headless=True)
+        for name, html in FIXTURES.items():
+            await measure(manager, name, html, runs)
+    finally:
+        await manager.close_browser()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    asyncio.run(main(parser.parse_args().runs))
@@ -0,0 +1,83 @@
+"""
+Stream multi-GB files from a local HTTP server and report throughput and memory.
+
+A sparse file is served so the source takes no disk space; the download
+itself is written for real.
+
+Usage:
+    python -m benchmarks.bench_downloads [--size-gb 2] [--parallel 2]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+from aiohttp import web
+
+from om11.task.downloads import Downloader
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def serve(source: str) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/{name}", lambda request: web.FileResponse(source))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8765).start()
+    return runner
+
+
+async def main(size_gb: float, parallel: int) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, "source.bin")
+        with open(source, "wb") as f:
+            f.truncate(int(size_gb * 1024**3))
+        runner = await serve(source)
+        downloader = Downloader(os.path.join(workdir, "out"), max_concurrent=parallel)
+        rss_before = peak_rss_mb()
+        try:
+            urls = [f"http://127.0.0.1:8765/file{i}.bin" for i in range(parallel)]
+            started = time.monotonic()
+            results = await downloader.download_many(urls)
+            elapsed = time.monotonic() - started
+            total = sum(r.size for r in results)
+            print(
+                f"downloaded {parallel} x {size_gb} GB in {elapsed:.1f}s "
+                f"({total / elapsed / 1024**2:.0f} MB/s), "
+                f"peak RSS {peak_rss_mb():.0f} MB (before {rss_before:.0f} MB)"
+            )
+            for result in results:
+                print(f"  {result.path}: {result.size} bytes sha256 {result.sha256}")
+                os.remove(result.path)
+
+            # Interrupt a transfer halfway and resume it with a Range request
+            task = asyncio.create_task(downloader.download(urls[0]))
+            while (
+                not os.path.exists(results[0].path + ".part")
+                or os.path.getsize(results[0].path + ".part") < (size_gb * 1024**3) / 2
+            ):
+                await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            resumed = await downloader.download(urls[0])
+            print(
+                f"resumed from {resumed.resumed_from} bytes in "
+                f"{resumed.elapsed:.1f}s, sha256 {resumed.sha256}"
+            )
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-gb", type=float, default=2)
+    parser.add_argument("--parallel", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_gb, args.parallel))
@@ -0,0 +1,124 @@
+"""
+Launch Chromium with each launch preset and report startup time and RSS.
+
+RSS is summed over every process the browser spawned, measured after the
+given number of pages has loaded a local fixture page.
+
+Usage:
+    python -m benchmarks.bench_launch_presets [--pages 5] [--preset dense-headless]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+from aiohttp import web
+from playwright.async_api import async_playwright
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.launch_presets import LAUNCH_PRESETS
+from om11.task.memory_watchdog import read_process_rss
+
+FIXTURE_PAGE = (
+    "<html><body>"
+    + "".join(
+        f"<div class='card'><h2>Item {i}</h2><p>{'text ' * 40}</p></div>"
+        for i in range(300)
+    )
+    + "<script>setInterval(() => document.title = Date.now(), 100)</script>"
+    + "</body></html>"
+)
+
+
+def descendants(pid: int) -> List[int]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, ppid follows the closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def browser_rss_mb(baseline: List[int]) -> float:
+    # Processes that existed before launch (the playwright driver) are excluded
+    pids = [pid for pid in descendants(os.getpid()) if pid not in baseline]
+    return sum(read_process_rss(pid) or 0 for pid in pids) / 1024**2
+
+
+async def serve() -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get(
+        "/", lambda request: web.Response(text=FIXTURE_PAGE, content_type="text/html")
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8766).start()
+    return runner
+
+
+async def measure(preset: str, pages: int) -> None:
+    manager = BrowserManager()
+    # Start the driver first so it is part of the baseline
+    manager._playwright = await async_playwright().start()
+    baseline = descendants(os.getpid())
+    try:
+        started = time.monotonic()
+        await manager.init_browser(preset=preset)
+        startup = time.monotonic() - started
+        idle_rss = browser_rss_mb(baseline)
+
+        await manager.open_url("http://127.0.0.1:8766/")
+        for _ in range(pages - 1):
+            page = await manager._page.context.new_page()
+            await page.goto("http://127.0.0.1:8766/", wait_until="load")
+        await asyncio.sleep(1)
+        loaded_rss = browser_rss_mb(baseline)
+        processes = len(descendants(os.getpid())) - len(baseline)
+        print(
+            f"{preset:15} startup {startup * 1000:6.0f} ms  "
+            f"idle {idle_rss:6.0f} MB  {pages} pages {loaded_rss:6.0f} MB  "
+            f"({loaded_rss / pages:5.0f} MB/page, {processes} processes)"
+        )
+    finally:
+        await manager.close_browser()
+
+
+async def main(presets: List[str], pages: int) -> None:
+    runner = await serve()
+    try:
+        for preset in presets:
+            await measure(preset, pages)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument(
+        "--preset",
+        action="append",
+        choices=sorted(LAUNCH_PRESETS),
+        help="Preset to measure, repeatable (default: all headless presets "
+        "plus the headful ones when a display is available)",
+    )
+    args = parser.parse_args()
+    presets = args.preset or [
+        name
+        for name, preset in LAUNCH_PRESETS.items()
+        if preset.headless or os.environ.get("DISPLAY")
+    ]
+    asyncio.run(main(presets, args.pages))
@@ -0,0 +1,217 @@
+"""
+Local stand-in for the CapMonster, Anti-Captcha and CapSolver
+createTask/getTaskResult APIs.
+
+Every provider is served under its own prefix (`/capmonster/createTask`,
+`/anticaptcha/createTask`, `/capsolver/createTask`), and CapMonster also at
+the root for the older benchmarks, so `api_urls()` can be handed straight
+to CaptchaSolver. Each provider has a ProviderProfile: a log-normal solve
+time distribution, a share of tasks that end unsolvable, a share of
+createTask calls rejected for lack of workers, and a per-request latency.
+
+The server counts requests and new TCP connections so benchmarks can show
+connection reuse. With `tls=True` a throwaway self-signed certificate is
+generated with the openssl CLI so TLS handshakes are part of the measurement.
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+PROVIDERS = ("capmonster", "anticaptcha", "capsolver")
+
+
+@dataclass
+class ProviderProfile:
+    # Median solve seconds, spread is the sigma of the log-normal around it
+    solve_time: float = 0.0
+    spread: float = 0.0
+    # Uniform extra seconds, kept for the fixed-latency benchmarks
+    jitter: float = 0.0
+    # Share of tasks that finish as unsolvable
+    failure_rate: float = 0.0
+    # Share of createTask calls rejected with a no-slot error
+    error_rate: float = 0.0
+    # Seconds added to every request, like a far away API
+    request_latency: float = 0.0
+
+    def sample_solve_time(self, rng: random.Random) -> float:
+        seconds = self.solve_time
+        if self.spread and seconds > 0:
+            seconds = rng.lognormvariate(math.log(seconds), self.spread)
+        return seconds + rng.uniform(0, self.jitter)
+
+
+@dataclass
+class MockTask:
+    provider: str
+    task: Dict[str, Any]
+    ready_at: float
+    fails: bool
+
+
+def mock_solution(task_type: str, task_id: Any) -> Dict[str, Any]:
+    """The solution fields each task type answers with"""
+    if "GeeTest" in task_type:
+        return {
+            "challenge": f"challenge-{task_id}",
+            "validate": f"validate-{task_id}",
+            "seccode": f"seccode-{task_id}|jordan",
+        }
+    if "Turnstile" in task_type or "FunCaptcha" in task_type:
+        return {"token": f"token-{task_id}"}
+    return {"gRecaptchaResponse": f"token-{task_id}"}
+
+
+class MockCaptchaProvider:
+    def __init__(
+        self,
+        solve_time: float = 0.0,
+        solve_jitter: float = 0.0,
+        profiles: Optional[Dict[str, ProviderProfile]] = None,
+        seed: Optional[int] = None,
+    ):
+        default = ProviderProfile(solve_time=solve_time, jitter=solve_jitter)
+        self.profiles = {name: default for name in PROVIDERS}
+        self.profiles.update(profiles or {})
+        self.rng = random.Random(seed)
+        self.tasks: Dict[Any, MockTask] = {}
+        self.requests = 0
+        self.connections = 0
+        self.created: Dict[str, int] = {name: 0 for name in PROVIDERS}
+        self._ids = itertools.count(1)
+        self._transports = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+
+    @property
+    def solve_time(self) -> float:
+        return self.profiles["capmonster"].solve_time
+
+    async def _count(self, request: web.Request, provider: str) -> None:
+        self.requests += 1
+        transport = request.transport
+        if transport not in self._transports:
+            self._transports.add(transport)
+            self.connections += 1
+        latency = self.profiles[provider].request_latency
+        if latency:
+            await asyncio.sleep(latency)
+
+    def _error(self, provider: str, code: str) -> web.Response:
+        error_ids = {"ERROR_KEY_DOES_NOT_EXIST": 1, "ERROR_NO_SLOT_AVAILABLE": 2}
+        if code == "ERROR_CAPTCHA_UNSOLVABLE":
+            error_id = 1 if provider == "capsolver" else 12
+        else:
+            error_id = error_ids.get(code, 1)
+        body = {"errorId": error_id, "errorCode": code, "errorDescription": code}
+        if provider == "capsolver" and code == "ERROR_CAPTCHA_UNSOLVABLE":
+            body["status"] = "failed"
+        return web.json_response(body)
+
+    async def create_task(self, request: web.Request) -> web.Response:
+        provider = request.match_info.get("provider", "capmonster")
+        await self._count(request, provider)
+        payload = await request.json()
+        if not payload.get("clientKey"):
+            return self._error(provider, "ERROR_KEY_DOES_NOT_EXIST")
+        profile = self.profiles[provider]
+        if self.rng.random() < profile.error_rate:
+            return self._error(provider, "ERROR_NO_SLOT_AVAILABLE")
+
+        # CapSolver uses uuid task ids, the others integers
+        task_id = str(uuid.uuid4()) if provider == "capsolver" else next(self._ids)
+        self.tasks[task_id] = MockTask(
+            provider=provider,
+            task=payload.get("task", {}),
+            ready_at=time.monotonic() + profile.sample_solve_time(self.rng),
+            fails=self.rng.random() < profile.failure_rate,
+        )
+        self.created[provider] += 1
+        return web.json_response({"errorId": 0, "taskId": task_id})
+
+    async def get_task_result(self, request: web.Request) -> web.Response:
+        provider = request.match_info.get("provider", "capmonster")
+        await self._count(request, provider)
+        payload = await request.json()
+        task = self.tasks.get(payload.get("taskId"))
+        if task is None or task.provider != provider:
+            return web.json_response(
+                {
+                    "errorId": 16,
+                    "errorCode": "ERROR_NO_SUCH_CAPCHA_ID",
+                    "errorDescription": "ERROR_NO_SUCH_CAPCHA_ID",
+                }
+            )
+        if time.monotonic() < task.ready_at:
+            return web.json_response({"errorId": 0, "status": "processing"})
+        if task.fails:
+            return self._error(provider, "ERROR_CAPTCHA_UNSOLVABLE")
+        return web.json_response(
+            {
+                "errorId": 0,
+                "status": "ready",
+                "solution": mock_solution(task.task.get("type", ""), payload["taskId"]),
+            }
+        )
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/createTask", self.create_task)
+        app.router.add_post("/getTaskResult", self.get_task_result)
+        app.router.add_post("/{provider:capmonster|anticaptcha|capsolver}/createTask", self.create_task)  # fmt: skip
+        app.router.add_post("/{provider:capmonster|anticaptcha|capsolver}/getTaskResult", self.get_task_result)  # fmt: skip
+        return app
+
+    async def start(self, port: int = 8767, tls: bool = False) -> str:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        ssl_context = self_signed_context() if tls else None
+        await web.TCPSite(
+            self._runner, "127.0.0.1", port, ssl_context=ssl_context
+        ).start()
+        self.base_url = f"{'https' if tls else 'http'}://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def api_urls(self) -> Dict[str, str]:
+        """Provider base urls for CaptchaSolver(api_urls=...)"""
+        return {name: f"{self.base_url}/{name}" for name in PROVIDERS}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "created": dict(self.created),
+        }
+
+
+def self_signed_context() -> ssl.SSLContext:
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                "-keyout", key, "-out", cert, "-days", "1",
+                "-subj", "/CN=127.0.0.1",
+            ],
+            check=True,
+            capture_output=True,
+        )  # fmt: skip
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+    return context
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from om11.api import APIHandler
@@ -10,14 +12,37 @@ __all__ = ["create_app"]
 
 class Config:
     USER_CONFIGS = "instance/user_configs"
+    # Memory watchdog: pages over either limit are recycled
+    MEMORY_WATCHDOG_INTERVAL = 30
+    MEMORY_HEAP_LIMIT_MB = 512
+    MEMORY_PROCESS_LIMIT_MB = 1536
+    CAPTCHA_API_KEYS = "instance/api_keys/api_keys.json"
+    # Sitekeys kept pre-solved, e.g. {"provider": "capmonster",
+    # "captcha_type": "recaptcha_v2", "sitekey": "...", "url": "https://...",
+    # "action": None, "max_tokens": 10}. The key comes from CAPTCHA_API_KEYS.
+    CAPTCHA_TOKEN_POOLS: list = []
+    # Per-provider limits for all sessions together, e.g.
+    # {"capsolver": {"concurrency": 10, "per_minute": 120}}. Unlisted
+    # providers run up to 50 solves at once without a rate limit.
+    CAPTCHA_PROVIDER_LIMITS: dict = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    api_handler: APIHandler = app.state.api_handler
+    await api_handler.startup()
+    try:
+        yield
+    finally:
+        await api_handler.shutdown()
 
 
 def create_app(app_config, redis_config) -> FastAPI:
-    app: FastAPI = FastAPI()
+    app: FastAPI = FastAPI(lifespan=lifespan)
     app.state.config = app_config
     # redis_client = init_redis(redis_config)
 
-    APIHandler(
+    app.state.api_handler = APIHandler(
         app=app,
         config=Config(),
         logger=logger,
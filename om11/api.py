@@ -1,13 +1,26 @@
-from typing import List
+import asyncio
+from contextlib import nullcontext
+from typing import List, Optional
 from logging import Logger
 
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 
 from om11.handle_command import handle_command
+from om11.metrics import metrics
+from om11.task.asset_cache import AssetCache
 from om11.task.browser_manager import BrowserManager
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_keys import api_key_store
+from om11.task.captcha_manager import provider_breakers, provider_router, token_pool
+from om11.task.captcha_solve_service import captcha_solve_service
+from om11.task.captcha_token_pool import DEFAULT_MAX_TOKENS, PoolKey
+from om11.task.memory_watchdog import MemoryWatchdog
+from om11.task.perf_timing import navigation_stats
+from om11.task.screenshots import ScreenshotOptions
 from om11.task.task_registry import register_tasks
 from om11.task.tasks import Tasks
+from om11.task.tracing import TraceStore, new_job_id
 from om11.user_manager_v1 import CaptchaConfig, CaptchaService, DBManager
 
 
@@ -21,8 +34,19 @@ class APIHandler:
             db_manager=self.db_manager,
             config=CaptchaConfig(),
         )
+        # Static assets are cached once for every user's browser
+        self.asset_cache = AssetCache()
+        # Playwright traces of commands run with tracing on
+        self.trace_store = TraceStore()
         # Dict to store browsers by user id
         self.user_browsers = {}  # dict: user_uuid -> browser_instance
+        self.memory_watchdog = MemoryWatchdog(
+            self.user_browsers,
+            heap_limit_mb=self.config.MEMORY_HEAP_LIMIT_MB,
+            process_limit_mb=self.config.MEMORY_PROCESS_LIMIT_MB,
+            interval=self.config.MEMORY_WATCHDOG_INTERVAL,
+            logger=self.logger,
+        )
 
         # Register routes
         self.app.add_api_route(
@@ -37,6 +61,63 @@ class APIHandler:
         self.app.add_api_route(
             "/api/check-agent-status/", self.check_browser_route, methods=["GET"]
         )
+        self.app.add_api_route(
+            "/api/screenshot/", self.screenshot_route, methods=["GET"]
+        )
+        self.app.add_api_route("/api/metrics/", self.metrics_route, methods=["GET"])
+        self.app.add_api_route(
+            "/api/perf_report/", self.perf_report_route, methods=["GET"]
+        )
+        self.app.add_api_route(
+            "/api/traces/{job_id}", self.trace_route, methods=["GET"]
+        )
+
+    async def startup(self) -> None:
+        self.memory_watchdog.start()
+        await asyncio.to_thread(provider_router.load)
+        api_key_store.path = self.config.CAPTCHA_API_KEYS
+        await api_key_store.refresh(force=True)
+        captcha_solve_service.configure(self.config.CAPTCHA_PROVIDER_LIMITS)
+        await self.configure_token_pool()
+        token_pool.start()
+        provider_breakers.start()
+
+    async def shutdown(self) -> None:
+        await self.memory_watchdog.stop()
+        await token_pool.stop()
+        await provider_breakers.stop()
+        for user_uuid, browser_manager in list(self.user_browsers.items()):
+            try:
+                await browser_manager.close_browser()
+            except Exception as e:
+                self.logger.warning(f"Failed to close browser of {user_uuid}: {e}")
+        self.user_browsers.clear()
+        await self.asset_cache.close()
+        await captcha_http.close()
+        await provider_router.persist(force=True)
+
+    async def configure_token_pool(self) -> None:
+        pools = self.config.CAPTCHA_TOKEN_POOLS
+        if not pools:
+            return
+        for entry in pools:
+            key = PoolKey(
+                provider=entry["provider"],
+                captcha_type=entry["captcha_type"],
+                sitekey=entry["sitekey"],
+                url=entry["url"],
+                action=entry.get("action"),
+            )
+            api_key = api_key_store.next_key(key.provider)
+            if not api_key:
+                self.logger.warning(f"No {key.provider} api key for token pool")
+                continue
+            token_pool.configure(
+                key,
+                api_key,
+                max_tokens=entry.get("max_tokens", DEFAULT_MAX_TOKENS),
+                min_tokens=entry.get("min_tokens", 0),
+            )
 
     async def get_browser_manager(self, user_uuid: str):
         if user_uuid in self.user_browsers:
@@ -68,12 +149,19 @@ class APIHandler:
         self,
         ws_url: str = Query(..., description="Websoket url for running user browser"),
         user_uuid: str = Query(..., description="User uuid"),
+        asset_cache: bool = Query(False, description="Serve static assets from cache"),
+        trace: bool = Query(False, description="Record a trace of every command"),
     ) -> JSONResponse:
         try:
-            self.logger.info(f'Starting browser for user: {user_uuid} with ws_url: {ws_url}')
+            self.logger.info(
+                f"Starting browser for user: {user_uuid} with ws_url: {ws_url}"
+            )
             browser_manager = BrowserManager()
             await browser_manager.connect_ws(ws_url)
             if browser_manager._browser:
+                if asset_cache:
+                    await browser_manager.enable_asset_cache(self.asset_cache)
+                browser_manager.trace_commands = trace
                 self.user_browsers[user_uuid] = browser_manager
                 return JSONResponse(
                     content={"success": "Browser connected"}, status_code=200
@@ -97,32 +185,113 @@ class APIHandler:
         self,
         message: str = Query(..., description="User message"),
         user_uuid: str = Query(..., description="User UUID"),
+        trace: bool = Query(False, description="Record a Playwright trace"),
     ) -> JSONResponse:
         if not message or not user_uuid:
             raise HTTPException(status_code=400, detail="Missing required parameters")
         try:
             browser_manager_instance = await self.get_browser_manager(user_uuid)
             if not browser_manager_instance:
-                JSONResponse(
+                return JSONResponse(
                     content={"error": "Browser is not connected"}, status_code=400
                 )
+            try:
+                # Held here while a dropped connection is re-established
+                await browser_manager_instance.wait_until_connected()
+            except RuntimeError as e:
+                return JSONResponse(content={"error": str(e)}, status_code=503)
 
             tasks = Tasks(
                 browser_manager=browser_manager_instance,
                 captcha_service=self.captcha_service,
+                user_id=user_uuid,
             )
 
             task_registry = register_tasks(tasks)
-            result: List[str] = await handle_command(
-                user_input=message,
-                task_registry=task_registry,
-            )
+            job_id = new_job_id()
+            if trace or browser_manager_instance.trace_commands:
+                tracing = browser_manager_instance.tracing(job_id, self.trace_store)
+            else:
+                tracing = nullcontext(False)
+            async with browser_manager_instance.in_use(), tracing as traced:
+                result: List[str] = await handle_command(
+                    user_input=message,
+                    task_registry=task_registry,
+                )
+            await browser_manager_instance.checkpoint()
             self.logger.debug("\n".join(result))
+            if traced:
+                self.logger.info(f"Trace of command for {user_uuid}: {job_id}")
+                return JSONResponse(content=result, headers={"X-Trace-Id": job_id})
             return JSONResponse(content=result)
         except Exception as e:
             self.logger.error(str(e))
             return JSONResponse(content={"error": "An error occurred"}, status_code=500)
 
+    async def screenshot_route(
+        self,
+        user_uuid: str = Query(..., description="User UUID"),
+        image_format: str = Query("jpeg", description="png, jpeg or webp"),
+        quality: Optional[int] = Query(None, description="jpeg/webp quality 0-100"),
+        full_page: bool = Query(False, description="Capture the full scrollable page"),
+        selector: Optional[str] = Query(None, description="Capture a single element"),
+        scale: str = Query("device", description="css or device"),
+    ) -> Response:
+        browser_manager = await self.get_browser_manager(user_uuid)
+        if not browser_manager:
+            return JSONResponse(
+                content={"error": "Browser is not connected"}, status_code=400
+            )
+        try:
+            options = ScreenshotOptions(
+                image_format=image_format,
+                quality=quality,
+                full_page=full_page,
+                selector=selector,
+                scale=scale,
+            )
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+        try:
+            data = await browser_manager.capture_screenshot(options)
+            return Response(content=data, media_type=options.media_type)
+        except Exception as e:
+            self.logger.error(f"Screenshot failed for user {user_uuid}: {str(e)}")
+            return JSONResponse(content={"error": "An error occurred"}, status_code=500)
+
+    async def metrics_route(self) -> JSONResponse:
+        return JSONResponse(
+            content={
+                **metrics.snapshot(),
+                "asset_cache": self.asset_cache.stats(),
+                "captcha_providers": captcha_solve_service.stats(),
+                "captcha_breakers": provider_breakers.stats(),
+            }
+        )
+
+    async def perf_report_route(
+        self, domain: Optional[str] = Query(None, description="Single domain")
+    ) -> JSONResponse:
+        report = navigation_stats.report()
+        if domain is not None:
+            if domain not in report:
+                return JSONResponse(
+                    content={"error": "No navigations recorded"}, status_code=404
+                )
+            report = {domain: report[domain]}
+        return JSONResponse(content=report)
+
+    async def trace_route(self, job_id: str) -> Response:
+        try:
+            path = self.trace_store.get(job_id)
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+        if path is None:
+            return JSONResponse(content={"error": "Trace not found"}, status_code=404)
+        return FileResponse(
+            path, media_type="application/zip", filename=f"trace-{job_id}.zip"
+        )
+
     async def close_browser(
         self, user_uuid: str = Query(..., description="User UUID")
     ) -> dict:
@@ -0,0 +1,83 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+__all__ = ["Metrics", "metrics"]
+
+# Samples kept per timing series, older ones are dropped
+TIMING_WINDOW = 1000
+
+
+def _key(name: str, labels: Optional[Dict[str, Any]]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Metrics:
+    """In-process counters, gauges and timing summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=TIMING_WINDOW)
+        )
+
+    def increment(
+        self, name: str, value: float = 1, labels: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set_gauge(
+        self, name: str, value: float, labels: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(
+        self, name: str, value: float, labels: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with self._lock:
+            self._timings[_key(name, labels)].append(value)
+
+    def counter(self, name: str, labels: Optional[Dict[str, Any]] = None) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = {}
+            for key, samples in self._timings.items():
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                timings[key] = {
+                    "count": len(ordered),
+                    "mean": round(sum(ordered) / len(ordered), 2),
+                    "p50": round(_percentile(ordered, 0.5), 2),
+                    "p95": round(_percentile(ordered, 0.95), 2),
+                    "max": round(ordered[-1], 2),
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": timings,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,370 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from om11.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ASSET_CACHE_DIR = "instance/asset_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CACHEABLE_RESOURCE_TYPES = {"script", "stylesheet", "image", "font"}
+# Body is stored decoded, so encoding/length headers would be wrong on replay
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+# Request headers that make a response specific to one user
+CREDENTIAL_HEADERS = ("cookie", "authorization")
+# The index is written at most this often, not once per stored asset
+INDEX_FLUSH_DELAY = 1.0
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        name, _, argument = part.partition("=")
+        directives[name.strip()] = argument.strip().strip('"') or None
+    return directives
+
+
+def freshness_lifetime(
+    headers: Dict[str, str], now: float, credentialed: bool = False
+) -> Optional[float]:
+    """
+    Seconds a response may be served without revalidation.
+
+    Returns None when the response must not be stored in a shared cache.
+    A response to a request with cookies or authorization is only stored
+    when it is marked public or has s-maxage.
+    """
+    directives = _parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "set-cookie" in headers:
+        return None
+    if credentialed and "public" not in directives and "s-maxage" not in directives:
+        return None
+    # The cache is keyed by url only, any other variant would be shared
+    vary = headers.get("vary", "").lower()
+    if vary and vary.replace(" ", "") != "accept-encoding":
+        return None
+    if "no-cache" in directives:
+        return 0.0
+
+    for name in ("s-maxage", "max-age"):
+        value = directives.get(name)
+        if value and re.fullmatch(r"\d+", value):
+            return float(value)
+    if "expires" in headers:
+        try:
+            return max(0.0, parsedate_to_datetime(headers["expires"]).timestamp() - now)
+        except (TypeError, ValueError):
+            return 0.0
+    # Validators alone still let us answer with a cheap 304 round trip
+    if "etag" in headers or "last-modified" in headers:
+        return 0.0
+    return None
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    size: int
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+
+class AssetCache:
+    """
+    Disk-backed cache for static assets shared by every browser session.
+
+    Attached as a Playwright route handler, it answers fresh script, style,
+    image and font requests from disk, revalidates stale ones with
+    ETag/Last-Modified and fills itself on misses. Total size is bounded,
+    least recently used entries are evicted first.
+
+    Routing disables Chromium's own HTTP cache for the context, this cache
+    takes its place.
+    """
+
+    def __init__(
+        self, cache_dir: str = ASSET_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        # Index writes from worker threads may finish out of order
+        self._write_lock = threading.Lock()
+        self._index_version = 0
+        self._written_version = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "stored": 0,
+            "evicted": 0,
+            "bytes_saved": 0,
+        }
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "objects", key)
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, "index.json")
+
+    async def attach(self, context: Any) -> None:
+        """Route all requests of a BrowserContext through the cache"""
+        await self._ensure_loaded()
+        await context.route("**/*", self.handle_route)
+
+    async def handle_route(self, route: Any, request: Any) -> None:
+        if (
+            request.method != "GET"
+            or request.resource_type not in CACHEABLE_RESOURCE_TYPES
+        ):
+            await route.fallback()
+            return
+
+        await self._ensure_loaded()
+        url = request.url
+        key = self._key(url)
+        entry = self._index.get(key)
+        now = time.time()
+
+        if entry is not None and entry.is_fresh(now):
+            body = await asyncio.to_thread(self._read_body, key)
+            if body is not None:
+                self._index.move_to_end(key)
+                self._record("hits", entry.size)
+                await route.fulfill(
+                    status=entry.status, headers=entry.headers, body=body
+                )
+                return
+            self._drop(key)
+            entry = None
+
+        headers = dict(request.headers)
+        if entry is not None:
+            if entry.etag:
+                headers["if-none-match"] = entry.etag
+            if entry.last_modified:
+                headers["if-modified-since"] = entry.last_modified
+
+        # request.headers leaves out cookies, all_headers() has them
+        credentialed = any(
+            name in CREDENTIAL_HEADERS for name in await request.all_headers()
+        )
+        response = await route.fetch(headers=headers)
+        if response.status == 304 and entry is not None:
+            body = await asyncio.to_thread(self._read_body, key)
+            if body is not None:
+                lifetime = freshness_lifetime(
+                    {**entry.headers, **response.headers}, now
+                )
+                entry.expires_at = now + (lifetime or 0.0)
+                self._index.move_to_end(key)
+                self._index_changed()
+                self._record("revalidated", entry.size)
+                await route.fulfill(
+                    status=entry.status, headers=entry.headers, body=body
+                )
+                return
+            # Body vanished from disk, fetch it again without validators
+            self._drop(key)
+            response = await route.fetch(headers=dict(request.headers))
+
+        body = await response.body()
+        self._record("misses", 0)
+        await self._store(
+            url, key, response.status, response.headers, body, now, credentialed
+        )
+        await route.fulfill(response=response, body=body)
+
+    async def _store(
+        self,
+        url: str,
+        key: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+        now: float,
+        credentialed: bool = False,
+    ) -> None:
+        headers = {name.lower(): value for name, value in headers.items()}
+        lifetime = freshness_lifetime(headers, now, credentialed)
+        if status != 200 or lifetime is None or len(body) > self.max_bytes:
+            return
+
+        entry = CacheEntry(
+            url=url,
+            status=status,
+            headers={k: v for k, v in headers.items() if k not in DROPPED_HEADERS},
+            size=len(body),
+            expires_at=now + lifetime,
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+        )
+        if key in self._index:
+            self._drop(key)
+        self._index[key] = entry
+        self._total_bytes += entry.size
+        evicted = self._evict()
+        self._stats["stored"] += 1
+        metrics.set_gauge("asset_cache.bytes", self._total_bytes)
+        await asyncio.to_thread(self._write, key, body, evicted)
+        self._index_changed()
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while self._total_bytes > self.max_bytes and self._index:
+            key, entry = self._index.popitem(last=False)
+            self._total_bytes -= entry.size
+            evicted.append(key)
+            self._stats["evicted"] += 1
+            metrics.increment("asset_cache.evicted")
+        return evicted
+
+    def _drop(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+    def _record(self, outcome: str, bytes_saved: int) -> None:
+        self._stats[outcome] += 1
+        self._stats["bytes_saved"] += bytes_saved
+        metrics.increment(f"asset_cache.{outcome}")
+        if bytes_saved:
+            metrics.increment("asset_cache.bytes_saved", bytes_saved)
+
+    def stats(self) -> Dict[str, Any]:
+        served = self._stats["hits"] + self._stats["revalidated"]
+        lookups = served + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "entries": len(self._index),
+            "bytes_stored": self._total_bytes,
+        }
+
+    def _index_changed(self) -> None:
+        """Schedule one index write for every change within the flush delay"""
+        self._index_version += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(INDEX_FLUSH_DELAY)
+        try:
+            await self.flush()
+        except Exception as e:
+            metrics.increment("asset_cache.index_write_errors")
+            logger.warning(f"Asset cache index not written: {e}")
+
+    async def flush(self) -> None:
+        """Write the index now if it changed since the last write"""
+        version = self._index_version
+        if version <= self._written_version:
+            return
+        await asyncio.to_thread(self._write_index, self._index_snapshot(), version)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    def _index_snapshot(self) -> Dict[str, Any]:
+        return {key: asdict(entry) for key, entry in self._index.items()}
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                index = await asyncio.to_thread(self._load_index)
+                self._index = OrderedDict(
+                    (key, CacheEntry(**data)) for key, data in index.items()
+                )
+                self._total_bytes = sum(e.size for e in self._index.values())
+                self._loaded = True
+
+    # --- disk I/O, runs in worker threads ---
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            with open(self._index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            index = {}
+        index = {
+            key: data
+            for key, data in index.items()
+            if os.path.exists(self._body_path(key))
+        }
+        # Bodies stored after the last index write of a previous process
+        try:
+            orphans = set(os.listdir(os.path.join(self.cache_dir, "objects")))
+        except OSError:
+            orphans = set()
+        for name in orphans - set(index):
+            try:
+                os.remove(self._body_path(name))
+            except OSError:
+                logger.debug(f"Orphaned asset {name} was already gone")
+        return index
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._body_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, key: str, body: bytes, evicted: List[str]) -> None:
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self._write_atomic(self._body_path(key), body)
+        for evicted_key in evicted:
+            try:
+                os.remove(self._body_path(evicted_key))
+            except OSError:
+                logger.debug(f"Evicted asset {evicted_key} was already gone")
+
+    def _write_index(self, index: Dict[str, Any], version: int) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._write_lock:
+            if version > self._written_version:
+                self._write_atomic(self._index_path, json.dumps(index).encode("utf-8"))
+                self._written_version = version
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -1,57 +1,426 @@
 import asyncio
+import base64
 import json
+import logging
+import os
 import random
 import re
-from typing import Any, Callable, List, Optional
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
 
 from playwright.async_api import Playwright  # BrowserType,
-from playwright.async_api import Browser, Page, async_playwright
+from playwright.async_api import Browser, BrowserContext, Page, async_playwright
+
+from om11.metrics import metrics
+from om11.task.asset_cache import AssetCache
+from om11.task.captcha_watcher import CaptchaWatcher, SolveFunc
+from om11.task.captchas import CAPTCHA_OBSERVER_BINDING, CAPTCHA_OBSERVER_SCRIPT
+from om11.task.dom_snapshot import (
+    DEFAULT_SNAPSHOT_TOKENS,
+    MAX_NAME_LENGTH,
+    SNAPSHOT_SCRIPT,
+    DomSnapshot,
+)
+from om11.task.downloads import Downloader, DownloadResult
+from om11.task.extraction import (
+    DEFAULT_PAGE_SIZE,
+    EXTRACT_SCRIPT,
+    ExtractionResult,
+    FieldSpec,
+    extraction_args,
+    parse_fields,
+)
+from om11.task.launch_presets import get_preset
+from om11.task.memory_watchdog import MemorySample, read_process_rss
+from om11.task.perf_timing import (
+    LONG_TASK_OBSERVER_SCRIPT,
+    NAVIGATION_TIMING_SCRIPT,
+    NavigationTiming,
+    navigation_stats,
+    parse_timing,
+)
+from om11.task.screenshots import ScreenshotOptions, ScreenshotStore
+from om11.task.session_store import (
+    RESTORE_STORAGE_SCRIPT,
+    SESSION_STORAGE_SCRIPT,
+    SessionSnapshot,
+    SessionStore,
+    restore_init_script,
+)
+from om11.task.tracing import TraceStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TABS = 8
+# Called with the binding source and the report of CAPTCHA_OBSERVER_SCRIPT
+CaptchaHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+# Reconnect delays double from the base delay up to the max delay
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+RECONNECT_ATTEMPTS = 8
+# How long a command waits for a reconnect before it fails
+RECONNECT_HOLD_TIMEOUT = 15.0
 
 
 class BrowserManager:
-    def __init__(self):
+    def __init__(
+        self,
+        session_store: Optional[SessionStore] = None,
+        max_tabs: int = DEFAULT_MAX_TABS,
+        downloader: Optional[Downloader] = None,
+        collect_timing: bool = True,
+    ):
         self._browser: Optional[Browser] = None
         self._page: Optional[Page] = None
         self._playwright: Optional[Playwright] = None
+        self._screenshots = ScreenshotStore()
+        self._session_store = session_store or SessionStore()
+        self._downloader = downloader or Downloader()
+        # Storage of other origins waiting for their first navigation, and
+        # the one init script per context that restores it
+        self._pending_storage: (
+            "weakref.WeakKeyDictionary[BrowserContext, Dict[str, List[Any]]]"
+        ) = weakref.WeakKeyDictionary()
+        self._storage_scripts: "weakref.WeakKeyDictionary[BrowserContext, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # Context options of init_browser(), a recycled context starts with them
+        self._context_options: Dict[str, Any] = {}
+        # Limits extra pages opened by open_tab in this browser context
+        self.max_tabs = max_tabs
+        self._tab_slots = asyncio.Semaphore(max_tabs)
+        self._last_dom_snapshot: Optional[DomSnapshot] = None
+        # Navigation Timing of the last open_url, None if not collected
+        self.collect_timing = collect_timing
+        self.last_navigation: Optional[NavigationTiming] = None
+        # Contexts that already carry the long-task observer init script.
+        # Weak, a recycled context can get the id of the one it replaced
+        self._observed_contexts: "weakref.WeakSet[BrowserContext]" = weakref.WeakSet()
+        # Captcha widget reports, see observe_captchas()
+        self._captcha_handler: Optional[CaptchaHandler] = None
+        self._captcha_contexts: "weakref.WeakSet[BrowserContext]" = weakref.WeakSet()
+        # Early solves of this session, see watch_captchas()
+        self.captcha_watcher: Optional[CaptchaWatcher] = None
+        self._asset_cache: Optional[AssetCache] = None
+        # Commands running against this browser, see in_use()
+        self._active_commands = 0
+        # Held while a command registers and for a whole recycle_page()
+        self._recycle_lock = asyncio.Lock()
+        # Launched by init_browser(), not a user's browser reached over CDP
+        self._launched = False
+        # Trace every command of this session, see tracing()
+        self.trace_commands = False
+        self._tracing_job: Optional[str] = None
+        # Remote browser connection, see connect_ws()
+        self._ws_url: Optional[str] = None
+        self._connected = asyncio.Event()
+        self._connected.set()
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self.reconnect_base_delay = RECONNECT_BASE_DELAY
+        # Last url and session state, replayed after a reconnect
+        self._checkpoint: Optional[SessionSnapshot] = None
+        self._checkpoint_url: Optional[str] = None
 
     async def connect_ws(self, ws_url: str, **kwargs: Any) -> None:
         """
         Connect to an existing browser via WebSocket URL.
+
+        An open page of the remote browser is reused instead of opening a
+        new tab. If the connection drops it is re-established in the
+        background, see wait_until_connected().
         """
+        self._ws_url = ws_url
+        self._closing = False
+        await self._connect()
+        self._connected.set()
+
+    async def _connect(self) -> None:
+        ws_url = self._ws_url
+        if ws_url is None:
+            raise RuntimeError("Browser endpoint is not set.")
         if self._playwright is None:
             self._playwright = await async_playwright().start()
 
         try:
-            self._browser = await self._playwright.chromium.connect_over_cdp(ws_url)
+            browser = await self._playwright.chromium.connect_over_cdp(ws_url)
+        except Exception as e:
+            logger.debug(f"CDP connect failed, trying playwright protocol: {e}")
+            browser = await self._playwright.chromium.connect(ws_url)
+        self._page = await self._reuse_page(browser)
+        self._browser = browser
+        browser.on("disconnected", self._on_disconnected)
+
+    async def _reuse_page(self, browser: Browser) -> Page:
+        pages = [
+            page
+            for context in browser.contexts
+            for page in context.pages
+            if not page.is_closed()
+        ]
+        # Prefer the page we were working in before the connection dropped
+        for page in pages:
+            if self._checkpoint_url and page.url == self._checkpoint_url:
+                return page
+        if pages:
+            return pages[-1]
+        if browser.contexts:
+            return await browser.contexts[0].new_page()
+        return await browser.new_page()
+
+    def _on_disconnected(self, browser: Browser) -> None:
+        if self._closing or browser is not self._browser:
+            return
+        logger.warning(f"Browser at {self._ws_url} disconnected, reconnecting")
+        metrics.increment("browser.disconnects")
+        self._connected.clear()
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_base_delay
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            try:
+                await self._connect()
+                await self._replay_checkpoint()
+            except Exception as e:
+                logger.warning(f"Reconnect attempt {attempt} failed: {e}")
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            metrics.increment("browser.reconnects")
+            logger.info(f"Reconnected to {self._ws_url} after {attempt} attempts")
+            self._connected.set()
+            return
+        metrics.increment("browser.reconnect_failures")
+        logger.error(f"Giving up reconnecting to {self._ws_url}")
+
+    async def _replay_checkpoint(self) -> None:
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        if self._asset_cache is not None:
+            await self._asset_cache.attach(self._page.context)
+        if self._checkpoint is not None and not self._checkpoint.is_empty():
+            await self.apply_session_snapshot(self._checkpoint)
+        url = self._checkpoint_url
+        if url and url != "about:blank" and self._page.url != url:
+            await self.open_url(url)
+
+    async def checkpoint(self) -> None:
+        """Remember url and session state to replay after a reconnect."""
+        if self._ws_url is None or self._page is None or not self._connected.is_set():
+            return
+        try:
+            self._checkpoint = await self.snapshot_session()
+            self._checkpoint_url = self._page.url
         except Exception as e:
-            print(str(e))
-            self._browser = await self._playwright.chromium.connect(ws_url)
-        self._page = await self._browser.new_page()
+            logger.warning(f"Failed to checkpoint session: {e}")
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def wait_until_connected(
+        self, timeout: float = RECONNECT_HOLD_TIMEOUT
+    ) -> None:
+        """Hold the caller while a dropped connection is re-established."""
+        if self._connected.is_set():
+            return
+        if self._reconnect_task is not None and self._reconnect_task.done():
+            raise RuntimeError("Browser connection lost.")
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError("Browser is reconnecting, try again later.")
 
     async def init_browser(
         self,
-        headless: bool = False,
+        headless: Optional[bool] = None,
         user_data_dir: Optional[str] = None,
         args: Optional[List[str]] = None,
+        preset: str = "default",
     ) -> None:
-        """Initialize a new browser instance."""
+        """
+        Initialize a new browser instance.
+
+        `preset` names an entry of LAUNCH_PRESETS with the launch arguments and
+        viewport, `headless` and `args` override or extend it.
+        """
+        launch_preset = get_preset(preset)
         if self._playwright is None:
             self._playwright = await async_playwright().start()
 
-        browser_args = ["--no-sandbox", "--disable-setuid-sandbox"]
+        launch_kwargs = launch_preset.launch_kwargs(headless)
         if args:
-            browser_args.extend(args)
+            launch_kwargs["args"].extend(args)
+
+        # userDataDir is not directly supported; use user_data_dir via executable_path or context
+        self._browser = await self._playwright.chromium.launch(**launch_kwargs)
+        self._context_options = launch_preset.page_kwargs()
+        self._page = await self._browser.new_page(**self._context_options)
+        self._launched = True
+
+    async def enable_asset_cache(self, cache: AssetCache) -> None:
+        """Serve static assets of this context from a shared disk cache."""
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        await cache.attach(self._page.context)
+        self._asset_cache = cache
 
-        self._browser = await self._playwright.chromium.launch(
-            headless=headless,
-            args=browser_args,
-            ignore_default_args=["--enable-automation"],  # optional
-            # userDataDir is not directly supported; use user_data_dir via executable_path or context
+    @property
+    def is_busy(self) -> bool:
+        return self._active_commands > 0
+
+    @asynccontextmanager
+    async def in_use(self) -> AsyncIterator[None]:
+        """Mark the browser busy so the memory watchdog leaves it alone."""
+        # Waits for a running recycle, the command then starts on the new page
+        async with self._recycle_lock:
+            self._active_commands += 1
+        try:
+            yield
+        finally:
+            self._active_commands -= 1
+
+    @asynccontextmanager
+    async def tracing(self, job_id: str, store: TraceStore) -> AsyncIterator[bool]:
+        """
+        Record a Playwright trace (screenshots, DOM snapshots, network and
+        console) of everything done inside the block into the store.
+
+        Yields False without recording if this context is already tracing
+        another job, Playwright allows a single trace per context.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        if self._tracing_job is not None:
+            yield False
+            return
+        path = store.path_for(job_id)
+        tracing = self._page.context.tracing
+        await tracing.start(title=job_id, screenshots=True, snapshots=True)
+        self._tracing_job = job_id
+        try:
+            yield True
+        finally:
+            self._tracing_job = None
+            os.makedirs(store.base_dir, exist_ok=True)
+            await tracing.stop(path=path)
+            await asyncio.to_thread(store.enforce_retention)
+
+    async def sample_memory(self) -> MemorySample:
+        """
+        JS heap of the page via CDP, plus RSS of the browser's renderers when
+        it was launched here. A browser reached over connect_ws() runs on
+        another host, its renderer pids mean nothing on this one.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        session = await self._page.context.new_cdp_session(self._page)
+        try:
+            await session.send("Performance.enable")
+            result = await session.send("Performance.getMetrics")
+        finally:
+            await session.detach()
+        values = {m["name"]: m["value"] for m in result["metrics"]}
+        return MemorySample(
+            js_heap_used=int(values.get("JSHeapUsedSize", 0)),
+            js_heap_total=int(values.get("JSHeapTotalSize", 0)),
+            process_rss=await self._renderer_rss() if self._launched else None,
         )
-        self._page = await self._browser.new_page()
-        await self._page.set_viewport_size({"width": 1280, "height": 800})
+
+    async def _renderer_rss(self) -> Optional[int]:
+        # CDP reports the renderer pids, their memory is only readable locally
+        if self._browser is None:
+            return None
+        try:
+            session = await self._browser.new_browser_cdp_session()
+            try:
+                info = await session.send("SystemInfo.getProcessInfo")
+            finally:
+                await session.detach()
+        except Exception:
+            return None
+        pids = [p["id"] for p in info["processInfo"] if p["type"] == "renderer"]
+        sizes = [await asyncio.to_thread(read_process_rss, pid) for pid in pids]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+
+    async def recycle_page(self) -> bool:
+        """
+        Replace the page with a fresh one, unless a command is running.
+
+        A browser launched by init_browser() gets a new context with cookies
+        and storage carried over. A user's browser reached over CDP keeps its
+        context, and with it the profile's proxy and fingerprint; only the
+        page is replaced and its sessionStorage carried over. Either way the
+        current url is reopened, so the session continues where it was.
+
+        Returns False without recycling if the browser is busy.
+        """
+        page, browser = self._page, self._browser
+        if page is None or browser is None:
+            raise RuntimeError("Browser page is not initialized.")
+        async with self._recycle_lock:
+            if self.is_busy:
+                return False
+            try:
+                if self._launched:
+                    await self._recycle_context(browser, page)
+                else:
+                    await self._recycle_page_in_context(page)
+            except Exception as e:
+                raise Exception(f"Failed to recycle page: {str(e)}")
+            return True
+
+    async def _recycle_context(self, browser: Browser, old_page: Page) -> None:
+        url = old_page.url
+        snapshot = await self.snapshot_session()
+        options = dict(self._context_options)
+        # Keeps a viewport resized since launch
+        if old_page.viewport_size is not None:
+            options["viewport"] = old_page.viewport_size
+        context = await browser.new_context(**options)
+        self._page = await context.new_page()
+        if self._asset_cache is not None:
+            await self._asset_cache.attach(context)
+        await self.apply_session_snapshot(snapshot)
+        if url and url != "about:blank":
+            await self.open_url(url)
+        await old_page.context.close()
+
+    async def _recycle_page_in_context(self, old_page: Page) -> None:
+        url = old_page.url
+        session_storage = await old_page.evaluate(SESSION_STORAGE_SCRIPT)
+        page = await old_page.context.new_page()
+        origin = session_storage.get("origin")
+        if session_storage.get("items") and origin and origin != "null":
+            storage = {"sessionStorage": session_storage["items"]}
+            marker = SessionSnapshot(origins={origin: storage}).digests()[origin]
+            args = json.dumps([origin, storage, marker])
+            await page.add_init_script(script=f"({RESTORE_STORAGE_SCRIPT})({args})")
+        self._page = page
+        if url and url != "about:blank":
+            await self.open_url(url)
+        await old_page.close()
 
     async def close_browser(self) -> None:
+        self._closing = True
+        await self.stop_watching_captchas()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
         if self._browser:
             await self._browser.close()
             self._browser = None
@@ -63,11 +432,96 @@ class BrowserManager:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
         try:
+            if self.collect_timing:
+                await self._observe_long_tasks(self._page.context)
+            if self._captcha_handler is not None:
+                await self._observe_captchas(self._page.context)
+            started = time.monotonic()
             await self._page.goto(url, wait_until="networkidle", timeout=timeout)
-            return True
+            wall_ms = (time.monotonic() - started) * 1000
         except Exception as e:
             raise Exception(f"Failed to open URL {url}: {str(e)}")
-            
+        if self.collect_timing:
+            await self._record_navigation_timing(wall_ms)
+        return True
+
+    async def _observe_long_tasks(self, context) -> None:
+        if context not in self._observed_contexts:
+            await context.add_init_script(LONG_TASK_OBSERVER_SCRIPT)
+            self._observed_contexts.add(context)
+
+    async def observe_captchas(self, handler: "CaptchaHandler") -> None:
+        """
+        Report captcha widgets to `handler` as soon as they mount.
+
+        `handler(source, report)` is called through a page binding with the
+        Playwright binding source and {url, marker, top}, see
+        CAPTCHA_OBSERVER_SCRIPT. It stays installed for later pages, tabs
+        and recycled contexts of this session.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        self._captcha_handler = handler
+        context = self._page.context
+        await self._observe_captchas(context)
+        # The init script only runs on navigation, cover pages already open
+        for page in context.pages:
+            try:
+                await page.evaluate(CAPTCHA_OBSERVER_SCRIPT)
+            except Exception as e:
+                logger.debug(f"Captcha observer not injected into {page.url}: {e}")
+
+    async def watch_captchas(self, solve: SolveFunc) -> CaptchaWatcher:
+        """
+        Start one CaptchaWatcher for this session, solving with `solve`.
+
+        A session has at most one watcher, later calls return it. Its
+        solves count as commands, so the memory watchdog never recycles
+        the page under them, and close_browser() stops it.
+        """
+        if self.captcha_watcher is None:
+
+            async def solve_in_use(page: Any) -> bool:
+                async with self.in_use():
+                    return await solve(page)
+
+            self.captcha_watcher = CaptchaWatcher(solve_in_use)
+            await self.observe_captchas(self.captcha_watcher.on_seen)
+        return self.captcha_watcher
+
+    async def stop_watching_captchas(self) -> None:
+        """Cancel the watcher's running solves and drop the captcha handler"""
+        watcher, self.captcha_watcher = self.captcha_watcher, None
+        self._captcha_handler = None
+        if watcher is not None:
+            await watcher.stop()
+
+    async def _observe_captchas(self, context) -> None:
+        if context in self._captcha_contexts:
+            return
+        await context.expose_binding(CAPTCHA_OBSERVER_BINDING, self._on_captcha_seen)
+        await context.add_init_script(CAPTCHA_OBSERVER_SCRIPT)
+        self._captcha_contexts.add(context)
+
+    async def _on_captcha_seen(
+        self, source: Dict[str, Any], report: Dict[str, Any]
+    ) -> None:
+        # Bound once per context, the handler may be replaced later
+        if self._captcha_handler is not None:
+            await self._captcha_handler(source, report)
+
+    async def _record_navigation_timing(self, wall_ms: float) -> None:
+        # Timing is diagnostics only, a failure here must not fail the step
+        if self._page is None:
+            return
+        try:
+            result = await self._page.evaluate(NAVIGATION_TIMING_SCRIPT)
+        except Exception:
+            result = None
+        self.last_navigation = parse_timing(result, wall_ms)
+        if self.last_navigation is not None:
+            navigation_stats.record(self.last_navigation)
+
     async def fill(self, selector: str, text: str, timeout: int = 5000) -> bool:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
@@ -149,25 +603,115 @@ class BrowserManager:
         except Exception as e:
             raise Exception(f"Failed to get text from {selector}: {str(e)}")
 
-    async def save_session(self, path: str = "session.json") -> bool:
+    async def snapshot_session(self) -> SessionSnapshot:
+        """Capture cookies plus localStorage/sessionStorage of the current context."""
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        state = await self._page.context.storage_state()
+        session_storage = await self._page.evaluate(SESSION_STORAGE_SCRIPT)
+        return SessionSnapshot.from_storage_state(state, session_storage)
+
+    async def apply_session_snapshot(self, snapshot: SessionSnapshot) -> int:
+        """
+        Apply a snapshot to the current context.
+
+        Storage for the current origin is written directly, other origins are
+        restored by an init script on their first navigation.
+
+        Returns the number of origins applied.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        context = self._page.context
+        if snapshot.cookies:
+            await context.add_cookies(snapshot.cookies)
+
+        current_origin = await self._page.evaluate("() => location.origin")
+        pending = self._pending_storage.setdefault(context, {})
+        deferred = False
+        digests = snapshot.digests()
+        # New per apply, so storage restored by an earlier load and changed
+        # since is written again
+        applied = time.monotonic_ns()
+        for origin, storage in snapshot.origins.items():
+            marker = f"{digests[origin]}-{applied}"
+            if origin == current_origin:
+                await self._page.evaluate(
+                    RESTORE_STORAGE_SCRIPT, [origin, storage, marker]
+                )
+            else:
+                pending[origin] = [storage, marker]
+                deferred = True
+        if deferred:
+            await self._install_storage_script(context)
+        return len(snapshot.origins)
+
+    async def _install_storage_script(self, context) -> None:
+        """Replace the context's restore script with one covering all pending origins"""
+        previous = self._storage_scripts.pop(context, None)
+        if previous is not None and hasattr(previous, "dispose"):
+            await previous.dispose()
+        self._storage_scripts[context] = await context.add_init_script(
+            script=restore_init_script(self._pending_storage[context])
+        )
+
+    async def save_session(
+        self, user_id: str = "default", profile: str = "default"
+    ) -> bool:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
         try:
-            cookies = await self._page.context.cookies()
-            with open(path, "w") as f:
-                json.dump(cookies, f)
+            snapshot = await self.snapshot_session()
+            await self._session_store.save(user_id, profile, snapshot)
             return True
         except Exception as e:
             raise Exception(f"Failed to save session: {str(e)}")
 
-    async def load_session(self, path: str = "session.json") -> bool:
+    async def save_cookies(self, path: str) -> bool:
+        """Write the context's cookies to a json file, the pre-SessionStore format"""
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
         try:
-            with open(path, "r") as f:
-                cookies = json.load(f)
+            cookies = await self._page.context.cookies()
+            data = json.dumps(cookies)
+            await asyncio.to_thread(self._write_text, path, data)
+            return True
+        except Exception as e:
+            raise Exception(f"Failed to save cookies: {str(e)}")
+
+    async def load_cookies(self, path: str) -> bool:
+        """Add cookies from a file written by save_cookies()"""
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        try:
+            cookies = json.loads(await asyncio.to_thread(self._read_text, path))
             await self._page.context.add_cookies(cookies)
             return True
+        except Exception as e:
+            raise Exception(f"Failed to load cookies: {str(e)}")
+
+    @staticmethod
+    def _write_text(path: str, data: str) -> None:
+        with open(path, "w") as f:
+            f.write(data)
+
+    @staticmethod
+    def _read_text(path: str) -> str:
+        with open(path, "r") as f:
+            return f.read()
+
+    async def load_session(
+        self, user_id: str = "default", profile: str = "default"
+    ) -> int:
+        """Restore a saved session, skipping parts the context already holds."""
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        try:
+            # Compared with the live context, the site may have changed or
+            # cleared its state since the last save or load
+            live = (await self.snapshot_session()).digests()
+            _, changed = await self._session_store.load(user_id, profile, known=live)
+            return await self.apply_session_snapshot(changed)
         except Exception as e:
             raise Exception(f"Failed to load session: {str(e)}")
 
@@ -203,15 +747,80 @@ class BrowserManager:
         except Exception as e:
             raise Exception(f"Failed to refresh page: {str(e)}")
 
-    async def screenshot(self, path: str) -> bool:
+    async def capture_screenshot(
+        self, options: Optional[ScreenshotOptions] = None, timeout: int = 5000
+    ) -> bytes:
+        """Capture a screenshot into memory without touching the disk."""
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
+        options = options or ScreenshotOptions()
         try:
-            await self._page.screenshot(path=path)
-            return True
+            if options.image_format == "webp":
+                # Playwright only encodes png/jpeg, Chromium can do webp via CDP
+                return await self._capture_webp(self._page, options, timeout)
+            if options.selector:
+                element = await self._page.wait_for_selector(
+                    options.selector, timeout=timeout
+                )
+                if element is None:
+                    raise RuntimeError(f"Element {options.selector} not found")
+                return await element.screenshot(
+                    **options.playwright_kwargs(element=True)
+                )
+            return await self._page.screenshot(**options.playwright_kwargs())
         except Exception as e:
             raise Exception(f"Failed to take screenshot: {str(e)}")
 
+    async def _capture_webp(
+        self, page: Page, options: ScreenshotOptions, timeout: int
+    ) -> bytes:
+        clip: Optional[Dict[str, float]] = options.clip
+        if options.selector:
+            element = await page.wait_for_selector(options.selector, timeout=timeout)
+            box = await element.bounding_box() if element is not None else None
+            if box is None:
+                raise RuntimeError(f"Element {options.selector} is not visible")
+            clip = {
+                "x": box["x"],
+                "y": box["y"],
+                "width": box["width"],
+                "height": box["height"],
+            }
+        elif options.full_page and clip is None:
+            size = await page.evaluate(
+                "() => ({width: document.documentElement.scrollWidth,"
+                " height: document.documentElement.scrollHeight})"
+            )
+            clip = {"x": 0, "y": 0, **size}
+
+        scale = 1.0
+        if options.scale == "css" and clip is not None:
+            scale = 1 / await page.evaluate("() => window.devicePixelRatio")
+
+        session = await page.context.new_cdp_session(page)
+        try:
+            result = await session.send(
+                "Page.captureScreenshot", options.cdp_params(clip, scale)
+            )
+        finally:
+            await session.detach()
+        return base64.b64decode(result["data"])
+
+    async def screenshot(
+        self, path: str, options: Optional[ScreenshotOptions] = None
+    ) -> str:
+        """
+        Capture a screenshot and persist it off the event loop.
+
+        Returns the path holding the frame; an identical consecutive frame
+        is not written again and the previous path is returned instead.
+        """
+        data = await self.capture_screenshot(
+            options or ScreenshotOptions.from_path(path)
+        )
+        saved_path, _ = await self._screenshots.save(data, path)
+        return saved_path
+
     async def scroll_to(self, selector: str, timeout: int = 5000) -> bool:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
@@ -248,10 +857,10 @@ class BrowserManager:
         return await self.click(selector)
 
     async def switch_tab(self, tab_index: int) -> bool:
-        if self._browser is None:
-            raise RuntimeError("Browser is not initialized.")
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
         try:
-            pages = await self._browser.contexts[0].pages()
+            pages = self._page.context.pages
             if 0 <= tab_index < len(pages):
                 self._page = pages[tab_index]
                 return True
@@ -260,6 +869,48 @@ class BrowserManager:
         except Exception as e:
             raise Exception(f"Failed to switch to tab {tab_index}: {str(e)}")
 
+    @asynccontextmanager
+    async def open_tab(
+        self, url: Optional[str] = None
+    ) -> AsyncIterator["BrowserManager"]:
+        """
+        Open a new page in the current context and yield a manager bound to it.
+
+        Tabs share cookies and storage with the main page. At most `max_tabs`
+        extra pages are open at once, further callers wait for a free slot.
+        The page is closed on exit.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        async with self._tab_slots:
+            page = await self._page.context.new_page()
+            try:
+                tab = self._bind_page(page)
+                if url:
+                    await tab.open_url(url)
+                yield tab
+            finally:
+                await page.close()
+
+    def _bind_page(self, page: Page) -> "BrowserManager":
+        tab = BrowserManager(
+            session_store=self._session_store,
+            max_tabs=self.max_tabs,
+            downloader=self._downloader,
+            collect_timing=self.collect_timing,
+        )
+        tab._browser = self._browser
+        tab._playwright = self._playwright
+        tab._page = page
+        # Same context, so the applied session state is shared too
+        tab._pending_storage = self._pending_storage
+        tab._storage_scripts = self._storage_scripts
+        tab._observed_contexts = self._observed_contexts
+        tab._captcha_handler = self._captcha_handler
+        tab.captcha_watcher = self.captcha_watcher
+        tab._captcha_contexts = self._captcha_contexts
+        return tab
+
     async def wait_captcha_frame(self, timeout: int = 5000) -> bool:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
@@ -343,6 +994,63 @@ class BrowserManager:
         except Exception as e:
             raise Exception(f"Failed to click link with text '{text}': {str(e)}")
 
+    async def extract_records(
+        self,
+        row_selector: str,
+        fields: Dict[str, FieldSpec],
+        offset: int = 0,
+        limit: Optional[int] = None,
+        timeout: int = 5000,
+    ) -> ExtractionResult:
+        """
+        Extract every field of every row matching `row_selector` in one
+        in-page pass, returned as column arrays.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        args = extraction_args(row_selector, parse_fields(fields), offset, limit, False)
+        try:
+            await self._page.wait_for_selector(row_selector, timeout=timeout)
+            result = await self._page.evaluate(EXTRACT_SCRIPT, args)
+        except Exception as e:
+            raise Exception(f"Failed to extract {row_selector}: {str(e)}")
+        return ExtractionResult(**result)
+
+    async def iter_records(
+        self,
+        row_selector: str,
+        fields: Dict[str, FieldSpec],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        timeout: int = 5000,
+    ) -> AsyncIterator[ExtractionResult]:
+        """
+        Yield the rows in pages of `page_size`, one round trip per page.
+
+        The row list is queried once, later pages reuse it, so the page is
+        not re-scanned for listings with tens of thousands of rows.
+        """
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        parsed = parse_fields(fields)
+        try:
+            await self._page.wait_for_selector(row_selector, timeout=timeout)
+        except Exception as e:
+            raise Exception(f"Failed to extract {row_selector}: {str(e)}")
+        offset = 0
+        while True:
+            args = extraction_args(row_selector, parsed, offset, page_size, offset > 0)
+            try:
+                result = ExtractionResult(
+                    **await self._page.evaluate(EXTRACT_SCRIPT, args)
+                )
+            except Exception as e:
+                raise Exception(f"Failed to extract {row_selector}: {str(e)}")
+            if len(result):
+                yield result
+            if not result.has_more or not len(result):
+                return
+            offset += len(result)
+
     async def extract_emails_from_page(self) -> List[str]:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
@@ -354,16 +1062,74 @@ class BrowserManager:
         except Exception as e:
             raise Exception(f"Failed to extract emails: {str(e)}")
 
-    async def download_file(self, url: str) -> bool:
-        # For downloading, navigate to the URL
+    async def request_headers(self, url: str) -> Dict[str, str]:
+        """Cookie and user agent headers the page context would send to url."""
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        cookies = await self._page.context.cookies(url)
+        headers = {"User-Agent": await self._page.evaluate("() => navigator.userAgent")}
+        if cookies:
+            headers["Cookie"] = "; ".join(
+                f"{c.get('name')}={c.get('value')}" for c in cookies
+            )
+        return headers
+
+    async def download_file(
+        self,
+        url: str,
+        filename: Optional[str] = None,
+        expected_sha256: Optional[str] = None,
+    ) -> DownloadResult:
+        """Stream a file to disk using the page context's cookies."""
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
         try:
-            await self._page.goto(url, wait_until="networkidle")
-            return True
+            return await self._downloader.download(
+                url, self.request_headers, filename, expected_sha256
+            )
         except Exception as e:
             raise Exception(f"Failed to download file from {url}: {str(e)}")
 
+    async def download_files(
+        self, urls: List[str]
+    ) -> List[Union[DownloadResult, BaseException]]:
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        return await self._downloader.download_many(urls, self.request_headers)
+
+    async def extract_dom_snapshot(self) -> DomSnapshot:
+        """Extract interactive elements of the current page in one evaluation."""
+        if self._page is None:
+            raise RuntimeError("Browser page is not initialized.")
+        try:
+            started = time.perf_counter()
+            result = await self._page.evaluate(SNAPSHOT_SCRIPT, MAX_NAME_LENGTH)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            return DomSnapshot.from_script_result(result, elapsed_ms)
+        except Exception as e:
+            raise Exception(f"Failed to snapshot page: {str(e)}")
+
+    async def snapshot_dom(
+        self, max_tokens: int = DEFAULT_SNAPSHOT_TOKENS, incremental: bool = True
+    ) -> str:
+        """
+        Render the page for LLM planning within a token budget.
+
+        With `incremental` only the changes since the previous snapshot of
+        the same url are rendered. Diffs are taken against what the planner
+        was sent, elements cut by the budget show up in later snapshots.
+        """
+        snapshot = await self.extract_dom_snapshot()
+        previous = self._last_dom_snapshot
+        diff = snapshot.diff(previous) if incremental else None
+        if diff is not None and previous is not None:
+            text, self._last_dom_snapshot = diff.render_with_baseline(
+                previous, max_tokens
+            )
+        else:
+            text, self._last_dom_snapshot = snapshot.render_with_baseline(max_tokens)
+        return text
+
     async def check_element_contains_text(self, selector: str, text: str) -> bool:
         if self._page is None:
             raise RuntimeError("Browser page is not initialized.")
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from om11.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Exported as the captcha.breaker_state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Outcomes judged per provider, older than the max age are dropped
+BREAKER_WINDOW = 20
+BREAKER_MAX_AGE = 300.0
+# The breaker opens at this share of failed or slow calls, once it has enough
+FAILURE_THRESHOLD = 0.5
+MIN_CALLS = 5
+# A solve slower than this counts as failed, polls time out at 120s
+SLOW_CALL_SECONDS = 90.0
+# Open time before a probe, doubled after every failed probe
+OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 300.0
+PROBE_INTERVAL = 5.0
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's breaker is open, the solve was not sent"""
+
+
+class Permit:
+    """Lets one call through, handed back to record() or release()"""
+
+    __slots__ = ("trial",)
+
+    def __init__(self, trial: bool = False):
+        self.trial = trial
+
+
+class CircuitBreaker:
+    """
+    Closed, open and half-open states for one provider.
+
+    Closed lets every call through and opens once the failure rate of the
+    recent calls, slow ones included, reaches the threshold. Open refuses
+    calls until its open time has passed, then half-open lets one trial
+    through: a real solve or a probe. Success closes the breaker, failure
+    opens it again for twice as long. Only the holder of the trial permit
+    decides the trial, late results of calls started before are ignored.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.state = CLOSED
+        self.outcomes: Deque[Tuple[float, bool]] = deque(maxlen=BREAKER_WINDOW)
+        self.open_until = 0.0
+        self.open_seconds = OPEN_SECONDS
+        # The permit of the running half-open trial
+        self.trial: Optional[Permit] = None
+        self._export()
+
+    def available(self, now: Optional[float] = None) -> bool:
+        """Whether a call would be let through, without taking the trial"""
+        now = time.monotonic() if now is None else now
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now < self.open_until:
+            return False
+        return self.trial is None
+
+    def acquire(self, now: Optional[float] = None) -> Optional[Permit]:
+        """A permit for one call, None when the breaker refuses it"""
+        now = time.monotonic() if now is None else now
+        if not self.available(now):
+            return None
+        if self.state == OPEN:
+            self._move(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self.trial = Permit(trial=True)
+            return self.trial
+        return Permit()
+
+    def release(self, permit: Optional[Permit] = None) -> None:
+        """The call ended without saying anything about the provider"""
+        if permit is not None and permit is self.trial:
+            self.trial = None
+
+    def record(
+        self,
+        success: bool,
+        seconds: float,
+        now: Optional[float] = None,
+        permit: Optional[Permit] = None,
+    ) -> None:
+        now = time.monotonic() if now is None else now
+        success = success and seconds < SLOW_CALL_SECONDS
+        if self.state == HALF_OPEN:
+            if permit is None or permit is not self.trial:
+                # Another call holds the trial
+                return
+            self.trial = None
+            if success:
+                self.outcomes.clear()
+                self.open_seconds = OPEN_SECONDS
+                self._move(CLOSED)
+            else:
+                self.open_seconds = min(MAX_OPEN_SECONDS, self.open_seconds * 2)
+                self._open(now)
+            return
+        if self.state != CLOSED:
+            # Late result of a call started before the breaker opened
+            return
+        self.outcomes.append((now, success))
+        while self.outcomes and now - self.outcomes[0][0] > BREAKER_MAX_AGE:
+            self.outcomes.popleft()
+        failures = sum(1 for _, ok in self.outcomes if not ok)
+        if (
+            len(self.outcomes) >= MIN_CALLS
+            and failures / len(self.outcomes) >= FAILURE_THRESHOLD
+        ):
+            self._open(now)
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.monotonic() if now is None else now
+        return {
+            "state": self.state,
+            "calls": len(self.outcomes),
+            "failures": sum(1 for _, ok in self.outcomes if not ok),
+            "retry_in": max(0.0, self.open_until - now) if self.state == OPEN else 0.0,
+        }
+
+    def _open(self, now: float) -> None:
+        self.open_until = now + self.open_seconds
+        self.outcomes.clear()
+        self._move(OPEN)
+
+    def _move(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.info(f"Captcha provider {self.provider} circuit {self.state} -> {state}")
+        self.state = state
+        metrics.increment(
+            "captcha.breaker_transitions",
+            labels={"provider": self.provider, "state": state},
+        )
+        self._export()
+
+    def _export(self) -> None:
+        metrics.set_gauge(
+            "captcha.breaker_state",
+            STATE_VALUES[self.state],
+            {"provider": self.provider},
+        )
+
+
+# Checks the provider API without solving anything, raises if it is down
+ProbeFunc = Callable[[str], Awaitable[Any]]
+
+
+class ProviderBreakers:
+    """
+    The circuit breakers of all providers, shared by every solver.
+
+    Open providers are routed around at once instead of waiting for their
+    HTTP errors or poll timeouts. Traffic alone may never reach a provider
+    the router avoids, so start() also probes every breaker whose open time
+    has passed, using `probe`.
+    """
+
+    def __init__(
+        self, probe: Optional[ProbeFunc] = None, interval: float = PROBE_INTERVAL
+    ):
+        self.probe = probe
+        self.interval = interval
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+    def routable(self, providers: List[str]) -> List[str]:
+        """The providers whose breaker lets calls through, all if none does"""
+        available = [name for name in providers if self.breaker(name).available()]
+        return available or list(providers)
+
+    async def probe_due(self, now: Optional[float] = None) -> int:
+        """Probe every provider due for a trial, returns how many were probed"""
+        probe = self.probe
+        if probe is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        due = []
+        for breaker in self._breakers.values():
+            if breaker.state == CLOSED:
+                continue
+            permit = breaker.acquire(now)
+            if permit is not None:
+                due.append((breaker, permit))
+        await asyncio.gather(
+            *(self._probe(probe, breaker, permit) for breaker, permit in due)
+        )
+        return len(due)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe_due()
+
+    async def _probe(
+        self, probe: ProbeFunc, breaker: CircuitBreaker, permit: Permit
+    ) -> None:
+        started = time.monotonic()
+        try:
+            await probe(breaker.provider)
+        except asyncio.CancelledError:
+            breaker.release(permit)
+            raise
+        except Exception as e:
+            metrics.increment(
+                "captcha.breaker_probes",
+                labels={"provider": breaker.provider, "result": "failed"},
+            )
+            logger.warning(f"Captcha provider {breaker.provider} probe failed: {e}")
+            breaker.record(False, time.monotonic() - started, permit=permit)
+            return
+        metrics.increment(
+            "captcha.breaker_probes",
+            labels={"provider": breaker.provider, "result": "ok"},
+        )
+        breaker.record(True, time.monotonic() - started, permit=permit)
@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from om11.metrics import metrics
+
+DETECTION_CACHE_SIZE = 1024
+DETECTION_CACHE_TTL = 600.0
+
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+@dataclass
+class DetectionEntry:
+    captcha_type: Any
+    params: Dict[str, Any]
+    # Page the params were detected on, its url is swapped for the current one
+    page_url: str
+    expires_at: float
+
+
+class DetectionCache:
+    """
+    Captcha detections shared by every solver of the process.
+
+    Entries are keyed by page origin plus the widget fingerprint computed
+    in the page by DETECT_CAPTCHA_SCRIPT, so a changed or re-rendered widget
+    (new sitekey, new challenge, different visibility) misses by itself.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self, max_entries: int = DETECTION_CACHE_SIZE, ttl: float = DETECTION_CACHE_TTL
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], DetectionEntry]" = OrderedDict()
+        self._by_origin: Dict[str, Set[str]] = {}
+
+    def known(self, url: str, now: Optional[float] = None) -> List[str]:
+        """Fresh fingerprints for the origin of `url`"""
+        origin = origin_of(url)
+        now = time.monotonic() if now is None else now
+        for fingerprint in list(self._by_origin.get(origin, ())):
+            if self._entries[(origin, fingerprint)].expires_at <= now:
+                self._remove((origin, fingerprint))
+        return sorted(self._by_origin.get(origin, ()))
+
+    def get(
+        self, url: str, fingerprint: str, now: Optional[float] = None
+    ) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        key = (origin_of(url), fingerprint)
+        entry = self._entries.get(key)
+        now = time.monotonic() if now is None else now
+        if entry is None or entry.expires_at <= now:
+            if entry is not None:
+                self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        self._record(hit=True)
+        params = dict(entry.params)
+        if params.get("url") == entry.page_url:
+            params["url"] = url
+        return entry.captcha_type, params
+
+    def put(
+        self,
+        url: str,
+        fingerprint: str,
+        captcha_type: Any,
+        params: Dict[str, Any],
+        now: Optional[float] = None,
+    ) -> None:
+        key = (origin_of(url), fingerprint)
+        now = time.monotonic() if now is None else now
+        self._entries[key] = DetectionEntry(
+            captcha_type, dict(params), url, now + self.ttl
+        )
+        self._entries.move_to_end(key)
+        self._by_origin.setdefault(key[0], set()).add(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+        metrics.set_gauge("captcha.detect_cache_size", len(self._entries))
+
+    def invalidate(self, url: Optional[str] = None) -> None:
+        """Drop the entries of the origin of `url`, or all of them"""
+        if url is None:
+            self._entries.clear()
+            self._by_origin.clear()
+        else:
+            origin = origin_of(url)
+            for fingerprint in list(self._by_origin.get(origin, ())):
+                self._remove((origin, fingerprint))
+        metrics.set_gauge("captcha.detect_cache_size", len(self._entries))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        fingerprints = self._by_origin.get(key[0])
+        if fingerprints is not None:
+            fingerprints.discard(key[1])
+            if not fingerprints:
+                del self._by_origin[key[0]]
+
+    def record_miss(self) -> None:
+        """Count a detection that needed the full page scan"""
+        self._record(hit=False)
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.increment(
+            "captcha.detect_cache", labels={"result": "hit" if hit else "miss"}
+        )
+        metrics.set_gauge("captcha.detect_cache_hit_rate", self.hit_rate)
+
+
+detection_cache = DetectionCache()
@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, TypeVar
+
+from om11.metrics import metrics
+from om11.task.captcha_polling import SolveTimeModel
+
+# The fallback starts once the main provider is slower than this percentile
+HEDGE_PERCENTILE = 0.9
+# Hedge delay while there is no solve time history
+DEFAULT_HEDGE_DELAY = 20.0
+MIN_HEDGE_DELAY = 3.0
+# Long-run share of solves allowed to hedge, with a small burst allowance
+HEDGE_RATE = 0.1
+HEDGE_BURST = 5.0
+
+T = TypeVar("T")
+
+
+class HedgeBudget:
+    """
+    Token bucket capping how often hedging fires.
+
+    Every solve earns `rate` tokens up to `burst`, every hedge spends one,
+    so at most about `rate` of all solves pay for a second provider task.
+    """
+
+    def __init__(self, rate: float = HEDGE_RATE, burst: float = HEDGE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+
+    def on_solve(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.rate)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+hedge_budget = HedgeBudget()
+
+
+def hedge_delay(
+    model: SolveTimeModel,
+    provider: str,
+    captcha_type: str,
+    q: float = HEDGE_PERCENTILE,
+) -> float:
+    """Seconds to wait for `provider` before hedging, from its solve times"""
+    value = model.percentile(provider, captcha_type, q)
+    if value is None:
+        return DEFAULT_HEDGE_DELAY
+    return max(MIN_HEDGE_DELAY, value)
+
+
+async def hedged_race(
+    primary: Callable[[], Coroutine[Any, Any, T]],
+    secondary: Callable[[], Coroutine[Any, Any, T]],
+    delay: float,
+    budget: Optional[HedgeBudget] = None,
+    is_valid: Callable[[T], bool] = bool,
+) -> Tuple[T, str]:
+    """
+    Run `primary`, and `secondary` too if primary has not finished after
+    `delay` seconds and the budget allows it. The first valid result wins
+    and the other task is cancelled.
+
+    A primary failure starts `secondary` right away, as a plain fallback.
+    Returns the result and "main" or "fallback".
+    """
+    budget = budget or hedge_budget
+    budget.on_solve()
+    tasks: Dict[asyncio.Task, str] = {asyncio.create_task(primary()): "main"}
+    errors: List[BaseException] = []
+    try:
+        hedged = False
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            if budget.try_spend():
+                hedged = True
+                metrics.increment("captcha.hedges")
+                tasks[asyncio.create_task(secondary())] = "fallback"
+            else:
+                metrics.increment("captcha.hedges_skipped")
+
+        fallback_started = hedged
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                label = tasks.pop(task)
+                try:
+                    result = task.result()
+                    if not is_valid(result):
+                        raise ValueError(f"{label} provider returned no token")
+                except Exception as e:
+                    errors.append(e)
+                    if not fallback_started:
+                        fallback_started = True
+                        tasks[asyncio.create_task(secondary())] = "fallback"
+                    continue
+                if hedged:
+                    metrics.increment("captcha.hedge_wins", labels={"winner": label})
+                return result, label
+        raise errors[-1]
+    finally:
+        # The provider side task of the loser is abandoned, none can be cancelled
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+# Provider APIs are few hosts, so the per-host limit is what matters
+TOTAL_CONNECTIONS = 128
+CONNECTIONS_PER_HOST = 32
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+
+class CaptchaHTTPPool:
+    """
+    Process-wide aiohttp session for captcha provider traffic.
+
+    Every solver shares the same connector, so TCP and TLS connections to
+    the providers are kept alive and reused between solves and DNS answers
+    are cached. The session is created lazily on the running loop and
+    closed on application shutdown.
+    """
+
+    def __init__(
+        self,
+        limit: int = TOTAL_CONNECTIONS,
+        limit_per_host: int = CONNECTIONS_PER_HOST,
+        dns_cache_ttl: int = DNS_CACHE_TTL,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        # A session is bound to the loop it was created on
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=REQUEST_TIMEOUT
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+captcha_http = CaptchaHTTPPool()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from om11.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+API_KEYS_PATH = "instance/api_keys/api_keys.json"
+# The file's mtime is checked at most this often
+RELOAD_CHECK_INTERVAL = 5.0
+# Per-key rate limits count uses over this many seconds
+RATE_WINDOW = 60.0
+# Keys whose provider rejects them are skipped for this long. Matched
+# case-insensitively against the error, providers differ in codes and text.
+AUTH_ERRORS = (
+    "ERROR_KEY_DOES_NOT_EXIST",
+    "ERROR_WRONG_USER_KEY",
+    "ERROR_KEY_DENIED_ACCESS",
+    "ERROR_IP_NOT_ALLOWED",
+    "ERROR_IP_BANNED",
+    "ERROR_ACCOUNT_SUSPENDED",
+    "ERROR_INVALID_CLIENTKEY",
+)
+AUTH_COOLDOWN = 1800.0
+BALANCE_ERRORS = ("ERROR_ZERO_BALANCE", "ERROR_NO_BALANCE", "insufficient balance")
+BALANCE_COOLDOWN = 600.0
+
+
+@dataclass
+class ApiKey:
+    provider: str
+    key: str
+    max_per_minute: Optional[int] = None
+    uses: Deque[float] = field(default_factory=deque)
+    cooldown_until: float = 0.0
+
+    def available(self, now: float) -> bool:
+        if now < self.cooldown_until:
+            return False
+        while self.uses and now - self.uses[0] >= RATE_WINDOW:
+            self.uses.popleft()
+        return self.max_per_minute is None or len(self.uses) < self.max_per_minute
+
+
+def cooldown_for(error: Any) -> Optional[Tuple[str, float]]:
+    """Reason and seconds to rest a key after `error`, None if the key is fine"""
+    message = str(error).lower()
+    if any(code.lower() in message for code in BALANCE_ERRORS):
+        return "balance", BALANCE_COOLDOWN
+    if any(code.lower() in message for code in AUTH_ERRORS):
+        return "auth", AUTH_COOLDOWN
+    return None
+
+
+class ApiKeyStore:
+    """
+    Captcha provider api keys, loaded once and reloaded when the file changes.
+
+    The file maps providers to one key, a list of keys, or entries with a
+    per-key rate limit:
+    {"capmonster": "key", "capsolver": ["key1", {"key": "key2", "max_per_minute": 30}]}
+
+    Keys of a provider are handed out round-robin, skipping keys at their
+    rate limit and keys resting after an auth or balance error. Reloading
+    keeps the usage and cooldown of keys that are still listed.
+    """
+
+    def __init__(
+        self, path: str = API_KEYS_PATH, check_interval: float = RELOAD_CHECK_INTERVAL
+    ):
+        self.path = path
+        self.check_interval = check_interval
+        self._keys: Dict[str, List[ApiKey]] = {}
+        self._by_key: Dict[Tuple[str, str], ApiKey] = {}
+        self._next: Dict[str, int] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+
+    async def refresh(self, force: bool = False) -> None:
+        """Reload the file if it changed, the check is throttled and off the loop"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = await asyncio.to_thread(os.path.getmtime, self.path)
+        except OSError:
+            # Keep the keys we have, the file may be mid-replace
+            return
+        if mtime == self._mtime and not force:
+            return
+        try:
+            raw = await asyncio.to_thread(self._read)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Captcha api keys not reloaded from {self.path}: {e}")
+            return
+        self._mtime = mtime
+        self.load(raw)
+
+    def _read(self) -> Dict[str, Any]:
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def load(self, raw: Dict[str, Any]) -> None:
+        keys: Dict[str, List[ApiKey]] = {}
+        by_key: Dict[Tuple[str, str], ApiKey] = {}
+        for provider, entries in raw.items():
+            if not isinstance(entries, list):
+                entries = [entries]
+            for entry in entries:
+                if isinstance(entry, str):
+                    entry = {"key": entry}
+                if not entry or not entry.get("key"):
+                    continue
+                api_key = self._by_key.get((provider, entry["key"])) or ApiKey(
+                    provider, entry["key"]
+                )
+                limit = entry.get("max_per_minute")
+                api_key.max_per_minute = None if limit is None else int(limit)
+                keys.setdefault(provider, []).append(api_key)
+                by_key[(provider, api_key.key)] = api_key
+        self._keys = keys
+        self._by_key = by_key
+
+    def next_key(self, provider: str, now: Optional[float] = None) -> Optional[str]:
+        """The provider's next usable key round-robin, None if all are resting"""
+        now = time.monotonic() if now is None else now
+        keys = self._keys.get(provider) or []
+        start = self._next.get(provider, 0)
+        for offset in range(len(keys)):
+            api_key = keys[(start + offset) % len(keys)]
+            if api_key.available(now):
+                self._next[provider] = (start + offset + 1) % len(keys)
+                return api_key.key
+        return None
+
+    def pick(self, now: Optional[float] = None) -> Dict[str, str]:
+        """One usable key per provider, for CaptchaSolver.solve(api_keys=...)"""
+        picked = {}
+        for provider in self._keys:
+            key = self.next_key(provider, now)
+            if key:
+                picked[provider] = key
+        return picked
+
+    def record_use(self, provider: str, key: str, now: Optional[float] = None) -> None:
+        api_key = self._by_key.get((provider, key))
+        if api_key is not None:
+            api_key.uses.append(time.monotonic() if now is None else now)
+
+    def report_failure(
+        self, provider: str, key: str, error: Any, now: Optional[float] = None
+    ) -> bool:
+        """Rest the key if `error` is an auth or balance error, True if it was"""
+        api_key = self._by_key.get((provider, key))
+        cooldown = cooldown_for(error)
+        if api_key is None or cooldown is None:
+            return False
+        reason, seconds = cooldown
+        api_key.cooldown_until = (time.monotonic() if now is None else now) + seconds
+        metrics.increment(
+            "captcha.key_cooldown", labels={"provider": provider, "reason": reason}
+        )
+        logger.warning(
+            f"{provider} key ...{key[-4:]} rests {seconds:.0f}s after {reason} error"
+        )
+        return True
+
+    def stats(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        now = time.monotonic() if now is None else now
+        return [
+            {
+                "provider": api_key.provider,
+                "key": f"...{api_key.key[-4:]}",
+                "available": api_key.available(now),
+                "uses_per_minute": len(api_key.uses),
+                "max_per_minute": api_key.max_per_minute,
+                "cooldown": max(0.0, api_key.cooldown_until - now),
+            }
+            for keys in self._keys.values()
+            for api_key in keys
+        ]
+
+
+# Shared by every solver of the process, see Tasks.solve_best_captcha
+api_key_store = ApiKeyStore()
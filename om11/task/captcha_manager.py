@@ -1,11 +1,24 @@
 import asyncio
+import time
 from dataclasses import dataclass
 from enum import Enum
 from typing import Any, Dict, Optional, Tuple
 
 import aiohttp
 
+from om11.task.captcha_breaker import CircuitOpenError, ProviderBreakers
+from om11.task.captcha_cache import DetectionCache, detection_cache
+from om11.task.captcha_hedging import hedge_delay, hedged_race
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_keys import ApiKeyStore, api_key_store, cooldown_for
+from om11.task.captcha_polling import PollScheduler, poll_scheduler
+from om11.task.captcha_routing import ProviderRouter
+from om11.task.captcha_solve_service import CaptchaSolveService, captcha_solve_service
+from om11.task.captcha_token_pool import PoolKey, TokenPool
 from om11.task.captchas import (
+    DETECT_CAPTCHA_SCRIPT,
+    DETECTION_PRIORITY,
+    FRAME_SCAN_DEPTH,
     FunCaptcha,
     GeetestV3,
     GeetestV4,
@@ -30,6 +43,7 @@ class CaptchaType(Enum):
 
 
 # --- CAPTCHA PROVIDER CONFIG ---
+# Starting preference only, the router ranks providers by recent outcomes
 CAPTCHA_PROVIDERS = {
     CaptchaType.RECAPTCHA_V2: {"main": "capmonster", "fallback": "anticaptcha"},
     CaptchaType.RECAPTCHA_V3: {"main": "capmonster", "fallback": "capsolver"},
@@ -43,6 +57,20 @@ CAPTCHA_PROVIDERS = {
 }
 
 
+# Base urls of the provider HTTP APIs, overridable per solver
+PROVIDER_API_URLS = {
+    "capmonster": "https://api.capmonster.cloud",
+    "anticaptcha": "https://api.anti-captcha.com",
+    "capsolver": "https://api.capsolver.com",
+}
+
+provider_router = ProviderRouter(
+    priors={
+        captcha_type.value: roles for captcha_type, roles in CAPTCHA_PROVIDERS.items()
+    }
+)
+
+
 @dataclass
 class CaptchaSolution:
     token: str
@@ -63,10 +91,34 @@ class CaptchaSolver:
     await solver.solve(api_keys=api_keys)
     """
 
-    def __init__(self, page):
+    def __init__(
+        self,
+        page,
+        session: Optional[aiohttp.ClientSession] = None,
+        api_urls: Optional[Dict[str, str]] = None,
+        router: Optional[ProviderRouter] = None,
+        cache: Optional[DetectionCache] = None,
+        pool: Optional[TokenPool] = None,
+        scheduler: Optional[PollScheduler] = None,
+        keys: Optional[ApiKeyStore] = None,
+        solve_service: Optional[CaptchaSolveService] = None,
+        breakers: Optional[ProviderBreakers] = None,
+    ):
         self.page = page
-        self.session = aiohttp.ClientSession()
-        self._captcha_cache: Dict[str, Tuple[str, Dict]] = {}
+        self.router = router or provider_router
+        # Provider connections are pooled process-wide, see captcha_http
+        self.session = session or captcha_http.session()
+        self.api_urls = {**PROVIDER_API_URLS, **(api_urls or {})}
+        # Detections are shared process-wide, see captcha_cache
+        self.cache = cache if cache is not None else detection_cache
+        self.pool = pool if pool is not None else token_pool
+        self.scheduler = scheduler or poll_scheduler
+        # Usage and auth/balance errors of the keys, see captcha_keys
+        self.keys = keys or api_key_store
+        # Per-provider concurrency and rate limits, see captcha_solve_service
+        self.solve_service = solve_service or captcha_solve_service
+        # Per-provider circuit breakers, see captcha_breaker
+        self.breakers = breakers or provider_breakers
         self.captcha_classes = {
             CaptchaType.RECAPTCHA_V2: ReCaptchaV2,
             CaptchaType.RECAPTCHA_V3: ReCaptchaV3,
@@ -78,31 +130,49 @@ class CaptchaSolver:
         }
 
     async def close(self):
-        await self.session.close()
+        # The session is shared or owned by the caller, nothing to release
+        pass
 
     async def detect(self) -> Optional[Tuple[str, Dict[str, Any]]]:
         """Detect captcha and return type with parameters"""
-        url = await self.page.url
-        cached_result = self._captcha_cache.get(url)
-
-        if cached_result:
-            print(f"Используем кэш для {url}: {cached_result[0]}")
-            return cached_result
-
-        for captcha_type, captcha_class in self.captcha_classes.items():
-            if await self.page.evaluate(captcha_class.DETECT_SCRIPT):
-                params = await self.page.evaluate(captcha_class.DATA_SCRIPT)
-                self._captcha_cache[url] = (captcha_type, params)
-                print(f"Кэш обновлён для {url}: {captcha_type}")
-                return captcha_type, params
-        return None
+        url = self.page.url
+        # One round trip for every type, the page and its iframes. The page
+        # skips the scan when its widget fingerprint is already cached.
+        known = self.cache.known(url)
+        detected = await self.page.evaluate(
+            DETECT_CAPTCHA_SCRIPT, [list(DETECTION_PRIORITY), FRAME_SCAN_DEPTH, known]
+        )
+        if detected and detected.get("cached"):
+            cached_result = self.cache.get(url, detected["fingerprint"])
+            if cached_result:
+                print(f"Используем кэш для {url}: {cached_result[0]}")
+                return cached_result
+            # Expired since `known` was taken, scan again
+            detected = await self.page.evaluate(
+                DETECT_CAPTCHA_SCRIPT, [list(DETECTION_PRIORITY), FRAME_SCAN_DEPTH, []]
+            )
+        if not detected or not detected.get("type"):
+            return None
+        self.cache.record_miss()
+        captcha_type = CaptchaType(detected["type"])
+        params = detected["params"]
+        self.cache.put(url, detected["fingerprint"], captcha_type, params)
+        print(f"Кэш обновлён для {url}: {captcha_type}")
+        return captcha_type, params
 
     async def solve(
         self,
         service: str = "auto",
         api_key: str | None = None,
         api_keys: Dict[str, str] | None = None,
+        hedge: bool = False,
     ) -> bool:
+        """
+        Detect and solve the captcha on the page.
+
+        With `hedge` the fallback provider is started in parallel once the
+        main one is slower than its usual p90 solve time, see captcha_hedging.
+        """
         detection_result = await self.detect()
         if not detection_result:
             return False  # captcha not detected
@@ -114,14 +184,33 @@ class CaptchaSolver:
                 f"Detected captcha type '{captcha_type}' is not supported."
             )
 
-        # Determine main service if 'auto'
-        if service == "auto":
-            main_service = CAPTCHA_PROVIDERS[captcha_type]["main"]
-        else:
-            main_service = service
+        # A pre-solved token for this widget skips the providers entirely
+        pooled = self.pool.take(captcha_type.value, params)
+        if pooled is not None:
+            captcha_class = self.captcha_classes[captcha_type]
+            await self.page.evaluate(captcha_class.SUBMIT_SCRIPT, pooled.__dict__)
+            return True
 
-        # Determine fallback service
-        fallback_service = CAPTCHA_PROVIDERS[captcha_type]["fallback"]
+        # Rank the providers we have keys for, a single key keeps the static main
+        if api_keys:
+            candidates = [name for name in PROVIDER_API_URLS if api_keys.get(name)]
+        else:
+            candidates = list(PROVIDER_API_URLS)
+        candidates = [name for name in candidates if self.supports(name, captcha_type)]
+        # Providers with an open circuit are routed around while others remain
+        candidates = self.breakers.routable(candidates)
+        if service == "auto" and api_keys:
+            main_service, fallback_service = self.router.choose(
+                captcha_type.value, candidates
+            )
+        else:
+            if service == "auto":
+                main_service = CAPTCHA_PROVIDERS[captcha_type]["main"]
+            else:
+                main_service = service
+            others = [name for name in candidates if name != main_service]
+            ranked = self.router.rank(captcha_type.value, others)
+            fallback_service = ranked[0] if ranked else None
 
         # Select API key for main and fallback
         # Assuming `api_keys` dict contains keys for all services
@@ -129,14 +218,32 @@ class CaptchaSolver:
         fallback_api_key = None
         if api_keys:
             main_api_key = api_keys.get(main_service)
-            fallback_api_key = api_keys.get(fallback_service)
+            if fallback_service:
+                fallback_api_key = api_keys.get(fallback_service)
         else:
             main_api_key = api_key
 
+        if (
+            hedge
+            and main_api_key
+            and fallback_service
+            and fallback_api_key
+            and fallback_service != main_service
+        ):
+            solution = await self._solve_hedged(
+                captcha_type,
+                params,
+                (main_service, main_api_key),
+                (fallback_service, fallback_api_key),
+            )
+            captcha_class = self.captcha_classes[captcha_type]
+            await self.page.evaluate(captcha_class.SUBMIT_SCRIPT, solution.__dict__)
+            return True
+
         # First attempt with main service
         try:
             if main_api_key:
-                solution: CaptchaSolution = await self._solve_with_service(
+                solution: CaptchaSolution = await self._solve_direct(
                     main_service, captcha_type, main_api_key, params
                 )
             else:
@@ -144,9 +251,12 @@ class CaptchaSolver:
         except Exception as e:
             # Log or handle the exception
             print(f"Main service '{main_service}' failed: {e}")
-            # Try fallback service
+            # One fallback, picked above from the routable providers, with its own key
+            if not fallback_service or fallback_service == main_service:
+                raise
             try:
-                self._captcha_cache.clear()
+                # The failed solve may have consumed or refreshed the widget
+                self.cache.invalidate(self.page.url)
 
                 detection_result = await self.detect()
                 if not detection_result:
@@ -154,11 +264,11 @@ class CaptchaSolver:
 
                 captcha_type, params = detection_result
                 if fallback_api_key:
-                    solution: CaptchaSolution = await self._solve_with_service(
+                    solution: CaptchaSolution = await self._solve_direct(
                         fallback_service, captcha_type, fallback_api_key, params
                     )
                 else:
-                    raise ValueError("Invalid api key for service {fallback_service}")
+                    raise ValueError(f"Invalid api key for service {fallback_service}")
             except Exception as fallback_e:
                 print(
                     f"Fallback service '{fallback_service}' also failed: {fallback_e}"
@@ -170,38 +280,117 @@ class CaptchaSolver:
         await self.page.evaluate(captcha_class.SUBMIT_SCRIPT, solution.__dict__)
         return True
 
-    async def _solve_with_service(
+    async def _solve_direct(
+        self,
+        service: str,
+        captcha_type: CaptchaType,
+        api_key: str,
+        params: Dict[str, Any],
+        background: bool = False,
+    ) -> CaptchaSolution:
+        """Solve with exactly this service, without falling back"""
+        # An open provider fails at once instead of after its timeouts
+        if not self.breakers.breaker(service).available():
+            raise CircuitOpenError(f"{service} circuit is open")
+        # Provider limits apply across sessions, identical solves of one
+        # page share a task; tokens are single-use so pages never share.
+        dedup_key = None
+        if self.page is not None:
+            dedup_key = (
+                self.page,
+                service,
+                captcha_type.value,
+                params.get("sitekey"),
+                params.get("url"),
+                params.get("action"),
+            )
+        return await self.solve_service.submit(
+            service,
+            lambda: self._solve_recorded(service, captcha_type, api_key, params),
+            dedup_key,
+            background=background,
+        )
+
+    async def _solve_recorded(
         self,
         service: str,
         captcha_type: CaptchaType,
         api_key: str,
         params: Dict[str, Any],
     ) -> CaptchaSolution:
-        """Route to appropriate solver based on service"""
+        """One provider solve, its outcome recorded for routing, key and breaker"""
+        breaker = self.breakers.breaker(service)
+        permit = breaker.acquire()
+        if permit is None:
+            raise CircuitOpenError(f"{service} circuit is {breaker.state}")
+        started = time.monotonic()
+        self.keys.record_use(service, api_key)
         try:
-            if service == "capmonster":
-                return await self._solve_capmonster(captcha_type, api_key, params)
-            elif service == "anticaptcha":
-                return await self._solve_anticaptcha(captcha_type, api_key, params)
-            elif service == "capsolver":
-                return await self._solve_capsolver(captcha_type, api_key, params)
+            solution = await self._call_service(service, captcha_type, api_key, params)
+        except asyncio.CancelledError:
+            breaker.release(permit)
+            raise
+        except Exception as e:
+            elapsed = time.monotonic() - started
+            if isinstance(e, ValueError) or cooldown_for(e):
+                # A bad request or key, not a provider outage
+                breaker.release(permit)
             else:
-                raise ValueError(f"Unsupported service: {service}")
-        except Exception:
-            fallback_service = CAPTCHA_PROVIDERS[captcha_type]["fallback"]
-            if fallback_service != service:
-                solution: CaptchaSolution = await self._solve_with_service(
-                    fallback_service, captcha_type, api_key, params
-                )
-                return solution
+                breaker.record(False, elapsed, permit=permit)
+            self.keys.report_failure(service, api_key, e)
+            self.router.record(service, captcha_type.value, False, elapsed)
+            self.router.persist_soon()
             raise
+        elapsed = time.monotonic() - started
+        breaker.record(bool(solution.token), elapsed, permit=permit)
+        self.router.record(service, captcha_type.value, bool(solution.token), elapsed)
+        self.router.persist_soon()
+        return solution
+
+    async def _call_service(
+        self,
+        service: str,
+        captcha_type: CaptchaType,
+        api_key: str,
+        params: Dict[str, Any],
+    ) -> CaptchaSolution:
+        if service == "capmonster":
+            return await self._solve_capmonster(captcha_type, api_key, params)
+        elif service == "anticaptcha":
+            return await self._solve_anticaptcha(captcha_type, api_key, params)
+        elif service == "capsolver":
+            return await self._solve_capsolver(captcha_type, api_key, params)
+        else:
+            raise ValueError(f"Unsupported service: {service}")
+
+    async def _solve_hedged(
+        self,
+        captcha_type: CaptchaType,
+        params: Dict[str, Any],
+        main: Tuple[str, str],
+        fallback: Tuple[str, str],
+    ) -> CaptchaSolution:
+        """Race main and fallback, the fallback starting after the hedge delay"""
+        (main_service, main_key), (fallback_service, fallback_key) = main, fallback
+        delay = hedge_delay(self.scheduler.model, main_service, captcha_type.value)
+        solution, winner = await hedged_race(
+            lambda: self._solve_direct(main_service, captcha_type, main_key, params),
+            lambda: self._solve_direct(
+                fallback_service, captcha_type, fallback_key, params
+            ),
+            delay,
+            is_valid=lambda solution: bool(solution.token),
+        )
+        if winner == "fallback":
+            print(f"Fallback service '{fallback_service}' solved {captcha_type}")
+        return solution
 
     # --- SERVICE IMPLEMENTATIONS ---
     async def _solve_capmonster(
         self, captcha_type: CaptchaType, api_key: str, params: Dict[str, Any]
     ) -> CaptchaSolution:
         """CapMonster Cloud API implementation"""
-        url: str = "https://api.capmonster.cloud/createTask"
+        url: str = f"{self.api_urls['capmonster']}/createTask"
         data: Dict[str, Any] = {
             "clientKey": api_key,
             "task": {
@@ -250,138 +439,177 @@ class CaptchaSolver:
                 )
             task_id = result["taskId"]
 
-        return await self._poll_capmonster(api_key, task_id)
-
-    async def _poll_capmonster(
-        self, api_key: str, task_id: str, timeout: int = 120
-    ) -> CaptchaSolution:
-        """Poll CapMonster for solution"""
-        url = "https://api.capmonster.cloud/getTaskResult"
-        for _ in range(timeout // 5):
-            await asyncio.sleep(5)
-            async with self.session.post(
-                url, json={"clientKey": api_key, "taskId": task_id}
-            ) as resp:
-                result = await resp.json()
-                if result["status"] == "ready":
-                    return CaptchaSolution(
-                        token=result["solution"]["gRecaptchaResponse"]
-                    )
-                elif result["status"] == "failed":
-                    raise RuntimeError("CapMonster task failed")
-        raise TimeoutError("CapMonster timeout")
+        return await self._poll_task(
+            "capmonster", "CapMonster", api_key, task_id, captcha_type=captcha_type
+        )
 
     async def _solve_anticaptcha(
         self, captcha_type: CaptchaType, api_key: str, params: Dict[str, Any]
     ) -> CaptchaSolution:
         """Anti-Captcha API implementation"""
-        from python_anticaptcha import AnticaptchaClient
-        from python_anticaptcha.tasks import (
-            FunCaptchaTaskProxyless,
-            GeeTestTaskProxyless,
-            HCaptchaTaskProxyless,
-            RecaptchaV2TaskProxyless,
-            RecaptchaV3TaskProxyless,
-        )
-
-        client = AnticaptchaClient(api_key)
+        url: str = f"{self.api_urls['anticaptcha']}/createTask"
+        task: Dict[str, Any] = {
+            "type": self._get_anticaptcha_task_type(captcha_type),
+            "websiteURL": params["url"],
+        }
 
         if captcha_type == CaptchaType.RECAPTCHA_V2:
-            task = RecaptchaV2TaskProxyless(
-                website_url=params["url"], website_key=params["sitekey"]
-            )
+            task["websiteKey"] = params["sitekey"]
         elif captcha_type == CaptchaType.RECAPTCHA_V3:
-            task = RecaptchaV3TaskProxyless(
-                website_url=params["url"],
-                website_key=params["sitekey"],
-                min_score=0.5,
-                page_action=params.get("action", "verify"),
-            )
+            task["websiteKey"] = params["sitekey"]
+            task["minScore"] = 0.5
+            task["pageAction"] = params.get("action", "verify")
         elif captcha_type == CaptchaType.HCAPTCHA:
-            task = HCaptchaTaskProxyless(
-                website_url=params["url"], website_key=params["sitekey"]
-            )
+            task["websiteKey"] = params["sitekey"]
         elif captcha_type == CaptchaType.FUNCAPTCHA:
-            task = FunCaptchaTaskProxyless(
-                website_url=params["url"], website_public_key=params["public_key"]
-            )
-        elif captcha_type in (CaptchaType.GEETEST_V3, CaptchaType.GEETEST_V4):
-            task = GeeTestTaskProxyless(
-                website_url=params["url"],
-                gt=(
-                    params["gt"]
-                    if captcha_type == CaptchaType.GEETEST_V3
-                    else params["captcha_id"]
-                ),
-                challenge=params.get("challenge", ""),
-                geetest_api_server=params.get("api_server", ""),
-            )
-        else:
-            raise ValueError(
-                f"Unsupported captcha type for Anti-Captcha: {captcha_type}"
-            )
+            task["websitePublicKey"] = params["public_key"]
+        elif captcha_type == CaptchaType.GEETEST_V3:
+            task["gt"] = params["gt"]
+            task["challenge"] = params.get("challenge", "")
+        elif captcha_type == CaptchaType.GEETEST_V4:
+            task["gt"] = params["captcha_id"]
+            task["version"] = 4
+        if captcha_type in (CaptchaType.GEETEST_V3, CaptchaType.GEETEST_V4):
+            if params.get("api_server"):
+                task["geetestApiServerSubdomain"] = params["api_server"]
+
+        async with self.session.post(
+            url, json={"clientKey": api_key, "task": task}
+        ) as resp:
+            result = await resp.json()
+            if result.get("errorId", 0) > 0:
+                raise RuntimeError(
+                    f"Anti-Captcha error: {result.get('errorCode', 'Unknown error')}"
+                )
+            task_id = result["taskId"]
 
-        job = client.createTask(task)
-        solution = job.get_solution_response()
-        return CaptchaSolution(token=solution["gRecaptchaResponse"])
+        return await self._poll_task(
+            "anticaptcha", "Anti-Captcha", api_key, task_id, captcha_type=captcha_type
+        )
 
     async def _solve_capsolver(
         self, captcha_type: CaptchaType, api_key: str, params: Dict[str, Any]
     ) -> CaptchaSolution:
         """CapSolver API implementation"""
-        from python3_capsolver import FunCaptcha, GeeTest, HCaptcha, ReCaptcha
-
-        # from python3_capsolver.gee_test import GeeTest
-        # from python3_capsolver.recaptcha import ReCaptcha
+        url: str = f"{self.api_urls['capsolver']}/createTask"
+        task: Dict[str, Any] = {
+            "type": self._get_capsolver_task_type(captcha_type),
+            "websiteURL": params["url"],
+        }
 
-        if captcha_type == CaptchaType.RECAPTCHA_V2:
-            solver = ReCaptcha(api_key=api_key)
-            solution = await solver.aio_captcha_handler(
-                websiteURL=params["url"], websiteKey=params["sitekey"]
-            )
+        if captcha_type in (
+            CaptchaType.RECAPTCHA_V2,
+            CaptchaType.HCAPTCHA,
+        ):
+            task["websiteKey"] = params["sitekey"]
         elif captcha_type == CaptchaType.RECAPTCHA_V3:
-            solver = ReCaptcha(api_key=api_key)
-            solution = await solver.aio_captcha_handler(
-                websiteURL=params["url"],
-                websiteKey=params["sitekey"],
-                version="v3",
-                minScore=0.5,
-                pageAction=params.get("action", "verify"),
-            )
-        elif captcha_type == CaptchaType.HCAPTCHA:
-            solver = HCaptcha(api_key=api_key)
-            solution = await solver.aio_captcha_handler(
-                websiteURL=params["url"], websiteKey=params["sitekey"]
-            )
+            task["websiteKey"] = params["sitekey"]
+            task["minScore"] = 0.5
+            task["pageAction"] = params.get("action", "verify")
+        elif captcha_type == CaptchaType.TURNSTILE:
+            task["websiteKey"] = params["sitekey"]
+            task["metadata"] = {"action": params.get("action", "default")}
         elif captcha_type == CaptchaType.FUNCAPTCHA:
-            solver = FunCaptcha(api_key=api_key)
-            solution = await solver.aio_captcha_handler(
-                websiteURL=params["url"], websitePublicKey=params["public_key"]
-            )
-        elif captcha_type in (CaptchaType.GEETEST_V3, CaptchaType.GEETEST_V4):
-            solver = GeeTest(api_key=api_key)
-            solution = await solver.aio_captcha_handler(
-                websiteURL=params["url"],
-                gt=(
-                    params["gt"]
-                    if captcha_type == CaptchaType.GEETEST_V3
-                    else params["captcha_id"]
-                ),
-                challenge=params.get("challenge", ""),
-                version="4" if captcha_type == CaptchaType.GEETEST_V4 else "3",
-            )
-        else:
-            raise ValueError(f"Unsupported captcha type for CapSolver: {captcha_type}")
+            task["websitePublicKey"] = params["public_key"]
+        elif captcha_type == CaptchaType.GEETEST_V3:
+            task["gt"] = params["gt"]
+            task["challenge"] = params.get("challenge", "")
+        elif captcha_type == CaptchaType.GEETEST_V4:
+            task["captchaId"] = params["captcha_id"]
+        if captcha_type in (CaptchaType.GEETEST_V3, CaptchaType.GEETEST_V4):
+            if params.get("api_server"):
+                task["geetestApiServerSubdomain"] = params["api_server"]
+
+        async with self.session.post(
+            url, json={"clientKey": api_key, "task": task}
+        ) as resp:
+            result = await resp.json()
+            if result.get("errorId", 0) > 0:
+                raise RuntimeError(
+                    f"CapSolver error: {result.get('errorDescription', 'Unknown error')}"
+                )
+            # Some task types are solved synchronously by createTask
+            if result.get("status") == "ready":
+                return self._solution_from(result["solution"])
+            task_id = result["taskId"]
 
-        return CaptchaSolution(
-            token=(
-                solution["gRecaptchaResponse"]
-                if "gRecaptchaResponse" in solution
-                else solution["token"]
-            ),
-            additional_data=solution,
+        return await self._poll_task(
+            "capsolver", "CapSolver", api_key, task_id, captcha_type=captcha_type
+        )
+
+    def _solution_from(self, solution: Dict[str, Any]) -> CaptchaSolution:
+        # Geetest answers with its validation fields instead of a token
+        token = (
+            solution.get("gRecaptchaResponse")
+            or solution.get("token")
+            or solution.get("validate")
+            or solution.get("pass_token", "")
+        )
+        return CaptchaSolution(token=token, additional_data=solution)
+
+    async def _poll_task(
+        self,
+        service: str,
+        name: str,
+        api_key: str,
+        task_id: Any,
+        timeout: int = 120,
+        captcha_type: Optional[CaptchaType] = None,
+    ) -> CaptchaSolution:
+        """
+        Poll a createTask/getTaskResult style API for the solution.
+
+        Polls go through the shared scheduler, cancelling the caller stops them.
+        """
+        url = f"{self.api_urls[service]}/getTaskResult"
+
+        async def fetch(task_id: Any) -> Optional[CaptchaSolution]:
+            async with self.session.post(
+                url, json={"clientKey": api_key, "taskId": task_id}
+            ) as resp:
+                result = await resp.json()
+            if result.get("errorId", 0) > 0:
+                error = result.get("errorDescription") or result.get("errorCode")
+                raise RuntimeError(f"{name} error: {error or 'Unknown error'}")
+            if result["status"] == "ready":
+                return self._solution_from(result["solution"])
+            elif result["status"] == "failed":
+                raise RuntimeError(f"{name} task failed")
+            return None
+
+        type_name = captcha_type.value if captcha_type else "unknown"
+        return await self.scheduler.wait(
+            service, type_name, task_id, fetch, timeout=timeout
         )
 
+    async def _presolve(self, key: PoolKey, api_key: str) -> CaptchaSolution:
+        """Solve a token pool key, which needs no page"""
+        solution = await self._solve_direct(
+            key.provider,
+            CaptchaType(key.captcha_type),
+            api_key,
+            key.params(),
+            background=True,
+        )
+        if not solution.token:
+            raise RuntimeError(f"{key.provider} returned no token")
+        return solution
+
+    def supports(self, service: str, captcha_type: CaptchaType) -> bool:
+        """Whether the provider has a task type for this captcha type"""
+        task_types = {
+            "capmonster": self._get_capmonster_task_type,
+            "anticaptcha": self._get_anticaptcha_task_type,
+            "capsolver": self._get_capsolver_task_type,
+        }
+        if service not in task_types:
+            return False
+        try:
+            task_types[service](captcha_type)
+        except ValueError:
+            return False
+        return True
+
     def _get_capmonster_task_type(self, captcha_type: CaptchaType) -> str:
         """Map captcha type to CapMonster task type"""
         mapping = {
@@ -395,8 +623,80 @@ class CaptchaSolver:
         }
         return mapping.get(captcha_type, "NoCaptchaTaskProxyless")
 
+    def _get_capsolver_task_type(self, captcha_type: CaptchaType) -> str:
+        """Map captcha type to CapSolver task type"""
+        mapping = {
+            CaptchaType.RECAPTCHA_V2: "ReCaptchaV2TaskProxyLess",
+            CaptchaType.RECAPTCHA_V3: "ReCaptchaV3TaskProxyLess",
+            CaptchaType.HCAPTCHA: "HCaptchaTaskProxyLess",
+            CaptchaType.TURNSTILE: "AntiTurnstileTaskProxyLess",
+            CaptchaType.FUNCAPTCHA: "FunCaptchaTaskProxyLess",
+            CaptchaType.GEETEST_V3: "GeeTestTaskProxyLess",
+            CaptchaType.GEETEST_V4: "GeeTestTaskProxyLess",
+        }
+        if captcha_type not in mapping:
+            raise ValueError(f"Unsupported captcha type for CapSolver: {captcha_type}")
+        return mapping[captcha_type]
+
+    def _get_anticaptcha_task_type(self, captcha_type: CaptchaType) -> str:
+        """Map captcha type to Anti-Captcha task type"""
+        mapping = {
+            CaptchaType.RECAPTCHA_V2: "RecaptchaV2TaskProxyless",
+            CaptchaType.RECAPTCHA_V3: "RecaptchaV3TaskProxyless",
+            CaptchaType.HCAPTCHA: "HCaptchaTaskProxyless",
+            CaptchaType.FUNCAPTCHA: "FunCaptchaTaskProxyless",
+            CaptchaType.GEETEST_V3: "GeeTestTaskProxyless",
+            CaptchaType.GEETEST_V4: "GeeTestTaskProxyless",
+        }
+        if captcha_type not in mapping:
+            raise ValueError(
+                f"Unsupported captcha type for Anti-Captcha: {captcha_type}"
+            )
+        return mapping[captcha_type]
+
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
         await self.close()
+
+
+async def presolve_token(key: PoolKey, api_key: str) -> CaptchaSolution:
+    # Spread pre-solves over the provider's keys, the configured one is a fallback
+    api_key = api_key_store.next_key(key.provider) or api_key
+    async with CaptchaSolver(page=None) as solver:
+        return await solver._presolve(key, api_key)
+
+
+# Pre-solved tokens for configured high-traffic sitekeys
+token_pool = TokenPool(presolve_token, model=poll_scheduler.model)
+
+# Seconds a breaker probe waits for the provider API
+PROBE_TIMEOUT = 10.0
+
+
+async def probe_provider(
+    provider: str, api_urls: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    Check that the provider API answers, with getBalance so nothing is paid.
+
+    An error answer such as a zero balance still shows the API is up; only
+    transport failures, server errors and timeouts count as down.
+    """
+    api_key = api_key_store.next_key(provider)
+    if not api_key:
+        raise RuntimeError(f"No {provider} api key to probe with")
+    url = f"{(api_urls or PROVIDER_API_URLS)[provider]}/getBalance"
+    async with captcha_http.session().post(
+        url,
+        json={"clientKey": api_key},
+        timeout=aiohttp.ClientTimeout(total=PROBE_TIMEOUT),
+    ) as resp:
+        if resp.status >= 500:
+            raise RuntimeError(f"{provider} getBalance returned HTTP {resp.status}")
+        await resp.json(content_type=None)
+
+
+# Circuit breakers of the providers, probed in the background once open
+provider_breakers = ProviderBreakers(probe_provider)
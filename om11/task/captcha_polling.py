@@ -0,0 +1,247 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from om11.metrics import metrics
+
+# Solve times kept per (provider, captcha type)
+SAMPLE_WINDOW = 200
+# Below this many samples the defaults are used
+MIN_SAMPLES = 5
+DEFAULT_FIRST_POLL = 2.0
+MIN_POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 5.0
+# Polls are aimed at these points of the learned solve time distribution
+POLL_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.95)
+# Polls due within this window of each other are sent in one wakeup
+COALESCE_WINDOW = 0.25
+
+# Returns the result when ready, None while processing, raises on failure
+FetchResult = Callable[[Any], Awaitable[Optional[Any]]]
+
+T = TypeVar("T")
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class SolveTimeModel:
+    """Rolling solve times per provider and captcha type"""
+
+    def __init__(
+        self,
+        window: int = SAMPLE_WINDOW,
+        first_poll: float = DEFAULT_FIRST_POLL,
+        min_interval: float = MIN_POLL_INTERVAL,
+        max_interval: float = MAX_POLL_INTERVAL,
+    ):
+        self.window = window
+        self.first_poll = first_poll
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def observe(self, provider: str, captcha_type: str, seconds: float) -> None:
+        key = (provider, captcha_type)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(seconds)
+        metrics.observe("captcha.solve_seconds", seconds, {"provider": provider})
+
+    def samples(self, provider: str, captcha_type: str) -> list:
+        return sorted(self._samples.get((provider, captcha_type), ()))
+
+    def percentile(self, provider: str, captcha_type: str, q: float) -> Optional[float]:
+        ordered = self.samples(provider, captcha_type)
+        if len(ordered) < MIN_SAMPLES:
+            return None
+        return percentile(ordered, q)
+
+    def next_poll_delay(
+        self, provider: str, captcha_type: str, elapsed: float
+    ) -> float:
+        """Seconds until the next poll of a task created `elapsed` seconds ago"""
+        ordered = self.samples(provider, captcha_type)
+        if len(ordered) < MIN_SAMPLES:
+            # No history: short first poll, then back off with the task age
+            delay = self.first_poll if elapsed == 0 else elapsed * 0.5
+        else:
+            targets = [percentile(ordered, q) for q in POLL_QUANTILES]
+            upcoming = [t - elapsed for t in targets if t > elapsed]
+            # Past the tail of the distribution, back off from the tail
+            delay = upcoming[0] if upcoming else elapsed * 0.5
+        return min(self.max_interval, max(self.min_interval, delay))
+
+
+@dataclass
+class SharedFuture(Generic[T]):
+    """
+    A future any number of callers wait for. It is cancelled once the last
+    waiter gives up before it is done.
+    """
+
+    future: "asyncio.Future[T]"
+    waiters: int = 0
+
+    async def wait(self, timeout: Optional[float] = None) -> T:
+        self.waiters += 1
+        try:
+            # Shielded so one caller giving up does not cancel the others
+            return await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        finally:
+            self.waiters -= 1
+            if self.waiters == 0 and not self.future.done():
+                self.future.cancel()
+
+
+@dataclass
+class PendingTask:
+    task_id: Any
+    captcha_type: str
+    fetch: FetchResult
+    created: float
+    result: SharedFuture
+    next_due: float
+    polls: int = 0
+
+
+@dataclass
+class _ProviderQueue:
+    loop: asyncio.AbstractEventLoop
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    pending: Dict[Any, PendingTask] = field(default_factory=dict)
+    runner: Optional[asyncio.Task] = None
+
+
+class PollScheduler:
+    """
+    Polls provider task results for all solves of the process.
+
+    Each provider has a single loop that sleeps until the earliest due
+    poll and then sends every poll due within the coalesce window together,
+    over the shared connection pool. Waiting twice for the same task id
+    shares one poll. Poll times follow the SolveTimeModel.
+    """
+
+    def __init__(
+        self,
+        model: Optional[SolveTimeModel] = None,
+        coalesce_window: float = COALESCE_WINDOW,
+    ):
+        self.model = model or SolveTimeModel()
+        # A task must never become due again right after its own poll
+        self.coalesce_window = min(coalesce_window, self.model.min_interval / 2)
+        self._queues: Dict[str, _ProviderQueue] = {}
+
+    async def wait(
+        self,
+        provider: str,
+        captcha_type: str,
+        task_id: Any,
+        fetch: FetchResult,
+        timeout: float = 120,
+        created: Optional[float] = None,
+    ) -> Any:
+        queue = self._queue(provider)
+        task = queue.pending.get(task_id)
+        if task is None:
+            now = time.monotonic()
+            created = now if created is None else created
+            delay = self.model.next_poll_delay(provider, captcha_type, now - created)
+            task = PendingTask(
+                task_id=task_id,
+                captcha_type=captcha_type,
+                fetch=fetch,
+                created=created,
+                result=SharedFuture(queue.loop.create_future()),
+                next_due=now + delay,
+            )
+            queue.pending[task_id] = task
+            queue.wakeup.set()
+            if queue.runner is None or queue.runner.done():
+                queue.runner = asyncio.create_task(self._run(provider, queue))
+        try:
+            return await task.result.wait(timeout)
+        except asyncio.TimeoutError:
+            queue.pending.pop(task_id, None)
+            raise TimeoutError(f"{provider} task {task_id} timed out")
+        finally:
+            if task.result.future.cancelled():
+                # Nobody wants the result any more, stop polling for it
+                queue.pending.pop(task_id, None)
+
+    def pending(self, provider: str) -> int:
+        queue = self._queues.get(provider)
+        return len(queue.pending) if queue else 0
+
+    def _queue(self, provider: str) -> _ProviderQueue:
+        loop = asyncio.get_running_loop()
+        queue = self._queues.get(provider)
+        if queue is None or queue.loop is not loop:
+            queue = self._queues[provider] = _ProviderQueue(loop=loop)
+        return queue
+
+    async def _run(self, provider: str, queue: _ProviderQueue) -> None:
+        while queue.pending:
+            queue.wakeup.clear()
+            now = time.monotonic()
+            due = [
+                task
+                for task in queue.pending.values()
+                if task.next_due <= now + self.coalesce_window
+            ]
+            if not due:
+                wake_at = min(task.next_due for task in queue.pending.values())
+                try:
+                    # New tasks may be due earlier than the current earliest
+                    await asyncio.wait_for(queue.wakeup.wait(), wake_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            metrics.increment("captcha.poll_batches", labels={"provider": provider})
+            await asyncio.gather(*(self._poll(provider, queue, task) for task in due))
+
+    async def _poll(
+        self, provider: str, queue: _ProviderQueue, task: PendingTask
+    ) -> None:
+        future = task.result.future
+        if future.done():
+            queue.pending.pop(task.task_id, None)
+            return
+        task.polls += 1
+        metrics.increment("captcha.polls", labels={"provider": provider})
+        try:
+            result = await task.fetch(task.task_id)
+        except Exception as e:
+            queue.pending.pop(task.task_id, None)
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        if result is None:
+            elapsed = now - task.created
+            task.next_due = now + self.model.next_poll_delay(
+                provider, task.captcha_type, elapsed
+            )
+            return
+        queue.pending.pop(task.task_id, None)
+        self.model.observe(provider, task.captcha_type, now - task.created)
+        if not future.done():
+            future.set_result(result)
+
+
+poll_scheduler = PollScheduler()
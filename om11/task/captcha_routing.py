@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from om11.metrics import metrics
+from om11.task.captcha_polling import percentile
+
+logger = logging.getLogger(__name__)
+
+ROUTING_STATS_PATH = "instance/captcha_routing.json"
+# Outcomes kept per (provider, captcha type), older than the max age are dropped
+STATS_WINDOW = 100
+STATS_MAX_AGE = 3600.0
+# Weight of the static table in pseudo-observations
+PRIOR_WEIGHT = 5
+PRIOR_SUCCESS = {"main": 0.95, "fallback": 0.9, None: 0.7}
+# Solve latency assumed until there are this many successful solves
+MIN_LATENCY_SAMPLES = 5
+DEFAULT_LATENCY = 20.0
+# Approximate USD per 1000 token solves
+PROVIDER_COSTS = {"capmonster": 0.6, "anticaptcha": 2.0, "capsolver": 0.8}
+# Seconds of expected solve time one USD per 1000 solves is worth
+COST_WEIGHT = 2.0
+# Share of solves routed to a non-best provider to keep its stats current
+EXPLORE_RATE = 0.05
+SAVE_INTERVAL = 30.0
+
+
+@dataclass
+class ProviderStats:
+    """Recent (timestamp, success, seconds) outcomes of one provider and type"""
+
+    outcomes: Deque[Tuple[float, bool, float]] = field(
+        default_factory=lambda: deque(maxlen=STATS_WINDOW)
+    )
+
+    def record(self, success: bool, seconds: float, now: float) -> None:
+        self.outcomes.append((now, success, seconds))
+
+    def expire(self, now: float, max_age: float = STATS_MAX_AGE) -> None:
+        while self.outcomes and now - self.outcomes[0][0] > max_age:
+            self.outcomes.popleft()
+
+    @property
+    def attempts(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def successes(self) -> int:
+        return sum(1 for _, success, _ in self.outcomes if success)
+
+    def latencies(self) -> list:
+        return sorted(seconds for _, success, seconds in self.outcomes if success)
+
+    def success_rate(self, prior: float) -> float:
+        return (self.successes + PRIOR_WEIGHT * prior) / (self.attempts + PRIOR_WEIGHT)
+
+    def latency(self, q: float = 0.5) -> float:
+        ordered = self.latencies()
+        if len(ordered) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_LATENCY
+        return percentile(ordered, q)
+
+
+class ProviderRouter:
+    """
+    Picks the provider for each solve from recent outcomes.
+
+    Providers are ranked by the expected cost of one valid token: median
+    solve time divided by success rate, plus the provider price converted
+    to seconds. The static main/fallback table only acts as a prior, so a
+    provider that slows down or starts failing loses its traffic within a
+    few solves. A small share of solves explores the other providers, and
+    the outcomes are persisted so a restart keeps what was learned.
+    """
+
+    def __init__(
+        self,
+        priors: Optional[Dict[str, Dict[str, str]]] = None,
+        costs: Optional[Dict[str, float]] = None,
+        explore_rate: float = EXPLORE_RATE,
+        path: Optional[str] = ROUTING_STATS_PATH,
+        rng: Optional[random.Random] = None,
+    ):
+        self.priors = priors or {}
+        self.costs = {**PROVIDER_COSTS, **(costs or {})}
+        self.explore_rate = explore_rate
+        self.path = path
+        self.rng = rng or random.Random()
+        self._stats: Dict[Tuple[str, str], ProviderStats] = {}
+        self._loaded = False
+        self._dirty = False
+        self._last_save = 0.0
+        self._persist_task: Optional[asyncio.Task] = None
+
+    def stats(self, provider: str, captcha_type: str) -> ProviderStats:
+        key = (provider, captcha_type)
+        if key not in self._stats:
+            self._stats[key] = ProviderStats()
+        return self._stats[key]
+
+    def record(
+        self,
+        provider: str,
+        captcha_type: str,
+        success: bool,
+        seconds: float,
+        now: Optional[float] = None,
+    ) -> None:
+        stats = self.stats(provider, captcha_type)
+        stats.record(success, seconds, time.time() if now is None else now)
+        self._dirty = True
+        labels = {"provider": provider, "type": captcha_type}
+        metrics.increment(
+            "captcha.provider_solves",
+            labels={**labels, "result": "ok" if success else "error"},
+        )
+        metrics.set_gauge(
+            "captcha.provider_success_rate",
+            stats.success_rate(self._prior(provider, captcha_type)),
+            labels,
+        )
+
+    def score(
+        self, provider: str, captcha_type: str, now: Optional[float] = None
+    ) -> float:
+        """Expected seconds per valid token, lower is better"""
+        stats = self.stats(provider, captcha_type)
+        stats.expire(time.time() if now is None else now)
+        success_rate = max(
+            0.01, stats.success_rate(self._prior(provider, captcha_type))
+        )
+        cost = self.costs.get(provider, 0.0) * COST_WEIGHT
+        return (stats.latency() + cost) / success_rate
+
+    def rank(
+        self,
+        captcha_type: str,
+        candidates: Sequence[str],
+        now: Optional[float] = None,
+    ) -> List[str]:
+        return sorted(candidates, key=lambda p: self.score(p, captcha_type, now))
+
+    def choose(
+        self, captcha_type: str, candidates: Sequence[str]
+    ) -> Tuple[str, Optional[str]]:
+        """Main and fallback provider for the next solve"""
+        if not candidates:
+            raise ValueError(f"No captcha provider available for {captcha_type}")
+        ranked = self.rank(captcha_type, candidates)
+        if len(ranked) > 1 and self.rng.random() < self.explore_rate:
+            explored = self.rng.choice(ranked[1:])
+            metrics.increment("captcha.route_explore", labels={"provider": explored})
+            ranked.remove(explored)
+            ranked.insert(0, explored)
+        metrics.increment(
+            "captcha.route", labels={"provider": ranked[0], "type": captcha_type}
+        )
+        return ranked[0], ranked[1] if len(ranked) > 1 else None
+
+    def report(self, captcha_type: str, candidates: Sequence[str]) -> Dict[str, Any]:
+        report = {}
+        for provider in self.rank(captcha_type, candidates):
+            stats = self.stats(provider, captcha_type)
+            report[provider] = {
+                "attempts": stats.attempts,
+                "success_rate": round(
+                    stats.success_rate(self._prior(provider, captcha_type)), 3
+                ),
+                "p50_seconds": round(stats.latency(0.5), 2),
+                "p90_seconds": round(stats.latency(0.9), 2),
+                "cost_per_1000": self.costs.get(provider),
+                "score": round(self.score(provider, captcha_type), 2),
+            }
+        return report
+
+    def _prior(self, provider: str, captcha_type: str) -> float:
+        roles = self.priors.get(captcha_type, {})
+        role = next((role for role, name in roles.items() if name == provider), None)
+        return PRIOR_SUCCESS.get(role, PRIOR_SUCCESS[None])
+
+    # --- PERSISTENCE ---
+    def load(self) -> None:
+        """Merge outcomes saved by a previous process"""
+        self._merge(self._read())
+
+    def _read(self) -> Dict[str, Any]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, saved: Dict[str, Any]) -> None:
+        self._loaded = True
+        for provider, by_type in saved.get("outcomes", {}).items():
+            for captcha_type, outcomes in by_type.items():
+                stats = self.stats(provider, captcha_type)
+                merged = sorted(
+                    [(ts, bool(ok), seconds) for ts, ok, seconds in outcomes]
+                    + list(stats.outcomes)
+                )
+                stats.outcomes = deque(merged, maxlen=STATS_WINDOW)
+
+    def save(self) -> None:
+        self._write(self._snapshot())
+
+    def _snapshot(self) -> Dict[str, Dict[str, list]]:
+        """Copy of the outcomes, taken on the loop while record() cannot run"""
+        outcomes: Dict[str, Dict[str, list]] = {}
+        for (provider, captcha_type), stats in self._stats.items():
+            if stats.outcomes:
+                outcomes.setdefault(provider, {})[captcha_type] = [
+                    list(outcome) for outcome in stats.outcomes
+                ]
+        self._dirty = False
+        return outcomes
+
+    def _write(self, outcomes: Dict[str, Dict[str, list]]) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"outcomes": outcomes}, f)
+        os.replace(tmp_path, self.path)
+
+    async def persist(self, force: bool = False) -> None:
+        """Save at most every SAVE_INTERVAL seconds, off the event loop"""
+        if not self._loaded:
+            self._merge(await asyncio.to_thread(self._read))
+        now = time.monotonic()
+        if not self._dirty or (not force and now - self._last_save < SAVE_INTERVAL):
+            return
+        self._last_save = now
+        outcomes = self._snapshot()
+        try:
+            await asyncio.to_thread(self._write, outcomes)
+        except Exception:
+            self._dirty = True
+            raise
+
+    def persist_soon(self) -> None:
+        """persist() in the background, a failed save never fails a solve"""
+        if self._persist_task is not None and not self._persist_task.done():
+            return
+        if self._loaded and (
+            not self._dirty or time.monotonic() - self._last_save < SAVE_INTERVAL
+        ):
+            return
+        self._persist_task = asyncio.create_task(self._persist_logged())
+
+    async def _persist_logged(self) -> None:
+        try:
+            await self.persist()
+        except Exception as e:
+            metrics.increment("captcha.routing_save_errors")
+            logger.warning(f"Failed to save captcha routing stats: {e}")
@@ -0,0 +1,201 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+from om11.metrics import metrics
+from om11.task.captcha_polling import SharedFuture
+
+# Solves one provider runs at once for the whole process, createTask to result
+DEFAULT_CONCURRENCY = 50
+# createTask calls per minute, None for no limit
+DEFAULT_PER_MINUTE: Optional[int] = None
+# Share of the concurrency token pool pre-solves may hold, the rest is
+# always left to live solves
+DEFAULT_PRESOLVE_SHARE = 0.25
+RATE_WINDOW = 60.0
+
+T = TypeVar("T")
+
+
+@dataclass
+class ProviderLimit:
+    concurrency: int = DEFAULT_CONCURRENCY
+    per_minute: Optional[int] = DEFAULT_PER_MINUTE
+    presolve_share: float = DEFAULT_PRESOLVE_SHARE
+
+    @property
+    def presolve_slots(self) -> int:
+        return max(1, int(self.concurrency * self.presolve_share))
+
+
+@dataclass
+class _ProviderState:
+    loop: asyncio.AbstractEventLoop
+    slots: asyncio.Semaphore
+    presolve_slots: asyncio.Semaphore
+    limit: ProviderLimit
+    starts: Deque[float] = field(default_factory=deque)
+    rate_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    in_flight: int = 0
+    queued: int = 0
+    presolving: int = 0
+
+
+class CaptchaSolveService:
+    """
+    The one place every session's provider solves go through.
+
+    Each provider gets a concurrency limit over whole solves and a
+    createTask rate limit per minute, so a burst from many sessions queues
+    here instead of being throttled by the provider. Solves submitted with
+    the same dedup key while one is running share its result.
+
+    Tokens are single-use, so callers only share a dedup key within one
+    page; different sessions on the same sitekey each need their own token
+    and are served ahead of time by the token pool instead. Those
+    pre-solves are background work and may only hold a share of a
+    provider's slots, so a pool refill never queues a live solve.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, ProviderLimit]] = None):
+        self.limits: Dict[str, ProviderLimit] = dict(limits or {})
+        self._providers: Dict[str, _ProviderState] = {}
+        self._shared: Dict[Hashable, SharedFuture] = {}
+
+    def configure(self, limits: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Limits from config, e.g.
+        {"capsolver": {"concurrency": 10, "per_minute": 120, "presolve_share": 0.2}}
+        """
+        for provider, entry in limits.items():
+            self.limits[provider] = ProviderLimit(
+                concurrency=entry.get("concurrency", DEFAULT_CONCURRENCY),
+                per_minute=entry.get("per_minute", DEFAULT_PER_MINUTE),
+                presolve_share=entry.get("presolve_share", DEFAULT_PRESOLVE_SHARE),
+            )
+        # Running solves keep their slots, new ones see the new limits
+        self._providers.clear()
+
+    async def submit(
+        self,
+        provider: str,
+        solve: Callable[[], Awaitable[T]],
+        dedup_key: Optional[Hashable] = None,
+        background: bool = False,
+    ) -> T:
+        """
+        Run a solve under the provider's limits. Background solves
+        (token pool refills) only get the provider's presolve share.
+        """
+        if dedup_key is None:
+            return await self._run(provider, solve, background)
+        shared = self._shared.get(dedup_key)
+        if shared is None or shared.future.done():
+            shared = SharedFuture(
+                asyncio.create_task(self._run(provider, solve, background))
+            )
+            self._shared[dedup_key] = shared
+            shared.future.add_done_callback(
+                lambda task, key=dedup_key: self._forget(key, task)
+            )
+        else:
+            metrics.increment("captcha.solve_dedup", labels={"provider": provider})
+        return await shared.wait()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            provider: {
+                "in_flight": state.in_flight,
+                "queued": state.queued,
+                "presolving": state.presolving,
+                "concurrency": state.limit.concurrency,
+                "per_minute": state.limit.per_minute,
+                "presolve_slots": state.limit.presolve_slots,
+            }
+            for provider, state in self._providers.items()
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        shared = self._shared.get(key)
+        if shared is not None and shared.future is task:
+            del self._shared[key]
+
+    def _state(self, provider: str) -> _ProviderState:
+        loop = asyncio.get_running_loop()
+        state = self._providers.get(provider)
+        if state is None or state.loop is not loop:
+            limit = self.limits.get(provider) or ProviderLimit()
+            state = self._providers[provider] = _ProviderState(
+                loop=loop,
+                slots=asyncio.Semaphore(limit.concurrency),
+                presolve_slots=asyncio.Semaphore(limit.presolve_slots),
+                limit=limit,
+            )
+        return state
+
+    async def _run(
+        self,
+        provider: str,
+        solve: Callable[[], Awaitable[T]],
+        background: bool = False,
+    ) -> T:
+        state = self._state(provider)
+        if not background:
+            return await self._run_slot(provider, state, solve)
+        # Wait for a presolve slot first so queued refills never sit in
+        # the provider queue ahead of live solves
+        async with state.presolve_slots:
+            state.presolving += 1
+            try:
+                return await self._run_slot(provider, state, solve)
+            finally:
+                state.presolving -= 1
+
+    async def _run_slot(
+        self,
+        provider: str,
+        state: _ProviderState,
+        solve: Callable[[], Awaitable[T]],
+    ) -> T:
+        labels = {"provider": provider}
+        queued_at = time.monotonic()
+        state.queued += 1
+        try:
+            await state.slots.acquire()
+        finally:
+            state.queued -= 1
+        try:
+            await self._wait_for_rate(state)
+            metrics.observe(
+                "captcha.solve_queue_seconds", time.monotonic() - queued_at, labels
+            )
+            state.in_flight += 1
+            metrics.set_gauge("captcha.solves_in_flight", state.in_flight, labels)
+            try:
+                return await solve()
+            finally:
+                state.in_flight -= 1
+                metrics.set_gauge("captcha.solves_in_flight", state.in_flight, labels)
+        finally:
+            state.slots.release()
+
+    async def _wait_for_rate(self, state: _ProviderState) -> None:
+        per_minute = state.limit.per_minute
+        if not per_minute:
+            return
+        # One waiter at a time so starts are handed out in arrival order
+        async with state.rate_lock:
+            while True:
+                now = time.monotonic()
+                while state.starts and now - state.starts[0] >= RATE_WINDOW:
+                    state.starts.popleft()
+                if len(state.starts) < per_minute:
+                    state.starts.append(now)
+                    return
+                await asyncio.sleep(state.starts[0] + RATE_WINDOW - now)
+
+
+# Shared by every session of the process
+captcha_solve_service = CaptchaSolveService()
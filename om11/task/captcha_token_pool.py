@@ -0,0 +1,262 @@
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from om11.metrics import metrics
+from om11.task.captcha_polling import SolveTimeModel
+
+# Seconds a token is accepted by the target site after it was solved
+TOKEN_LIFETIMES = {
+    "recaptcha_v2": 120.0,
+    "recaptcha_v3": 120.0,
+    "hcaptcha": 120.0,
+    "turnstile": 300.0,
+}
+DEFAULT_TOKEN_LIFETIME = 120.0
+# Types whose tokens are bound to the action they were solved for
+ACTION_BOUND_TYPES = {"recaptcha_v3"}
+# Tokens are only handed out with this much life left, for the submit
+MIN_REMAINING = 15.0
+# Demand is measured over this many seconds of take() calls
+DEMAND_WINDOW = 300.0
+DEFAULT_MAX_TOKENS = 10
+# Refill solve time assumed before the provider has history
+DEFAULT_SOLVE_SECONDS = 20.0
+# Tokens kept per token expected to be taken during one refill solve
+SIZE_HEADROOM = 1.5
+REFILL_INTERVAL = 1.0
+ERROR_BACKOFF = 10.0
+
+
+@dataclass(frozen=True)
+class PoolKey:
+    provider: str
+    captcha_type: str
+    sitekey: str
+    url: str
+    action: Optional[str] = None
+
+    def matches(self, captcha_type: str, params: Dict[str, Any]) -> bool:
+        """
+        Tokens are bound to the sitekey and hostname, not the full url.
+
+        reCAPTCHA v3 tokens are also bound to their action, so the action
+        must be the same; no action only matches a widget without one.
+        """
+        if self.captcha_type in ACTION_BOUND_TYPES:
+            action_matches = self.action == params.get("action")
+        else:
+            action_matches = self.action is None or self.action == params.get("action")
+        return (
+            self.captcha_type == captcha_type
+            and self.sitekey == params.get("sitekey")
+            and urlsplit(self.url).hostname
+            == urlsplit(params.get("url") or "").hostname
+            and action_matches
+        )
+
+    def params(self) -> Dict[str, Any]:
+        params = {"sitekey": self.sitekey, "url": self.url}
+        if self.action is not None:
+            params["action"] = self.action
+        return params
+
+    @property
+    def lifetime(self) -> float:
+        return TOKEN_LIFETIMES.get(self.captcha_type, DEFAULT_TOKEN_LIFETIME)
+
+
+@dataclass
+class PooledToken:
+    solution: Any
+    expires_at: float
+
+
+@dataclass
+class _Pool:
+    key: PoolKey
+    api_key: str
+    max_tokens: int
+    min_tokens: int
+    tokens: Deque[PooledToken] = field(default_factory=deque)
+    demand: Deque[float] = field(default_factory=deque)
+    in_flight: int = 0
+    retry_at: float = 0.0
+    solved: int = 0
+    served: int = 0
+    expired: int = 0
+    failed: int = 0
+
+
+# Solves one token for the key with the api key, raises on failure
+PresolveFunc = Callable[[PoolKey, str], Awaitable[Any]]
+
+
+class TokenPool:
+    """
+    Keeps pre-solved tokens for sitekeys that are hit constantly.
+
+    Each configured key is refilled in the background to a target size
+    derived from its demand: enough tokens to cover the takes expected
+    while one refill solve runs, but never more than can be taken before
+    they expire, since unused tokens are paid for and thrown away.
+
+    The pool never charges users. Whoever takes a token charges it exactly
+    like a live solve (solve_best_captcha does so on success), so users pay
+    once per token they use and expired pre-solves are the operator's cost,
+    reported in stats() and the captcha.pool_expired metric.
+    """
+
+    def __init__(
+        self,
+        presolve: PresolveFunc,
+        model: Optional[SolveTimeModel] = None,
+        interval: float = REFILL_INTERVAL,
+    ):
+        self.presolve = presolve
+        self.model = model or SolveTimeModel()
+        self.interval = interval
+        self._pools: Dict[PoolKey, _Pool] = {}
+        self._solves: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(
+        self,
+        key: PoolKey,
+        api_key: str,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        min_tokens: int = 0,
+    ) -> None:
+        pool = self._pools.get(key)
+        if pool is None:
+            self._pools[key] = _Pool(key, api_key, max_tokens, min_tokens)
+        else:
+            pool.api_key = api_key
+            pool.max_tokens = max_tokens
+            pool.min_tokens = min_tokens
+
+    def remove(self, key: PoolKey) -> None:
+        self._pools.pop(key, None)
+
+    def take(
+        self, captcha_type: str, params: Dict[str, Any], now: Optional[float] = None
+    ) -> Optional[Any]:
+        """A ready solution for the widget, or None to solve it live"""
+        now = time.monotonic() if now is None else now
+        pool = next(
+            (p for p in self._pools.values() if p.key.matches(captcha_type, params)),
+            None,
+        )
+        if pool is None:
+            return None
+        pool.demand.append(now)
+        self._expire(pool, now)
+        labels = {"sitekey": pool.key.sitekey}
+        if not pool.tokens:
+            metrics.increment("captcha.pool", labels={**labels, "result": "miss"})
+            return None
+        # Oldest first, it is the next one to expire
+        token = pool.tokens.popleft()
+        pool.served += 1
+        metrics.increment("captcha.pool", labels={**labels, "result": "hit"})
+        return token.solution
+
+    def target_size(self, key: PoolKey, now: Optional[float] = None) -> int:
+        pool = self._pools[key]
+        now = time.monotonic() if now is None else now
+        while pool.demand and now - pool.demand[0] > DEMAND_WINDOW:
+            pool.demand.popleft()
+        rate = len(pool.demand) / DEMAND_WINDOW
+
+        solve_seconds = self.model.percentile(key.provider, key.captcha_type, 0.9)
+        solve_seconds = solve_seconds or DEFAULT_SOLVE_SECONDS
+        needed = math.ceil(rate * solve_seconds * SIZE_HEADROOM)
+        # More tokens than this would expire before anyone takes them
+        usable = math.floor(rate * (key.lifetime - MIN_REMAINING))
+        target = min(needed, usable)
+        return max(pool.min_tokens, min(pool.max_tokens, target))
+
+    async def refill(self, now: Optional[float] = None) -> int:
+        """Start the solves each pool is short of, returns how many started"""
+        now = time.monotonic() if now is None else now
+        started = 0
+        for key, pool in list(self._pools.items()):
+            self._expire(pool, now)
+            target = self.target_size(key, now)
+            metrics.set_gauge("captcha.pool_target", target, {"sitekey": key.sitekey})
+            metrics.set_gauge(
+                "captcha.pool_size", len(pool.tokens), {"sitekey": key.sitekey}
+            )
+            if now < pool.retry_at:
+                continue
+            for _ in range(target - len(pool.tokens) - pool.in_flight):
+                pool.in_flight += 1
+                task = asyncio.create_task(self._presolve(pool))
+                self._solves.add(task)
+                task.add_done_callback(self._solves.discard)
+                started += 1
+        return started
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "provider": key.provider,
+                "captcha_type": key.captcha_type,
+                "sitekey": key.sitekey,
+                "url": key.url,
+                "action": key.action,
+                "ready": len(pool.tokens),
+                "in_flight": pool.in_flight,
+                "target": self.target_size(key),
+                "solved": pool.solved,
+                "served": pool.served,
+                "expired": pool.expired,
+                "failed": pool.failed,
+            }
+            for key, pool in self._pools.items()
+        ]
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._solves)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            await self.refill()
+            await asyncio.sleep(self.interval)
+
+    async def _presolve(self, pool: _Pool) -> None:
+        try:
+            solution = await self.presolve(pool.key, pool.api_key)
+        except Exception:
+            pool.failed += 1
+            pool.retry_at = time.monotonic() + ERROR_BACKOFF
+            metrics.increment(
+                "captcha.pool_failed", labels={"sitekey": pool.key.sitekey}
+            )
+            return
+        finally:
+            pool.in_flight -= 1
+        pool.solved += 1
+        pool.tokens.append(PooledToken(solution, time.monotonic() + pool.key.lifetime))
+
+    def _expire(self, pool: _Pool, now: float) -> None:
+        while pool.tokens and pool.tokens[0].expires_at - MIN_REMAINING <= now:
+            pool.tokens.popleft()
+            pool.expired += 1
+            metrics.increment(
+                "captcha.pool_expired", labels={"sitekey": pool.key.sitekey}
+            )
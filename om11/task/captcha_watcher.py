@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from om11.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Solves the captcha on the page, True once the token is submitted
+SolveFunc = Callable[[Any], Awaitable[bool]]
+
+
+@dataclass
+class _EarlySolve:
+    task: asyncio.Task
+    marker: str
+    started: float
+
+
+class CaptchaWatcher:
+    """
+    Starts solving a page's captcha as soon as the in-page observer reports it.
+
+    BrowserManager.observe_captchas() wires on_seen() to the page binding of
+    CAPTCHA_OBSERVER_SCRIPT. Each new widget marker starts one solve in the
+    background while the task chain goes on; a later solve step collects it
+    with take() instead of starting its own. A new marker while an earlier
+    result was not taken replaces it, that token belongs to a widget that is
+    gone. Closing the page drops its solve.
+    """
+
+    def __init__(self, solve: SolveFunc):
+        self.solve = solve
+        self._solves: Dict[Any, _EarlySolve] = {}
+
+    async def on_seen(self, source: Dict[str, Any], report: Dict[str, Any]) -> None:
+        page = source.get("page")
+        marker = report.get("marker") or ""
+        if page is None:
+            return
+        current = self._solves.get(page)
+        if current is not None:
+            if current.marker == marker or not current.task.done():
+                # Same widget, or a solve of this page is still running
+                return
+        metrics.increment("captcha.observed", labels={"top": str(report.get("top"))})
+        if current is None:
+            page.once("close", self._forget)
+        self._solves[page] = _EarlySolve(
+            asyncio.create_task(self._solve(page)), marker, time.monotonic()
+        )
+
+    async def take(self, page: Any) -> Optional[bool]:
+        """
+        True when an early solve of the page submitted its token, else None.
+
+        Waits for a solve still running. Each result is taken once.
+        """
+        early = self._solves.pop(page, None)
+        if early is None:
+            return None
+        waited = time.monotonic()
+        result = await early.task
+        now = time.monotonic()
+        metrics.observe("captcha.early_solve_wait_seconds", now - waited)
+        # How far ahead of the solve step the watcher started
+        metrics.observe("captcha.early_solve_lead_seconds", waited - early.started)
+        return result or None
+
+    def _forget(self, page: Any) -> None:
+        early = self._solves.pop(page, None)
+        if early is not None:
+            early.task.cancel()
+
+    async def stop(self) -> None:
+        tasks = [early.task for early in self._solves.values()]
+        self._solves.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _solve(self, page: Any) -> Optional[bool]:
+        try:
+            solved = await self.solve(page)
+        except Exception as e:
+            # The solve step retries live, an early failure only costs the head start
+            metrics.increment("captcha.early_solve", labels={"result": "error"})
+            logger.warning(f"Early captcha solve failed: {e}")
+            return None
+        result = "solved" if solved else "not_detected"
+        metrics.increment("captcha.early_solve", labels={"result": result})
+        return solved
@@ -98,3 +98,233 @@ class FunCaptcha:
     SUBMIT_SCRIPT = """(token) => {
         document.querySelector('[name="fc-token"]').value = token;
     }"""
+
+
+# Highest first when a page has several widgets. Visible widgets always win
+# over hidden ones, and reCAPTCHA v3 has no widget so it comes last.
+DETECTION_PRIORITY = (
+    "turnstile",
+    "hcaptcha",
+    "recaptcha_v2",
+    "funcaptcha",
+    "geetest_v4",
+    "geetest_v3",
+    "recaptcha_v3",
+)
+# Nesting depth of same-origin iframes searched for widgets
+FRAME_SCAN_DEPTH = 3
+
+# Finds every supported captcha in the page and its iframes in one call and
+# returns {type, params, candidates, fingerprint} for the highest priority
+# one, or null. Cross-origin iframes cannot be entered, their widget src is
+# parsed instead. The fingerprint covers the widget keys and visibility; when
+# it is one of `known` the scan is skipped and {fingerprint, cached} returned.
+DETECT_CAPTCHA_SCRIPT = """([priority, maxDepth, known]) => {
+    const found = {};
+    // Everything the scan below can detect, for the widget fingerprint
+    const widgetSelector = [
+        '[data-sitekey]', '[data-pkey]', '[data-hcaptcha]', '.h-captcha', '.cf-turnstile',
+        '#FunCaptcha', 'iframe[src*="recaptcha"]', 'iframe[src*="hcaptcha"]',
+        'iframe[src*="challenges.cloudflare"]', 'iframe[src*="arkoselabs"]',
+        'iframe[src*="funcaptcha"]', 'script[src*="render="]',
+    ].join(', ');
+    const fromSrc = (src, name) => {
+        const match = src.match(new RegExp('[?&#]' + name + '=([^&#]+)'));
+        return match ? decodeURIComponent(match[1]) : null;
+    };
+    const frames = (doc, depth, visit) => {
+        visit(doc, doc.defaultView, depth);
+        if (depth >= maxDepth) return;
+        for (const frame of doc.querySelectorAll('iframe')) {
+            let child = null;
+            try { child = frame.contentDocument; } catch (e) {}
+            if (child && child.defaultView) frames(child, depth + 1, visit);
+        }
+    };
+
+    const parts = [];
+    frames(document, 0, (doc, win, depth) => {
+        for (const el of doc.querySelectorAll(widgetSelector)) {
+            // Widget srcs carry per-load params, only the path and key matter
+            const src = el.src
+                ? el.src.replace(/[?#].*$/, '') + '|' +
+                  (fromSrc(el.src, 'k') || fromSrc(el.src, 'sitekey') ||
+                   fromSrc(el.src, 'pk') || fromSrc(el.src, 'render') || '')
+                : '';
+            parts.push([
+                depth, el.tagName, el.className, el.dataset.sitekey || el.dataset.pkey || '',
+                src, el.getClientRects().length > 0,
+            ].join('|'));
+        }
+        if (win.initGeetest) parts.push(`gt|${win.initGeetest.gt}|${win.initGeetest.challenge}`);
+        if (win.initGeetestV4) parts.push(`gt4|${win.initGeetestV4.captcha_id}`);
+    });
+    if (!parts.length) return null;
+    const fingerprint = parts.join('\\n');
+    if ((known || []).includes(fingerprint)) return {fingerprint, cached: true};
+    const isVisible = (el) => {
+        if (!el.getClientRects().length) return false;
+        const style = el.ownerDocument.defaultView.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const add = (type, visible, params, depth, url) => {
+        const current = found[type];
+        if (!current) {
+            found[type] = {type, visible, depth, params: {...params, url}};
+            return;
+        }
+        // The same widget is often seen twice, e.g. its div and its iframe
+        current.visible = current.visible || visible;
+        current.depth = Math.min(current.depth, depth);
+        for (const [key, value] of Object.entries(params)) {
+            if (current.params[key] == null) current.params[key] = value;
+        }
+    };
+    const scan = (doc, win, depth) => {
+        const url = win.location.href;
+        const all = (selector) => Array.from(doc.querySelectorAll(selector));
+
+        for (const el of all('.h-captcha, [data-hcaptcha]')) {
+            add('hcaptcha', isVisible(el), {sitekey: el.dataset.sitekey || null}, depth, url);
+        }
+        for (const el of all('.cf-turnstile')) {
+            add('turnstile', isVisible(el), {
+                sitekey: el.dataset.sitekey || null,
+                action: el.dataset.action || 'default',
+            }, depth, url);
+        }
+        for (const el of all('#FunCaptcha, [data-pkey]')) {
+            const options = win.funcaptchaOptions || {};
+            add('funcaptcha', isVisible(el), {
+                public_key: el.dataset.pkey || options.publicKey || null,
+            }, depth, url);
+        }
+        for (const el of all('[data-sitekey]')) {
+            if (el.matches('.h-captcha, [data-hcaptcha], .cf-turnstile')) continue;
+            add('recaptcha_v2', isVisible(el), {sitekey: el.dataset.sitekey}, depth, url);
+        }
+        for (const frame of all('iframe[src]')) {
+            const src = frame.src;
+            const visible = isVisible(frame);
+            if (/\\/recaptcha\\/(api2|enterprise)\\/anchor/.test(src)) {
+                if (fromSrc(src, 'size') === 'invisible') continue;
+                add('recaptcha_v2', visible, {sitekey: fromSrc(src, 'k')}, depth, url);
+            } else if (/hcaptcha\\.com/.test(src)) {
+                add('hcaptcha', visible, {sitekey: fromSrc(src, 'sitekey')}, depth, url);
+            } else if (/challenges\\.cloudflare\\.com/.test(src)) {
+                const match = src.match(/\\/(0x[0-9A-Za-z_-]+)\\//);
+                add('turnstile', visible, {
+                    sitekey: match ? match[1] : null,
+                    action: 'default',
+                }, depth, url);
+            } else if (/arkoselabs\\.com|funcaptcha\\.com/.test(src)) {
+                add('funcaptcha', visible, {public_key: fromSrc(src, 'pk')}, depth, url);
+            }
+        }
+        for (const script of all('script[src*="recaptcha/api.js"], script[src*="recaptcha/enterprise.js"]')) {
+            const render = fromSrc(script.src, 'render');
+            if (!render || render === 'explicit' || render === 'onload') continue;
+            const action = doc.querySelector('[data-action]');
+            add('recaptcha_v3', false, {
+                sitekey: render,
+                action: action ? action.dataset.action : 'verify',
+            }, depth, url);
+        }
+        if (win.initGeetestV4) {
+            add('geetest_v4', true, {
+                captcha_id: win.initGeetestV4.captcha_id,
+                api_server: win.initGeetestV4.api_server,
+            }, depth, url);
+        }
+        if (win.initGeetest) {
+            add('geetest_v3', true, {
+                gt: win.initGeetest.gt,
+                challenge: win.initGeetest.challenge,
+            }, depth, url);
+        }
+    };
+
+    frames(document, 0, scan);
+    const rank = (type) => {
+        const index = priority.indexOf(type);
+        return index === -1 ? priority.length : index;
+    };
+    const candidates = Object.values(found).sort((a, b) =>
+        (b.visible - a.visible) || (rank(a.type) - rank(b.type)) || (a.depth - b.depth)
+    );
+    if (!candidates.length) return null;
+    return {
+        type: candidates[0].type,
+        params: candidates[0].params,
+        candidates: candidates.map((candidate) => candidate.type),
+        fingerprint,
+    };
+}"""
+
+
+# Name of the binding CAPTCHA_OBSERVER_SCRIPT reports widgets through
+CAPTCHA_OBSERVER_BINDING = "__om11CaptchaSeen"
+# Mutations are batched for this many ms before the page is checked
+CAPTCHA_OBSERVER_DEBOUNCE_MS = 100
+
+# Init script reporting captcha widgets of every supported type as soon as
+# they mount, so solving can start before a task asks for it. It runs in the
+# page and its same-origin frames, cross-origin widget frames stay silent.
+# Each distinct set of widget markers is reported once per document as
+# {url, marker, top}; the Python side then runs DETECT_CAPTCHA_SCRIPT.
+# The selector mirrors widgetSelector in DETECT_CAPTCHA_SCRIPT.
+CAPTCHA_OBSERVER_SCRIPT = (
+    """(() => {
+    if (window.__om11CaptchaObserver) return;
+    window.__om11CaptchaObserver = true;
+    try {
+        if (window.top !== window && !window.top.document) return;
+    } catch (e) {
+        return;
+    }
+    const selector = [
+        '[data-sitekey]', '[data-pkey]', '[data-hcaptcha]', '.h-captcha', '.cf-turnstile',
+        '#FunCaptcha', 'iframe[src*="recaptcha"]', 'iframe[src*="hcaptcha"]',
+        'iframe[src*="challenges.cloudflare"]', 'iframe[src*="arkoselabs"]',
+        'iframe[src*="funcaptcha"]', 'script[src*="render="]', 'script[src*="geetest"]',
+    ].join(', ');
+    let reported = '';
+    let pending = null;
+    const check = () => {
+        pending = null;
+        const report = window."""
+    + CAPTCHA_OBSERVER_BINDING
+    + """;
+        if (typeof report !== 'function') return;
+        const markers = [];
+        for (const el of document.querySelectorAll(selector)) {
+            markers.push([
+                el.tagName, el.className, el.dataset.sitekey || el.dataset.pkey || '',
+                (el.src || '').replace(/[?#].*$/, ''),
+            ].join('|'));
+        }
+        // Geetest is configured through globals its scripts set once loaded
+        if (window.initGeetest) markers.push('initGeetest');
+        if (window.initGeetestV4) markers.push('initGeetestV4');
+        const marker = markers.join('\\n');
+        if (!marker || marker === reported) return;
+        reported = marker;
+        Promise.resolve(report({url: location.href, marker, top: window.top === window}))
+            .catch(() => {});
+    };
+    const schedule = () => {
+        if (pending === null) pending = setTimeout(check, """
+    + str(CAPTCHA_OBSERVER_DEBOUNCE_MS)
+    + """);
+    };
+    new MutationObserver(schedule).observe(document, {
+        childList: true,
+        subtree: true,
+        attributes: true,
+        attributeFilter: ['data-sitekey', 'data-pkey', 'src', 'class'],
+    });
+    // Script loads set the geetest globals without mutating the DOM
+    document.addEventListener('load', schedule, true);
+    schedule();
+})();"""
+)
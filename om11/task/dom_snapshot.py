@@ -0,0 +1,223 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_SNAPSHOT_TOKENS = 1500
+# Rough size of one LLM token in characters, good enough for budgeting
+CHARS_PER_TOKEN = 4
+MAX_NAME_LENGTH = 80
+
+SNAPSHOT_SCRIPT = """(maxNameLength) => {
+    const QUERY = [
+        'a[href]', 'button', 'input:not([type="hidden"])', 'select', 'textarea',
+        'summary', '[role]', '[onclick]', '[contenteditable=""]',
+        '[contenteditable="true"]', '[tabindex]:not([tabindex="-1"])',
+    ].join(',');
+    const INPUT_ROLES = {
+        button: 'button', submit: 'button', reset: 'button', image: 'button',
+        checkbox: 'checkbox', radio: 'radio', range: 'slider',
+        search: 'searchbox', email: 'textbox', tel: 'textbox', url: 'textbox',
+        number: 'spinbutton',
+    };
+    const TAG_ROLES = {
+        a: 'link', button: 'button', select: 'combobox', textarea: 'textbox',
+        summary: 'button',
+    };
+    const unique = (selector) => {
+        try { return document.querySelectorAll(selector).length === 1; }
+        catch (e) { return false; }
+    };
+    const roleOf = (el) => {
+        const explicit = el.getAttribute('role');
+        if (explicit) return explicit.split(' ')[0];
+        const tag = el.tagName.toLowerCase();
+        if (tag === 'input') return INPUT_ROLES[(el.type || 'text').toLowerCase()] || 'textbox';
+        return TAG_ROLES[tag] || (el.isContentEditable ? 'textbox' : 'generic');
+    };
+    const nameOf = (el) => {
+        const labelledBy = el.getAttribute('aria-labelledby');
+        let name = labelledBy
+            ? labelledBy.split(' ').map((id) => document.getElementById(id)?.innerText || '').join(' ')
+            : '';
+        name = name || el.getAttribute('aria-label')
+            || (el.labels && el.labels[0] && el.labels[0].innerText)
+            || el.getAttribute('placeholder') || el.getAttribute('alt')
+            || el.getAttribute('title')
+            || (['submit', 'button', 'reset'].includes(el.type) ? el.value : '')
+            || el.innerText || '';
+        name = name.replace(/\\s+/g, ' ').trim();
+        return name.length > maxNameLength ? name.slice(0, maxNameLength - 1) + '…' : name;
+    };
+    const selectorOf = (el) => {
+        const tag = el.tagName.toLowerCase();
+        if (el.id && unique('#' + CSS.escape(el.id))) return '#' + CSS.escape(el.id);
+        for (const attr of ['data-testid', 'data-test', 'data-qa', 'name', 'aria-label']) {
+            const value = el.getAttribute(attr);
+            if (!value) continue;
+            const selector = `${tag}[${attr}="${CSS.escape(value)}"]`;
+            if (unique(selector)) return selector;
+        }
+        const parts = [];
+        let node = el;
+        while (node && node.nodeType === 1 && node !== document.documentElement) {
+            if (node !== el && node.id && unique('#' + CSS.escape(node.id))) {
+                parts.unshift('#' + CSS.escape(node.id));
+                break;
+            }
+            let part = node.tagName.toLowerCase();
+            const parent = node.parentElement;
+            if (parent) {
+                const siblings = Array.from(parent.children).filter((c) => c.tagName === node.tagName);
+                if (siblings.length > 1) part += `:nth-of-type(${siblings.indexOf(node) + 1})`;
+            }
+            parts.unshift(part);
+            node = parent;
+        }
+        return parts.join(' > ');
+    };
+    const visibleOf = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+    };
+    return {
+        url: location.href,
+        elements: Array.from(document.querySelectorAll(QUERY)).map((el) => ({
+            role: roleOf(el),
+            name: nameOf(el),
+            selector: selectorOf(el),
+            visible: visibleOf(el),
+        })),
+    };
+}"""
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass(frozen=True)
+class SnapshotElement:
+    role: str
+    name: str
+    selector: str
+    visible: bool
+
+    def render(self) -> str:
+        line = f'{self.role} "{self.name}" {self.selector}'
+        return line if self.visible else f"{line} (hidden)"
+
+
+def _render_lines(lines: List[str], max_tokens: int, header: str) -> Tuple[str, int]:
+    """Join lines under a token budget, noting how many were cut"""
+    output = [header]
+    used = estimate_tokens(header)
+    for index, line in enumerate(lines):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            output.append(f"... {len(lines) - index} more omitted")
+            return "\n".join(output), index
+        output.append(line)
+        used += cost
+    return "\n".join(output), len(lines)
+
+
+@dataclass
+class SnapshotDiff:
+    url: str
+    added: List[SnapshotElement] = field(default_factory=list)
+    removed: List[SnapshotElement] = field(default_factory=list)
+    changed: List[SnapshotElement] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def render(self, max_tokens: int = DEFAULT_SNAPSHOT_TOKENS) -> str:
+        return self.render_with_baseline(DomSnapshot(self.url, []), max_tokens)[0]
+
+    def render_with_baseline(
+        self, previous: "DomSnapshot", max_tokens: int = DEFAULT_SNAPSHOT_TOKENS
+    ) -> Tuple[str, "DomSnapshot"]:
+        """
+        Rendered changes plus `previous` with only the rendered ones applied.
+
+        Changes cut by the budget stay out of the baseline, so the next
+        diff reports them again.
+        """
+        if self.is_empty():
+            return f"Page {self.url}: no changes", previous
+        changes = (
+            [("+", element) for element in self.added]
+            + [("~", element) for element in self.changed]
+            + [("-", element) for element in self.removed]
+        )
+        lines = [
+            f"- {element.selector}" if op == "-" else f"{op} {element.render()}"
+            for op, element in changes
+        ]
+        text, shown = _render_lines(lines, max_tokens, f"Page {self.url} changes:")
+        baseline = {element.selector: element for element in previous.elements}
+        for op, element in changes[:shown]:
+            if op == "-":
+                baseline.pop(element.selector, None)
+            else:
+                baseline[element.selector] = element
+        return text, DomSnapshot(self.url, list(baseline.values()))
+
+
+@dataclass
+class DomSnapshot:
+    """Interactive elements of a page, compact enough to send to the planner"""
+
+    url: str
+    elements: List[SnapshotElement]
+    extraction_ms: float = 0.0
+
+    @classmethod
+    def from_script_result(
+        cls, result: Dict[str, Any], extraction_ms: float = 0.0
+    ) -> "DomSnapshot":
+        return cls(
+            url=result["url"],
+            elements=[SnapshotElement(**element) for element in result["elements"]],
+            extraction_ms=extraction_ms,
+        )
+
+    def render(self, max_tokens: int = DEFAULT_SNAPSHOT_TOKENS) -> str:
+        return self.render_with_baseline(max_tokens)[0]
+
+    def render_with_baseline(
+        self, max_tokens: int = DEFAULT_SNAPSHOT_TOKENS
+    ) -> Tuple[str, "DomSnapshot"]:
+        """Rendered snapshot plus the snapshot of only the elements it shows"""
+        # Visible elements are what the planner acts on, hidden ones go last
+        ordered = [e for e in self.elements if e.visible] + [
+            e for e in self.elements if not e.visible
+        ]
+        text, shown = _render_lines(
+            [element.render() for element in ordered], max_tokens, f"Page {self.url}:"
+        )
+        return text, DomSnapshot(self.url, ordered[:shown], self.extraction_ms)
+
+    def diff(self, previous: Optional["DomSnapshot"]) -> Optional[SnapshotDiff]:
+        """Changes since `previous`, None when a full snapshot is needed"""
+        if previous is None or previous.url != self.url:
+            return None
+        before = {element.selector: element for element in previous.elements}
+        after = {element.selector: element for element in self.elements}
+        return SnapshotDiff(
+            url=self.url,
+            added=[e for s, e in after.items() if s not in before],
+            removed=[e for s, e in before.items() if s not in after],
+            changed=[e for s, e in after.items() if s in before and before[s] != e],
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        rendered = self.render(max_tokens=10**9)
+        return {
+            "elements": len(self.elements),
+            "snapshot_chars": len(rendered),
+            "snapshot_tokens": estimate_tokens(rendered),
+            "extraction_ms": round(self.extraction_ms, 2),
+        }
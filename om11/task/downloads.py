@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import weakref
+from dataclasses import dataclass
+from typing import IO, Awaitable, Callable, Dict, List, Optional, Union
+from urllib.parse import unquote, urljoin, urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DOWNLOADS_DIR = "instance/downloads"
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_CONCURRENT = 4
+MAX_REDIRECTS = 5
+# Connection drops mid-body are resumed with a Range request this many times
+MAX_RESUMES = 3
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-\d+/(?:\d+|\*)")
+
+HeadersProvider = Callable[[str], Awaitable[Dict[str, str]]]
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: str
+    size: int
+    sha256: str
+    resumed_from: int
+    elapsed: float
+
+
+class _RestartDownload(Exception):
+    """The .part file cannot be continued, the transfer starts from zero"""
+
+
+def safe_filename(name: str) -> str:
+    """Last path component with unsafe characters replaced, '' if none is left"""
+    name = os.path.basename(name.replace("\\", "/"))
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name).lstrip(".")
+
+
+def filename_from_url(url: str) -> str:
+    name = safe_filename(unquote(urlparse(url).path))
+    return name or hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+def part_path_for(path: str, url: str) -> str:
+    """The .part file of `url`, so other urls saved under one name never mix"""
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    return f"{path}.{url_hash}.part"
+
+
+def _read_validator(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_validator(path: str, validator: Optional[str]) -> None:
+    if validator:
+        with open(path, "w") as f:
+            f.write(validator)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _remove(*paths: str) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _response_validator(resp: aiohttp.ClientResponse) -> Optional[str]:
+    """A strong ETag or Last-Modified usable in If-Range, weak ETags are not"""
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def _hash_file(path: str) -> "hashlib._Hash":
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher
+
+
+def _write_chunk(f: IO[bytes], hasher: "hashlib._Hash", chunk: bytes) -> None:
+    f.write(chunk)
+    hasher.update(chunk)
+
+
+class Downloader:
+    """
+    Streams files to disk in fixed-size chunks.
+
+    Request headers (cookies, user agent) come from a provider called for
+    every url and redirect hop, so browser cookies never leak to another
+    host. Interrupted transfers continue from the url's `.part` file with a
+    Range request guarded by If-Range, so a changed file is fetched again
+    instead of being spliced. The sha256 is computed while streaming.
+    """
+
+    def __init__(
+        self,
+        download_dir: str = DOWNLOADS_DIR,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.download_dir = download_dir
+        self.chunk_size = chunk_size
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # One download per target file at a time
+        self._file_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    async def download(
+        self,
+        url: str,
+        headers_for: Optional[HeadersProvider] = None,
+        filename: Optional[str] = None,
+        expected_sha256: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> DownloadResult:
+        if session is None:
+            async with aiohttp.ClientSession() as own_session:
+                return await self.download(
+                    url, headers_for, filename, expected_sha256, own_session
+                )
+
+        name = (filename and safe_filename(filename)) or filename_from_url(url)
+        path = os.path.join(self.download_dir, name)
+        lock = self._file_locks.get(path)
+        if lock is None:
+            lock = self._file_locks[path] = asyncio.Lock()
+        async with lock, self._slots:
+            started = time.monotonic()
+            result = await self._download_with_resume(
+                session, url, path, headers_for, started
+            )
+        if expected_sha256 and result.sha256 != expected_sha256.lower():
+            raise ValueError(
+                f"Checksum mismatch for {url}: {result.sha256} != {expected_sha256}"
+            )
+        return result
+
+    async def download_many(
+        self,
+        urls: List[str],
+        headers_for: Optional[HeadersProvider] = None,
+    ) -> List[Union[DownloadResult, BaseException]]:
+        """Download in parallel, at most `max_concurrent` at a time"""
+        async with aiohttp.ClientSession() as session:
+            return await asyncio.gather(
+                *(self.download(url, headers_for, session=session) for url in urls),
+                return_exceptions=True,
+            )
+
+    async def _download_with_resume(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        path: str,
+        headers_for: Optional[HeadersProvider],
+        started: float,
+    ) -> DownloadResult:
+        part_path = part_path_for(path, url)
+        validator_path = f"{part_path}.validator"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        resumed_from: Optional[int] = None
+
+        def started_over() -> None:
+            # Nothing of the .part file the download started with is kept
+            nonlocal resumed_from
+            resumed_from = 0
+
+        for attempt in range(MAX_RESUMES + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            validator = await asyncio.to_thread(_read_validator, validator_path)
+            if offset and validator is None:
+                # Without a validator the bytes could belong to another version
+                offset = 0
+            if resumed_from is None:
+                resumed_from = offset
+            try:
+                hasher = await self._stream(
+                    session,
+                    url,
+                    part_path,
+                    offset,
+                    validator,
+                    headers_for,
+                    started_over,
+                )
+                break
+            except _RestartDownload as e:
+                logger.warning(f"Download of {url} restarts from zero: {e}")
+                started_over()
+                await asyncio.to_thread(_remove, part_path, validator_path)
+                if attempt == MAX_RESUMES:
+                    raise RuntimeError(f"Download of {url} could not resume: {e}")
+            except (aiohttp.ClientPayloadError, aiohttp.ServerDisconnectedError) as e:
+                if attempt == MAX_RESUMES:
+                    raise
+                logger.warning(f"Download of {url} interrupted, resuming: {e}")
+        else:
+            raise RuntimeError(f"Download of {url} did not finish")
+
+        size = os.path.getsize(part_path)
+        os.replace(part_path, path)
+        await asyncio.to_thread(_remove, validator_path)
+        return DownloadResult(
+            url=url,
+            path=path,
+            size=size,
+            sha256=hasher.hexdigest(),
+            resumed_from=resumed_from or 0,
+            elapsed=time.monotonic() - started,
+        )
+
+    async def _stream(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        part_path: str,
+        offset: int,
+        validator: Optional[str],
+        headers_for: Optional[HeadersProvider],
+        started_over: Callable[[], None],
+    ) -> "hashlib._Hash":
+        for _ in range(MAX_REDIRECTS + 1):
+            headers = dict(await headers_for(url)) if headers_for else {}
+            if offset and validator:
+                headers["Range"] = f"bytes={offset}-"
+                # A changed file comes back whole with 200 instead of a range
+                headers["If-Range"] = validator
+            async with session.get(
+                url,
+                headers=headers,
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=60),
+            ) as resp:
+                if resp.status in (301, 302, 303, 307, 308):
+                    url = urljoin(url, resp.headers["Location"])
+                    continue
+                if resp.status == 416 and offset:
+                    # The .part file is longer than the file, it is not ours
+                    raise _RestartDownload("range not satisfiable")
+                resp.raise_for_status()
+
+                if resp.status == 206 and offset:
+                    match = CONTENT_RANGE_RE.match(
+                        resp.headers.get("Content-Range", "")
+                    )
+                    if match is None or int(match.group(1)) != offset:
+                        raise _RestartDownload(
+                            f"Content-Range {resp.headers.get('Content-Range')!r} "
+                            f"does not start at {offset}"
+                        )
+                    hasher = await asyncio.to_thread(_hash_file, part_path)
+                    mode = "ab"
+                else:
+                    # Server ignored the Range header or the file changed
+                    hasher = hashlib.sha256()
+                    mode = "wb"
+                    started_over()
+                    await asyncio.to_thread(
+                        _write_validator,
+                        f"{part_path}.validator",
+                        _response_validator(resp),
+                    )
+
+                f = await asyncio.to_thread(open, part_path, mode)
+                buffer = bytearray()
+                try:
+                    # Batch network reads so each worker-thread write is a full chunk
+                    async for data in resp.content.iter_any():
+                        buffer += data
+                        if len(buffer) >= self.chunk_size:
+                            await asyncio.to_thread(
+                                _write_chunk, f, hasher, bytes(buffer)
+                            )
+                            buffer.clear()
+                    if buffer:
+                        await asyncio.to_thread(_write_chunk, f, hasher, bytes(buffer))
+                finally:
+                    await asyncio.to_thread(f.close)
+                return hasher
+        raise RuntimeError(f"Too many redirects for {url}")
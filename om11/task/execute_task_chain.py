@@ -26,6 +26,14 @@ class InvalidTaskRegistryError(Exception):
     pass
 
 
+class MergedResults(list):
+    """Result lines of a nested chain, merged into the parent chain's output"""
+
+    def __init__(self, lines: Optional[List[str]] = None, summary: str = ""):
+        super().__init__(lines or [])
+        self.summary = summary
+
+
 async def filter_params(func: Callable, params: Dict[str, Any]) -> Dict[str, Any]:
     """Filtring params to pass to function only those that function can accept using standart module inspect"""
     signature = inspect.signature(func)
@@ -94,7 +102,13 @@ async def execute_task_chain(
     for task in task_chain:
         try:
             result = await task_executer(task, task_registry, user_data)
-            results.append(f"✅ {task.get('action', 'Unknown Task')}: {result}")
+            if isinstance(result, MergedResults):
+                results.append(
+                    f"✅ {task.get('action', 'Unknown Task')}: {result.summary}"
+                )
+                results.extend(result)
+            else:
+                results.append(f"✅ {task.get('action', 'Unknown Task')}: {result}")
         except (
             InvalidTaskChainError,
             ValueError,
@@ -0,0 +1,134 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_PAGE_SIZE = 1000
+FIELD_KINDS = ("text", "attr", "href", "html", "count")
+
+# Rows are cached on window between pages of one iteration, so paging
+# through a huge listing does not re-run querySelectorAll for every page.
+EXTRACT_SCRIPT = """({rowSelector, fields, offset, limit, reuse}) => {
+    const cache = window.__om11ExtractRows;
+    let rows;
+    if (reuse && cache && cache.selector === rowSelector) {
+        rows = cache.rows;
+    } else {
+        rows = Array.from(document.querySelectorAll(rowSelector));
+        window.__om11ExtractRows = {selector: rowSelector, rows: rows};
+    }
+    const end = limit === null ? rows.length : Math.min(rows.length, offset + limit);
+    const names = Object.keys(fields);
+    const columns = {};
+    for (const name of names) columns[name] = [];
+    const clean = (text) => text.replace(/\\s+/g, ' ').trim();
+    for (let i = offset; i < end; i++) {
+        const row = rows[i];
+        for (const name of names) {
+            const {selector, kind, attr} = fields[name];
+            if (kind === 'count') {
+                columns[name].push(selector ? row.querySelectorAll(selector).length : 1);
+                continue;
+            }
+            const el = selector ? row.querySelector(selector) : row;
+            let value = null;
+            if (el) {
+                if (kind === 'text') value = clean(el.textContent || '');
+                else if (kind === 'attr') value = el.getAttribute(attr);
+                else if (kind === 'href') {
+                    const raw = el.getAttribute(attr || 'href');
+                    try {
+                        value = raw === null ? null : new URL(raw, document.baseURI).href;
+                    } catch (e) {
+                        value = raw;
+                    }
+                } else if (kind === 'html') value = el.innerHTML;
+            }
+            columns[name].push(value);
+        }
+    }
+    // Release the element references once the last page was read
+    if (end >= rows.length) delete window.__om11ExtractRows;
+    return {total: rows.length, offset: offset, columns: columns};
+}"""
+
+FieldSpec = Union[str, Dict[str, Any]]
+
+
+def parse_field(spec: FieldSpec) -> Dict[str, Any]:
+    """
+    Normalize a field spec.
+
+    Strings are shorthand: "h2" is the text of the first h2 in the row,
+    "img@src" an attribute, "a@href" a resolved url and "@data-id" an
+    attribute of the row itself. Dicts take selector, kind and attr.
+    """
+    if isinstance(spec, str):
+        selector, _, attr = spec.partition("@")
+        if not attr:
+            spec = {"selector": selector, "kind": "text"}
+        elif attr in ("href", "src"):
+            spec = {"selector": selector, "kind": "href", "attr": attr}
+        else:
+            spec = {"selector": selector, "kind": "attr", "attr": attr}
+    kind = spec.get("kind", "text")
+    if kind not in FIELD_KINDS:
+        raise ValueError(f"Unknown field kind {kind!r}, expected one of {FIELD_KINDS}")
+    if kind == "attr" and not spec.get("attr"):
+        raise ValueError("Field kind 'attr' needs an attr name")
+    return {
+        "selector": spec.get("selector") or None,
+        "kind": kind,
+        "attr": spec.get("attr"),
+    }
+
+
+def parse_fields(fields: Dict[str, FieldSpec]) -> Dict[str, Dict[str, Any]]:
+    if not fields:
+        raise ValueError("At least one field is required")
+    return {name: parse_field(spec) for name, spec in fields.items()}
+
+
+@dataclass
+class ExtractionResult:
+    """Column arrays of one page of rows, every column has the same length"""
+
+    total: int
+    offset: int
+    columns: Dict[str, List[Any]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), []))
+
+    @property
+    def has_more(self) -> bool:
+        return self.offset + len(self) < self.total
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"total": self.total, "offset": self.offset, "columns": self.columns},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+
+def extraction_args(
+    row_selector: str,
+    fields: Dict[str, Dict[str, Any]],
+    offset: int,
+    limit: Optional[int],
+    reuse: bool,
+) -> Dict[str, Any]:
+    if offset < 0 or (limit is not None and limit <= 0):
+        raise ValueError("offset must be >= 0 and limit > 0")
+    return {
+        "rowSelector": row_selector,
+        "fields": fields,
+        "offset": offset,
+        "limit": limit,
+        "reuse": reuse,
+    }
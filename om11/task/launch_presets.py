@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+BASE_ARGS = ["--no-sandbox", "--disable-setuid-sandbox"]
+
+# Background services and features a scripted browser never needs
+QUIET_ARGS = [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-domain-reliability",
+    "--disable-extensions",
+    "--disable-sync",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+
+@dataclass(frozen=True)
+class LaunchPreset:
+    """Chromium launch arguments and page defaults for one kind of host"""
+
+    name: str
+    headless: bool
+    args: List[str] = field(default_factory=list)
+    viewport_width: int = 1280
+    viewport_height: int = 800
+    device_scale_factor: float = 1.0
+    # Milliseconds Playwright waits between operations, for watching a run
+    slow_mo: Optional[float] = None
+
+    def launch_kwargs(self, headless: Optional[bool] = None) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "headless": self.headless if headless is None else headless,
+            "args": BASE_ARGS + self.args,
+            "ignore_default_args": ["--enable-automation"],
+        }
+        if self.slow_mo is not None:
+            kwargs["slow_mo"] = self.slow_mo
+        return kwargs
+
+    def page_kwargs(self) -> Dict[str, Any]:
+        return {
+            "viewport": {
+                "width": self.viewport_width,
+                "height": self.viewport_height,
+            },
+            "device_scale_factor": self.device_scale_factor,
+        }
+
+
+LAUNCH_PRESETS: Dict[str, LaunchPreset] = {
+    # Previous init_browser behaviour
+    "default": LaunchPreset(name="default", headless=False),
+    # Many browsers per host: no GPU, fewer renderer processes, small viewport.
+    # Timer throttling of background pages is Chromium's default and kept on.
+    "dense-headless": LaunchPreset(
+        name="dense-headless",
+        headless=True,
+        args=QUIET_ARGS
+        + [
+            "--disable-gpu",
+            "--disable-dev-shm-usage",
+            "--disable-software-rasterizer",
+            "--renderer-process-limit=2",
+            # Share renderers between sites, fewer processes at the cost of isolation
+            "--disable-site-isolation-trials",
+            "--disable-features=Translate,MediaRouter,OptimizationHints,"
+            "BackForwardCache,IsolateOrigins,site-per-process",
+        ],
+        viewport_width=1024,
+        viewport_height=640,
+    ),
+    # Watching a chain step by step on a desktop
+    "debug-headful": LaunchPreset(
+        name="debug-headful",
+        headless=False,
+        args=["--auto-open-devtools-for-tabs"],
+        slow_mo=100,
+    ),
+}
+
+
+def get_preset(name: str) -> LaunchPreset:
+    try:
+        return LAUNCH_PRESETS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown launch preset {name!r}, expected one of {sorted(LAUNCH_PRESETS)}"
+        )
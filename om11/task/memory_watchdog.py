@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+from om11.metrics import metrics
+
+if TYPE_CHECKING:
+    from om11.task.browser_manager import BrowserManager
+
+DEFAULT_INTERVAL = 30.0
+DEFAULT_HEAP_LIMIT_MB = 512
+DEFAULT_PROCESS_LIMIT_MB = 1536
+MB = 1024 * 1024
+
+
+@dataclass
+class MemorySample:
+    """Memory of one browser: JS heap of the page and RSS of its renderers"""
+
+    js_heap_used: int
+    js_heap_total: int
+    # None when the renderer processes are not visible from this host
+    process_rss: Optional[int] = None
+
+    @property
+    def js_heap_used_mb(self) -> float:
+        return self.js_heap_used / MB
+
+    @property
+    def process_rss_mb(self) -> Optional[float]:
+        return None if self.process_rss is None else self.process_rss / MB
+
+
+def read_process_rss(pid: int) -> Optional[int]:
+    """Resident set size of a local process in bytes, None if unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class MemoryWatchdog:
+    """
+    Periodically samples every user's browser and recycles the page and
+    context once the JS heap or the renderer RSS crosses its limit.
+
+    Browsers busy with a command are skipped until the next round.
+    recycle_page() checks that again under the lock commands take in
+    in_use(), so a recycle never happens in the middle of a task chain.
+    """
+
+    def __init__(
+        self,
+        browsers: Dict[str, "BrowserManager"],
+        heap_limit_mb: float = DEFAULT_HEAP_LIMIT_MB,
+        process_limit_mb: float = DEFAULT_PROCESS_LIMIT_MB,
+        interval: float = DEFAULT_INTERVAL,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.browsers = browsers
+        self.heap_limit_mb = heap_limit_mb
+        self.process_limit_mb = process_limit_mb
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check_all()
+
+    async def check_all(self) -> Dict[str, str]:
+        """Check every browser once, returns user id -> recycle reason"""
+        recycled = {}
+        # Users may connect or disconnect while we await
+        for user_uuid, manager in list(self.browsers.items()):
+            try:
+                reason = await self.check(user_uuid, manager)
+            except Exception as e:
+                metrics.increment("memory_watchdog.errors")
+                self.logger.warning(f"Memory check failed for user {user_uuid}: {e}")
+                continue
+            if reason:
+                recycled[user_uuid] = reason
+        return recycled
+
+    async def check(self, user_uuid: str, manager: "BrowserManager") -> Optional[str]:
+        if manager.is_busy:
+            return None
+        sample = await manager.sample_memory()
+        metrics.observe("memory_watchdog.js_heap_mb", sample.js_heap_used_mb)
+        if sample.process_rss_mb is not None:
+            metrics.observe("memory_watchdog.process_rss_mb", sample.process_rss_mb)
+
+        reason = self.over_limit(sample)
+        if reason is None or manager.is_busy:
+            return None
+        self.logger.info(
+            f"Recycling browser page for user {user_uuid}: {reason} "
+            f"(heap {sample.js_heap_used_mb:.0f} MB, "
+            f"rss {sample.process_rss_mb or 0:.0f} MB)"
+        )
+        if not await manager.recycle_page():
+            # A command started while the browser was sampled
+            return None
+        metrics.increment("memory_watchdog.recycles", labels={"reason": reason})
+        return reason
+
+    def over_limit(self, sample: MemorySample) -> Optional[str]:
+        if sample.js_heap_used_mb > self.heap_limit_mb:
+            return "js_heap"
+        rss = sample.process_rss_mb
+        if rss is not None and rss > self.process_limit_mb:
+            return "process_rss"
+        return None
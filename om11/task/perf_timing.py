@@ -0,0 +1,196 @@
+import threading
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlparse
+
+from om11.metrics import metrics
+
+# Navigations kept per domain for the aggregated report
+REPORT_WINDOW = 500
+# Phases in the order they happen, together they add up to the wall time
+PHASES = (
+    "redirect",
+    "dns",
+    "connect",
+    "ttfb",
+    "download",
+    "dom_processing",
+    "load_event",
+    "idle_tail",
+)
+
+LONG_TASK_OBSERVER_SCRIPT = """(() => {
+    if (window.__om11LongTasks) return;
+    window.__om11LongTasks = [];
+    try {
+        new PerformanceObserver((list) => {
+            for (const entry of list.getEntries()) {
+                window.__om11LongTasks.push(entry.duration);
+            }
+        }).observe({type: 'longtask', buffered: true});
+    } catch (e) {}
+})();"""
+
+NAVIGATION_TIMING_SCRIPT = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    const resources = performance.getEntriesByType('resource');
+    const byType = {};
+    let transferSize = 0;
+    for (const r of resources) {
+        const bucket = byType[r.initiatorType] = byType[r.initiatorType]
+            || {count: 0, duration: 0, transfer_size: 0};
+        bucket.count += 1;
+        bucket.duration += r.duration;
+        bucket.transfer_size += r.transferSize || 0;
+        transferSize += r.transferSize || 0;
+    }
+    const slowest = [...resources]
+        .sort((a, b) => b.duration - a.duration)
+        .slice(0, 5)
+        .map((r) => ({url: r.name, type: r.initiatorType, duration: r.duration}));
+    const longTasks = window.__om11LongTasks || [];
+    return {
+        url: location.href,
+        redirect: nav.redirectEnd - nav.redirectStart,
+        dns: nav.domainLookupEnd - nav.domainLookupStart,
+        connect: nav.connectEnd - nav.connectStart,
+        tls: nav.secureConnectionStart > 0 ? nav.connectEnd - nav.secureConnectionStart : 0,
+        ttfb: nav.responseStart - nav.requestStart,
+        download: nav.responseEnd - nav.responseStart,
+        dom_processing: Math.max(0, nav.domContentLoadedEventEnd - nav.responseEnd),
+        load_event: Math.max(0, nav.loadEventEnd - nav.domContentLoadedEventEnd),
+        load: nav.loadEventEnd - nav.startTime,
+        document_size: nav.transferSize || 0,
+        resources: {
+            count: resources.length,
+            transfer_size: transferSize,
+            by_type: byType,
+            slowest: slowest,
+        },
+        long_tasks: {
+            count: longTasks.length,
+            total: longTasks.reduce((sum, d) => sum + d, 0),
+            longest: longTasks.length ? Math.max(...longTasks) : 0,
+        },
+    };
+}"""
+
+
+@dataclass
+class NavigationTiming:
+    """Where the time of one navigation went, all durations in milliseconds"""
+
+    url: str
+    wall: float
+    redirect: float = 0.0
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    ttfb: float = 0.0
+    download: float = 0.0
+    dom_processing: float = 0.0
+    load_event: float = 0.0
+    load: float = 0.0
+    idle_tail: float = 0.0
+    document_size: int = 0
+    resources: Dict[str, Any] = field(default_factory=dict)
+    long_tasks: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_script_result(
+        cls, result: Dict[str, Any], wall_ms: float
+    ) -> "NavigationTiming":
+        fields = {k: v for k, v in result.items() if k in cls.__dataclass_fields__}
+        timing = cls(wall=wall_ms, **fields)
+        # Time spent waiting for networkidle after the load event
+        timing.idle_tail = max(0.0, wall_ms - timing.load) if timing.load else 0.0
+        return timing
+
+    @property
+    def domain(self) -> str:
+        return urlparse(self.url).hostname or "unknown"
+
+    def phases(self) -> Dict[str, float]:
+        return {phase: getattr(self, phase) for phase in PHASES}
+
+    def summary(self) -> str:
+        slowest = max(self.phases().items(), key=lambda item: item[1])
+        text = (
+            f"ttfb {self.ttfb:.0f}ms, load {self.load:.0f}ms, "
+            f"idle tail {self.idle_tail:.0f}ms, slowest phase {slowest[0]}"
+        )
+        if self.long_tasks.get("count"):
+            text += (
+                f", {self.long_tasks['count']} long tasks "
+                f"({self.long_tasks['total']:.0f}ms)"
+            )
+        return text
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class NavigationStats:
+    """Process-wide per-domain aggregation of navigation timings"""
+
+    def __init__(self, window: int = REPORT_WINDOW):
+        self._lock = threading.Lock()
+        self._timings: Dict[str, Deque[NavigationTiming]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def record(self, timing: NavigationTiming) -> None:
+        with self._lock:
+            self._timings[timing.domain].append(timing)
+        labels = {"domain": timing.domain}
+        metrics.observe("navigation.wall_ms", timing.wall, labels)
+        for phase, value in timing.phases().items():
+            metrics.observe(f"navigation.{phase}_ms", value, labels)
+        metrics.increment(
+            "navigation.long_tasks", timing.long_tasks.get("count", 0), labels
+        )
+
+    def report(self) -> Dict[str, Any]:
+        """Per domain: navigation count, mean per phase and each phase's share"""
+        with self._lock:
+            snapshot = {domain: list(items) for domain, items in self._timings.items()}
+
+        report: Dict[str, Any] = {}
+        for domain, timings in snapshot.items():
+            count = len(timings)
+            means = {
+                phase: sum(t.phases()[phase] for t in timings) / count
+                for phase in PHASES
+            }
+            total = sum(means.values()) or 1.0
+            walls = sorted(t.wall for t in timings)
+            report[domain] = {
+                "navigations": count,
+                "wall_ms_p50": round(walls[len(walls) // 2], 1),
+                "wall_ms_p95": round(walls[min(count - 1, int(count * 0.95))], 1),
+                "mean_ms": {phase: round(value, 1) for phase, value in means.items()},
+                "share": {
+                    phase: round(value / total, 3) for phase, value in means.items()
+                },
+                "long_tasks_per_navigation": round(
+                    sum(t.long_tasks.get("count", 0) for t in timings) / count, 2
+                ),
+            }
+        return dict(sorted(report.items(), key=lambda item: -item[1]["navigations"]))
+
+    def domains(self) -> List[str]:
+        with self._lock:
+            return list(self._timings)
+
+
+navigation_stats = NavigationStats()
+
+
+def parse_timing(
+    result: Optional[Dict[str, Any]], wall_ms: float
+) -> Optional[NavigationTiming]:
+    if not result:
+        return None
+    return NavigationTiming.from_script_result(result, wall_ms)
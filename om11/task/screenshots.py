@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+SCREENSHOT_SCALES = ("css", "device")
+_EXTENSION_FORMATS = {
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".webp": "webp",
+}
+
+
+@dataclass
+class ScreenshotOptions:
+    """Capture options for BrowserManager.capture_screenshot"""
+
+    image_format: str = "png"
+    quality: Optional[int] = None
+    full_page: bool = False
+    clip: Optional[Dict[str, float]] = None
+    selector: Optional[str] = None
+    scale: str = "device"
+
+    def __post_init__(self):
+        self.image_format = self.image_format.lower()
+        if self.image_format == "jpg":
+            self.image_format = "jpeg"
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported screenshot format: {self.image_format}")
+        if self.quality is not None:
+            if self.image_format == "png":
+                raise ValueError("Quality is not supported for png screenshots")
+            if not 0 <= int(self.quality) <= 100:
+                raise ValueError("Screenshot quality must be between 0 and 100")
+            self.quality = int(self.quality)
+        if self.scale not in SCREENSHOT_SCALES:
+            raise ValueError(f"Unsupported screenshot scale: {self.scale}")
+        if self.clip is not None:
+            missing = {"x", "y", "width", "height"} - set(self.clip)
+            if missing:
+                raise ValueError(f"Screenshot clip is missing {sorted(missing)}")
+
+    @classmethod
+    def from_path(
+        cls, path: Optional[str], image_format: Optional[str] = None, **kwargs: Any
+    ) -> "ScreenshotOptions":
+        """Build options, inferring the format from the file extension"""
+        if image_format is None and path:
+            extension = os.path.splitext(path)[1].lower()
+            image_format = _EXTENSION_FORMATS.get(extension, "png")
+        return cls(image_format=image_format or "png", **kwargs)
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self.image_format}"
+
+    def playwright_kwargs(self, element: bool = False) -> Dict[str, Any]:
+        """Keyword arguments for Page.screenshot / ElementHandle.screenshot"""
+        kwargs: Dict[str, Any] = {"type": self.image_format, "scale": self.scale}
+        if self.quality is not None:
+            kwargs["quality"] = self.quality
+        if not element:
+            kwargs["full_page"] = self.full_page
+            if self.clip is not None:
+                kwargs["clip"] = self.clip
+        return kwargs
+
+    def cdp_params(
+        self, clip: Optional[Dict[str, float]] = None, scale: float = 1
+    ) -> Dict[str, Any]:
+        """Parameters for the CDP Page.captureScreenshot command"""
+        params: Dict[str, Any] = {
+            "format": self.image_format,
+            "captureBeyondViewport": self.full_page,
+        }
+        if self.quality is not None:
+            params["quality"] = self.quality
+        clip = clip or self.clip
+        if clip is not None:
+            params["clip"] = {
+                "x": clip["x"],
+                "y": clip["y"],
+                "width": clip["width"],
+                "height": clip["height"],
+                "scale": scale,
+            }
+        return params
+
+
+class ScreenshotStore:
+    """Persists screenshots off the event loop, skipping identical consecutive frames"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_digest: Optional[str] = None
+        self._last_path: Optional[str] = None
+
+    async def save(self, data: bytes, path: str) -> Tuple[str, bool]:
+        """
+        Write a frame to disk in a worker thread.
+
+        Returns:
+            Tuple of the path holding the frame and whether it was written.
+            When the frame equals the previous one the earlier path is returned.
+        """
+        return await asyncio.to_thread(self._save_sync, data, path)
+
+    def _save_sync(self, data: bytes, path: str) -> Tuple[str, bool]:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if (
+                digest == self._last_digest
+                and self._last_path is not None
+                and os.path.exists(self._last_path)
+            ):
+                return self._last_path, False
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            self._last_digest = digest
+            self._last_path = path
+        return path, True
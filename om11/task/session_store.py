@@ -0,0 +1,224 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import string
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+SESSIONS_DIR = "instance/sessions"
+COOKIES_PART = "cookies"
+# Kept as is in manifest file names, anything else is percent-escaped
+SAFE_NAME_CHARS = frozenset(string.ascii_letters + string.digits + "_-")
+# Keys written by the restore script itself, never part of a snapshot
+MARKER_PREFIX = "__om11_"
+
+SESSION_STORAGE_SCRIPT = """() => {
+    const prefix = '__om11_';
+    try {
+        return {
+            origin: location.origin,
+            items: Object.fromEntries(
+                Object.entries(sessionStorage).filter(([key]) => !key.startsWith(prefix))
+            ),
+        };
+    } catch (e) {
+        return {origin: location.origin, items: {}};
+    }
+}"""
+
+RESTORE_STORAGE_SCRIPT = """([origin, storage, marker]) => {
+    if (origin && location.origin !== origin) return false;
+    for (const [area, items] of Object.entries(storage)) {
+        let target;
+        try { target = window[area]; } catch (e) { continue; }
+        if (!target || target.getItem('__om11_restored') === marker) continue;
+        for (const [key, value] of Object.entries(items)) target.setItem(key, value);
+        target.setItem('__om11_restored', marker);
+    }
+    return true;
+}"""
+
+
+def restore_init_script(pending: Dict[str, List[Any]]) -> str:
+    """
+    Init script restoring the storage of whichever pending origin a page opens.
+
+    `pending` maps origin -> [storage, marker]. One script carries every
+    origin so a context never holds more than one.
+    """
+    return (
+        f"(pending => {{ const entry = pending[location.origin]; "
+        f"if (entry) ({RESTORE_STORAGE_SCRIPT})([location.origin, ...entry]); }})"
+        f"({json.dumps(pending)})"
+    )
+
+
+def _canonical(payload: Any) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(_canonical(payload)).hexdigest()
+
+
+def _safe_name(name: str) -> str:
+    """Distinct file name per id, bytes other than [A-Za-z0-9_-] become %XX"""
+    return (
+        "".join(
+            chr(b) if chr(b) in SAFE_NAME_CHARS else f"%{b:02X}"
+            for b in name.encode("utf-8")
+        )
+        or "%"
+    )
+
+
+@dataclass
+class SessionSnapshot:
+    """Cookies plus per-origin localStorage/sessionStorage items"""
+
+    # Playwright cookie dicts, as storage_state() returns and add_cookies() takes
+    cookies: List[Any] = field(default_factory=list)
+    origins: Dict[str, Dict[str, Dict[str, str]]] = field(default_factory=dict)
+
+    @classmethod
+    def from_storage_state(
+        cls,
+        state: Mapping[str, Any],
+        session_storage: Optional[Dict[str, Any]] = None,
+    ) -> "SessionSnapshot":
+        """Build a snapshot from BrowserContext.storage_state() output"""
+        origins: Dict[str, Dict[str, Dict[str, str]]] = {}
+        for entry in state.get("origins", []):
+            items = {
+                item["name"]: item["value"]
+                for item in entry.get("localStorage", [])
+                if not item["name"].startswith(MARKER_PREFIX)
+            }
+            if items:
+                origins[entry["origin"]] = {"localStorage": items}
+
+        if session_storage and session_storage.get("items"):
+            origin = session_storage.get("origin")
+            if origin and origin != "null":
+                origins.setdefault(origin, {})["sessionStorage"] = session_storage[
+                    "items"
+                ]
+        return cls(cookies=state.get("cookies", []), origins=origins)
+
+    def parts(self) -> Dict[str, Any]:
+        parts: Dict[str, Any] = {COOKIES_PART: self.cookies}
+        parts.update(self.origins)
+        return parts
+
+    def digests(self) -> Dict[str, str]:
+        return {key: _digest(value) for key, value in self.parts().items()}
+
+    @classmethod
+    def from_parts(cls, parts: Dict[str, Any]) -> "SessionSnapshot":
+        parts = dict(parts)
+        cookies = parts.pop(COOKIES_PART, [])
+        return cls(cookies=cookies, origins=parts)
+
+    def is_empty(self) -> bool:
+        return not self.cookies and not self.origins
+
+
+class SessionStore:
+    """
+    Content-addressed, gzip-compressed session storage keyed by user/profile.
+
+    Layout:
+        objects/<sha256>.json.gz     one blob per cookie jar or origin storage
+        refs/<user>/<profile>.json   manifest mapping part name -> blob digest
+
+    Unchanged parts are written once and shared between saves and profiles.
+    """
+
+    def __init__(self, base_dir: str = SESSIONS_DIR):
+        self.base_dir = base_dir
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.base_dir, "objects", f"{digest}.json.gz")
+
+    def _manifest_path(self, user_id: str, profile: str) -> str:
+        return os.path.join(
+            self.base_dir, "refs", _safe_name(user_id), f"{_safe_name(profile)}.json"
+        )
+
+    async def save(
+        self, user_id: str, profile: str, snapshot: SessionSnapshot
+    ) -> Dict[str, str]:
+        """Persist a snapshot off the event loop and return its part digests"""
+        return await asyncio.to_thread(self._save_sync, user_id, profile, snapshot)
+
+    async def load(
+        self,
+        user_id: str,
+        profile: str,
+        known: Optional[Dict[str, str]] = None,
+    ) -> Tuple[Dict[str, str], SessionSnapshot]:
+        """
+        Load a snapshot, skipping parts whose digest is already in `known`.
+
+        Returns:
+            Tuple of the full part digest map and a snapshot holding only
+            the parts that changed.
+
+        Raises:
+            FileNotFoundError: If no session was saved for user/profile
+        """
+        return await asyncio.to_thread(self._load_sync, user_id, profile, known or {})
+
+    def _save_sync(
+        self, user_id: str, profile: str, snapshot: SessionSnapshot
+    ) -> Dict[str, str]:
+        digests: Dict[str, str] = {}
+        for key, payload in snapshot.parts().items():
+            data = _canonical(payload)
+            digest = hashlib.sha256(data).hexdigest()
+            digests[key] = digest
+            object_path = self._object_path(digest)
+            if not os.path.exists(object_path):
+                self._write_atomic(object_path, gzip.compress(data))
+
+        manifest = {"parts": digests, "saved_at": time.time()}
+        self._write_atomic(
+            self._manifest_path(user_id, profile),
+            json.dumps(manifest).encode("utf-8"),
+        )
+        return digests
+
+    def _load_sync(
+        self, user_id: str, profile: str, known: Dict[str, str]
+    ) -> Tuple[Dict[str, str], SessionSnapshot]:
+        manifest_path = self._manifest_path(user_id, profile)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No session saved for {user_id}/{profile}")
+        with open(manifest_path, "r") as f:
+            digests: Dict[str, str] = json.load(f)["parts"]
+
+        changed: Dict[str, Any] = {}
+        for key, digest in digests.items():
+            if known.get(key) == digest:
+                continue
+            with open(self._object_path(digest), "rb") as f:
+                changed[key] = json.loads(gzip.decompress(f.read()))
+        return digests, SessionSnapshot.from_parts(changed)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Unique per writer, concurrent saves never share a temp file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -32,12 +32,15 @@ def register_tasks(tasks):
         "uncheck_checkbox": tasks.uncheck_checkbox,
         "upload_file": tasks.upload_file,
         "wait_captcha_frame": tasks.wait_captcha_frame,
+        "watch_captchas": tasks.watch_captchas,
         "wait_email": tasks.wait_email,
         "wait_for": tasks.wait_for,
         "check_element_contains_text": tasks.check_element_contains_text,
         "click_link_with_text": tasks.click_link_with_text,
         "detect_captcha_type": tasks.detect_captcha_type,
         "download_file": tasks.download_file,
+        "download_files": tasks.download_files,
+        "extract_data": tasks.extract_data,
         "extract_emails_from_page": tasks.extract_emails_from_page,
         "get_links_from_selector": tasks.get_links_from_selector,
         "move_mouse": tasks.move_mouse,
@@ -46,5 +49,7 @@ def register_tasks(tasks):
         "run_multiple_sessions_from_file": tasks.run_multiple_sessions_from_file,
         "setup_octo_session_from_folder": tasks.setup_octo_session_from_folder,
         "solve_best_captcha": tasks.solve_best_captcha,
+        "run_in_tabs": tasks.run_in_tabs,
+        "snapshot_page": tasks.snapshot_page,
     }
     return task_registry
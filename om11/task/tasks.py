@@ -1,18 +1,39 @@
-import json
+import asyncio
+import copy
 import os
 import random
 import re
 import time
-from typing import Any, Dict, List
+import warnings
+from typing import Any, Dict, List, Optional
 
 from om11.task.browser_manager import BrowserManager
+from om11.task.captcha_keys import api_key_store
 from om11.task.captcha_manager import CaptchaSolver
+from om11.task.dom_snapshot import DEFAULT_SNAPSHOT_TOKENS
+from om11.task.downloads import safe_filename
+from om11.task.execute_task_chain import MergedResults, Task, execute_task_chain
+from om11.task.extraction import DEFAULT_PAGE_SIZE
+from om11.task.screenshots import ScreenshotOptions
+from om11.task.task_registry import register_tasks
+
+EXPORTS_DIR = "instance/exports"
 
 
 class Tasks:
-    def __init__(self, browser_manager: BrowserManager, captcha_service: Any):
+    def __init__(
+        self,
+        browser_manager: BrowserManager,
+        captcha_service: Any,
+        user_id: str = "default",
+        exports_dir: str = EXPORTS_DIR,
+    ):
         self.browser = browser_manager
         self.captcha_service = captcha_service
+        # The authenticated user the chain runs for, never taken from the chain
+        self.user_id = user_id
+        # Files written by tasks stay in here, whatever name the chain asks for
+        self.exports_dir = exports_dir
 
     # Non-browser tasks
     def sleep(self, seconds: float) -> str:
@@ -73,13 +94,42 @@ class Tasks:
         await self.browser.scroll_to(selector)
         return f"Scrolled to {selector}."
 
-    async def screenshot(self, filename: str = "screenshot.png") -> str:
-        await self.browser.screenshot(filename)
-        return f"Screenshot saved: {filename}"
-
-    async def save_session(self, path: str = "session.json") -> str:
-        await self.browser.save_session(path)
-        return "Session saved."
+    async def screenshot(
+        self,
+        path: str = "screenshot.png",
+        full_page: bool = False,
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        clip: Optional[Dict[str, float]] = None,
+        selector: Optional[str] = None,
+        scale: str = "device",
+    ) -> str:
+        options = ScreenshotOptions.from_path(
+            path,
+            image_format=image_format,
+            quality=quality,
+            full_page=full_page,
+            clip=clip,
+            selector=selector,
+            scale=scale,
+        )
+        saved_path = await self.browser.screenshot(path, options)
+        if saved_path != path:
+            return f"Screenshot unchanged, already saved: {saved_path}"
+        return f"Screenshot saved: {path}"
+
+    async def save_session(
+        self, profile: str = "default", path: Optional[str] = None
+    ) -> str:
+        if path is not None:
+            warnings.warn(
+                "save_session(path=...) is deprecated, use profile",
+                DeprecationWarning,
+            )
+            await self.browser.save_cookies(path)
+            return f"Cookies saved: {path}."
+        await self.browser.save_session(self.user_id, profile)
+        return f"Session saved: {profile}."
 
     async def refresh(self) -> str:
         await self.browser.refresh()
@@ -91,11 +141,23 @@ class Tasks:
 
     async def open_url(self, url: str) -> str:
         await self.browser.open_url(url)
-        return f"Opened site {url}."
-
-    async def load_session(self, path: str = "session.json") -> str:
-        await self.browser.load_session(path)
-        return "Session loaded."
+        timing = self.browser.last_navigation
+        if timing is None:
+            return f"Opened site {url}."
+        return f"Opened site {url} ({timing.summary()})."
+
+    async def load_session(
+        self, profile: str = "default", path: Optional[str] = None
+    ) -> str:
+        if path is not None:
+            warnings.warn(
+                "load_session(path=...) is deprecated, use profile",
+                DeprecationWarning,
+            )
+            await self.browser.load_cookies(path)
+            return f"Cookies loaded: {path}."
+        restored = await self.browser.load_session(self.user_id, profile)
+        return f"Session loaded: {profile}, {restored} origins restored."
 
     async def hover(self, selector: str) -> str:
         await self.browser.hover(selector)
@@ -151,11 +213,74 @@ class Tasks:
     async def detect_captcha_type(self) -> Any:
         # self.browser.context.new_page()
         async with CaptchaSolver(self.browser._page) as solver:
-            return solver.detect()
+            return await solver.detect()
+
+    async def snapshot_page(
+        self, max_tokens: int = DEFAULT_SNAPSHOT_TOKENS, incremental: bool = True
+    ) -> str:
+        return await self.browser.snapshot_dom(max_tokens, incremental)
+
+    async def download_file(
+        self,
+        url: str,
+        filename: Optional[str] = None,
+        sha256: Optional[str] = None,
+    ) -> str:
+        result = await self.browser.download_file(url, filename, sha256)
+        return (
+            f"File downloaded from {url} to {result.path} "
+            f"({result.size} bytes, sha256 {result.sha256})"
+        )
 
-    async def download_file(self, url: str) -> str:
-        await self.browser.download_file(url)
-        return f"File downloaded from {url}"
+    async def download_files(self, urls: List[str]) -> List[str]:
+        lines = []
+        for url, result in zip(urls, await self.browser.download_files(urls)):
+            if isinstance(result, BaseException):
+                lines.append(f"❌ {url}: {result}")
+            else:
+                lines.append(
+                    f"{url} -> {result.path} "
+                    f"({result.size} bytes, sha256 {result.sha256})"
+                )
+        return lines
+
+    async def extract_data(
+        self,
+        row_selector: str,
+        fields: Dict[str, Any],
+        offset: int = 0,
+        limit: Optional[int] = None,
+        save_to: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> str:
+        """
+        Extract a table of fields per row. Returns the column arrays as JSON,
+        or with `save_to` streams every page as a JSON line to that file
+        in the exports directory.
+        """
+        if save_to is None:
+            result = await self.browser.extract_records(
+                row_selector, fields, offset, limit
+            )
+            return result.to_json()
+
+        name = safe_filename(save_to)
+        if not name:
+            raise ValueError(f"Invalid export file name: {save_to!r}")
+        path = os.path.join(self.exports_dir, name)
+        await asyncio.to_thread(os.makedirs, self.exports_dir, exist_ok=True)
+
+        rows = 0
+        f = await asyncio.to_thread(open, path, "w", encoding="utf-8")
+        try:
+            async for page in self.browser.iter_records(
+                row_selector, fields, page_size
+            ):
+                await asyncio.to_thread(f.write, page.to_json() + "\n")
+                rows += len(page)
+        finally:
+            await asyncio.to_thread(f.close)
+        return f"Extracted {rows} rows of {row_selector} to {path}."
 
     async def extract_emails_from_page(self) -> List[str]:
         return await self.browser.extract_emails_from_page()
@@ -175,6 +300,45 @@ class Tasks:
         await self.browser.type_slow(selector, text, delay)
         return f"Slowly typed '{text}' into {selector}."
 
+    async def run_in_tabs(
+        self,
+        urls: List[str],
+        chain: List[Task],
+        max_tabs: Optional[int] = None,
+    ) -> MergedResults:
+        """Open each url in its own tab and run `chain` on all tabs concurrently."""
+        if not urls:
+            raise ValueError("No urls provided.")
+        slots = asyncio.Semaphore(max_tabs or len(urls))
+        started = time.monotonic()
+
+        async def run_tab(url: str) -> List[str]:
+            async with slots:
+                async with self.browser.open_tab(url) as tab:
+                    tab_tasks = Tasks(
+                        browser_manager=tab,
+                        captcha_service=self.captcha_service,
+                        user_id=self.user_id,
+                        exports_dir=self.exports_dir,
+                    )
+                    # execute_task mutates params, every tab gets its own copy
+                    return await execute_task_chain(
+                        copy.deepcopy(chain), register_tasks(tab_tasks)
+                    )
+
+        tab_results = await asyncio.gather(
+            *(run_tab(url) for url in urls), return_exceptions=True
+        )
+        merged = MergedResults(
+            summary=f"{len(urls)} tabs in {time.monotonic() - started:.1f} seconds."
+        )
+        for index, (url, result) in enumerate(zip(urls, tab_results), start=1):
+            if isinstance(result, BaseException):
+                merged.append(f"❌ [tab {index}: {url}] {result}")
+            else:
+                merged.extend(f"[tab {index}: {url}] {line}" for line in result)
+        return merged
+
     # File and session management tasks
     def read_paths_from_file(self, params: Dict[str, Any]) -> Dict[str, Any]:
         filepath = params.get("file")
@@ -232,20 +396,39 @@ class Tasks:
         return {"status": "ok", "folder": folder_path, "profile": profile_index + 1}
 
     async def solve_best_captcha(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        user_id = params.get("user_id", "default")
+        # A captcha the watcher already solved, or is solving, was charged there
+        watcher = self.browser.captcha_watcher
+        if watcher is not None and await watcher.take(self.browser._page):
+            return {"status": "ok", "result": True}
 
+        status = await self._solve_captcha(
+            self.browser._page, self.user_id, bool(params.get("hedge", False))
+        )
+        if status:
+            return {"status": "ok", "result": status}
+        else:
+            return {"status": "error", "result": None}
+
+    async def watch_captchas(self, hedge: bool = False) -> str:
+        """Start solving captchas as soon as they mount, while the chain goes on"""
+        # Lives on the session until close_browser, later commands share it
+        user_id = self.user_id
+        await self.browser.watch_captchas(
+            lambda page: self._solve_captcha(page, user_id, hedge)
+        )
+        return "Watching for captchas."
+
+    async def _solve_captcha(self, page: Any, user_id: str, hedge: bool) -> bool:
         # Check if user can use captcha service
         if not self.captcha_service.can_use_captcha(user_id):
             raise ValueError("🚫 User has exceeded captcha limit.")
 
-        api_keys_path = "instance/api_keys/api_keys.json"
-        with open(api_keys_path, "r") as f:
-            api_keys: Dict[str, str] = json.load(f)
+        # Reloaded only when the file changes, see captcha_keys
+        await api_key_store.refresh()
+        api_keys: Dict[str, str] = api_key_store.pick()
 
-        async with CaptchaSolver(self.browser._page) as solver:
-            status = await solver.solve(api_keys=api_keys)
-            if status:
-                self.captcha_service.increment_user_usage(user_id)
-                return {"status": "ok", "result": status}
-            else:
-                return {"status": "error", "result": None}
+        async with CaptchaSolver(page) as solver:
+            status = await solver.solve(api_keys=api_keys, hedge=hedge)
+        if status:
+            self.captcha_service.increment_user_usage(user_id)
+        return status
@@ -0,0 +1,82 @@
+import os
+import re
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+TRACES_DIR = "instance/traces"
+DEFAULT_MAX_TRACES = 200
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+class TraceStore:
+    """
+    Playwright trace archives on disk, one zip per job id.
+
+    Retention is enforced after every new trace: archives older than
+    `max_age` seconds go first, then the oldest ones until both the count
+    and the total size are within limits.
+    """
+
+    def __init__(
+        self,
+        base_dir: str = TRACES_DIR,
+        max_traces: int = DEFAULT_MAX_TRACES,
+        max_age: float = DEFAULT_MAX_AGE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.base_dir = base_dir
+        self.max_traces = max_traces
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+    def path_for(self, job_id: str) -> str:
+        # Job ids end up in a file path and come from the API
+        if not JOB_ID_PATTERN.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        return os.path.join(self.base_dir, f"{job_id}.zip")
+
+    def get(self, job_id: str) -> Optional[str]:
+        path = self.path_for(job_id)
+        return path if os.path.exists(path) else None
+
+    def _traces(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every archive, oldest first"""
+        traces = []
+        try:
+            entries = list(os.scandir(self.base_dir))
+        except FileNotFoundError:
+            return []
+        for entry in entries:
+            if entry.name.endswith(".zip"):
+                stat = entry.stat()
+                traces.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(traces)
+
+    def enforce_retention(self, now: Optional[float] = None) -> int:
+        """Delete archives over the limits, returns how many were removed"""
+        now = time.time() if now is None else now
+        traces = self._traces()
+        total = sum(size for _, size, _ in traces)
+        removed = 0
+        for mtime, size, path in traces:
+            if (
+                now - mtime <= self.max_age
+                and len(traces) - removed <= self.max_traces
+                and total <= self.max_bytes
+            ):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_manager import CaptchaSolver, CaptchaType
+from om11.task.captcha_polling import PollScheduler, SolveTimeModel
+
+PARAMS = {"url": "https://shop.example/login", "sitekey": "site-key"}
+
+
+class MockAntiCaptcha:
+    """Anti-Captcha createTask/getTaskResult, tasks ready after `solve_time`"""
+
+    def __init__(self, solve_time):
+        self.solve_time = solve_time
+        self.tasks = {}
+        self.polls = 0
+
+    async def create_task(self, request):
+        payload = await request.json()
+        if payload["clientKey"] != "good-key":
+            return web.json_response(
+                {"errorId": 1, "errorCode": "ERROR_KEY_DOES_NOT_EXIST"}
+            )
+        task_id = len(self.tasks) + 1
+        self.tasks[task_id] = (payload["task"], time.monotonic() + self.solve_time)
+        return web.json_response({"errorId": 0, "taskId": task_id})
+
+    async def get_task_result(self, request):
+        self.polls += 1
+        payload = await request.json()
+        _, ready_at = self.tasks[payload["taskId"]]
+        if time.monotonic() < ready_at:
+            return web.json_response({"errorId": 0, "status": "processing"})
+        return web.json_response(
+            {
+                "errorId": 0,
+                "status": "ready",
+                "solution": {"gRecaptchaResponse": f"token-{payload['taskId']}"},
+            }
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/createTask", self.create_task)
+        app.router.add_post("/getTaskResult", self.get_task_result)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return str(self.server.make_url("")).rstrip("/")
+
+
+def make_solver(base_url):
+    scheduler = PollScheduler(
+        SolveTimeModel(first_poll=0.05, min_interval=0.02, max_interval=0.1)
+    )
+    return CaptchaSolver(
+        page=None, api_urls={"anticaptcha": base_url}, scheduler=scheduler
+    )
+
+
+@pytest.mark.asyncio
+async def test_solve_does_not_block_the_event_loop():
+    provider = MockAntiCaptcha(solve_time=0.3)
+    base_url = await provider.start()
+    gaps = []
+
+    async def heartbeat():
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+
+    beating = asyncio.create_task(heartbeat())
+    try:
+        solver = make_solver(base_url)
+        solution = await solver._solve_anticaptcha(
+            CaptchaType.RECAPTCHA_V3, "good-key", {**PARAMS, "action": "login"}
+        )
+    finally:
+        beating.cancel()
+        await captcha_http.close()
+        await provider.server.close()
+
+    assert solution.token == "token-1"
+    task, _ = provider.tasks[1]
+    assert task == {
+        "type": "RecaptchaV3TaskProxyless",
+        "websiteURL": PARAMS["url"],
+        "websiteKey": "site-key",
+        "minScore": 0.5,
+        "pageAction": "login",
+    }
+    # Other coroutines kept running all through the solve
+    assert len(gaps) > 15
+    assert max(gaps) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised():
+    provider = MockAntiCaptcha(solve_time=0)
+    base_url = await provider.start()
+    try:
+        with pytest.raises(RuntimeError, match="ERROR_KEY_DOES_NOT_EXIST"):
+            await make_solver(base_url)._solve_anticaptcha(
+                CaptchaType.HCAPTCHA, "bad-key", PARAMS
+            )
+        with pytest.raises(ValueError, match="Unsupported"):
+            await make_solver(base_url)._solve_anticaptcha(
+                CaptchaType.TURNSTILE, "good-key", PARAMS
+            )
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_solve_stops_polling():
+    provider = MockAntiCaptcha(solve_time=10)
+    base_url = await provider.start()
+    solver = make_solver(base_url)
+    try:
+        solving = asyncio.create_task(
+            solver._solve_anticaptcha(CaptchaType.HCAPTCHA, "good-key", PARAMS)
+        )
+        await asyncio.sleep(0.3)
+        solving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await solving
+        polls = provider.polls
+        assert polls > 0
+        assert solver.scheduler.pending("anticaptcha") == 0
+
+        await asyncio.sleep(0.3)
+        assert provider.polls == polls
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
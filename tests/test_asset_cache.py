@@ -0,0 +1,233 @@
+from contextlib import asynccontextmanager
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from om11.task.asset_cache import AssetCache, freshness_lifetime
+
+
+@asynccontextmanager
+async def fixture_server():
+    """Local HTTP server with assets using different caching headers"""
+    hits = {}
+
+    async def asset(request):
+        name = request.match_info["name"]
+        hits[name] = hits.get(name, 0) + 1
+        if name == "app.js":
+            return web.Response(
+                body=b"console.log('app')" * 10,
+                headers={"Cache-Control": "public, max-age=60", "ETag": '"v1"'},
+            )
+        if name == "revalidate.css":
+            if request.headers.get("If-None-Match") == '"c1"':
+                return web.Response(status=304, headers={"ETag": '"c1"'})
+            return web.Response(
+                body=b"body{}" * 10,
+                headers={"Cache-Control": "no-cache", "ETag": '"c1"'},
+            )
+        if name == "private.js":
+            return web.Response(body=b"secret", headers={"Cache-Control": "private"})
+        if name == "public.js":
+            return web.Response(
+                body=b"shared", headers={"Cache-Control": "public, max-age=60"}
+            )
+        return web.Response(body=b"x" * 400, headers={"Cache-Control": "max-age=60"})
+
+    app = web.Application()
+    app.router.add_get("/{name}", asset)
+    server = TestServer(app)
+    await server.start_server()
+    async with aiohttp.ClientSession() as session:
+        try:
+            yield server, session, hits
+        finally:
+            await server.close()
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type="script", method="GET", cookie=None):
+        self.url = url
+        self.resource_type = resource_type
+        self.method = method
+        self.headers = {"accept": "*/*"}
+        self.cookie = cookie
+
+    async def all_headers(self):
+        # Playwright leaves cookies out of request.headers
+        if self.cookie:
+            return {**self.headers, "cookie": self.cookie}
+        return self.headers
+
+
+class FakeAPIResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    """Subset of playwright Route backed by a real HTTP client"""
+
+    def __init__(self, request, session):
+        self.request = request
+        self.session = session
+        self.fulfilled = None
+        self.fell_back = False
+
+    async def fetch(self, headers=None):
+        async with self.session.get(self.request.url, headers=headers) as resp:
+            body = await resp.read()
+            headers = {k.lower(): v for k, v in resp.headers.items()}
+            return FakeAPIResponse(resp.status, headers, body)
+
+    async def fulfill(self, status=None, headers=None, body=None, response=None):
+        self.fulfilled = {"status": status or response.status, "body": body}
+
+    async def fallback(self):
+        self.fell_back = True
+
+
+async def load(cache, session, url, resource_type="script", cookie=None):
+    route = FakeRoute(FakeRequest(url, resource_type, cookie=cookie), session)
+    await cache.handle_route(route, route.request)
+    return route
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime({"cache-control": "max-age=300"}, 0) == 300
+    assert freshness_lifetime({"cache-control": "private, max-age=300"}, 0) is None
+    assert freshness_lifetime({"cache-control": "no-store"}, 0) is None
+    assert freshness_lifetime({"cache-control": "no-cache", "etag": '"a"'}, 0) == 0
+    assert freshness_lifetime({"etag": '"a"'}, 0) == 0
+    assert (
+        freshness_lifetime({"vary": "Cookie", "cache-control": "max-age=9"}, 0) is None
+    )
+    assert (
+        freshness_lifetime({"vary": "Origin", "cache-control": "max-age=9"}, 0) is None
+    )
+    assert freshness_lifetime({"cache-control": "max-age=9"}, 0, True) is None
+    assert freshness_lifetime({"cache-control": "public, max-age=9"}, 0, True) == 9
+    assert freshness_lifetime({"cache-control": "s-maxage=9"}, 0, True) == 9
+    assert freshness_lifetime({}, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_fresh_assets_are_served_from_disk(tmp_path):
+    async with fixture_server() as (server, session, hits):
+        cache = AssetCache(str(tmp_path))
+        url = str(server.make_url("/app.js"))
+
+        first = await load(cache, session, url)
+        second = await load(cache, session, url)
+
+        assert hits["app.js"] == 1
+        assert first.fulfilled["body"] == second.fulfilled["body"]
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+        assert stats["bytes_saved"] == len(second.fulfilled["body"])
+
+        # A new process picks the cache up from disk
+        await cache.close()
+        reloaded = AssetCache(str(tmp_path))
+        await load(reloaded, session, url)
+        assert hits["app.js"] == 1
+        assert reloaded.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_assets_are_revalidated_with_etag(tmp_path):
+    async with fixture_server() as (server, session, hits):
+        cache = AssetCache(str(tmp_path))
+        url = str(server.make_url("/revalidate.css"))
+
+        await load(cache, session, url, "stylesheet")
+        route = await load(cache, session, url, "stylesheet")
+
+        assert hits["revalidate.css"] == 2
+        assert route.fulfilled == {"status": 200, "body": b"body{}" * 10}
+        assert cache.stats()["revalidated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_private_and_non_asset_requests_bypass_cache(tmp_path):
+    async with fixture_server() as (server, session, hits):
+        cache = AssetCache(str(tmp_path))
+        url = str(server.make_url("/private.js"))
+        await load(cache, session, url)
+        await load(cache, session, url)
+        assert hits["private.js"] == 2
+        assert cache.stats()["stored"] == 0
+
+        route = await load(cache, session, str(server.make_url("/")), "document")
+        assert route.fell_back
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_keeps_size_bounded(tmp_path):
+    async with fixture_server() as (server, session, hits):
+        cache = AssetCache(str(tmp_path), max_bytes=1000)
+        urls = [str(server.make_url(f"/img{i}.png")) for i in range(3)]
+
+        await load(cache, session, urls[0], "image")
+        await load(cache, session, urls[1], "image")
+        await load(cache, session, urls[0], "image")  # img0 is now most recent
+        await load(cache, session, urls[2], "image")  # evicts img1
+
+        stats = cache.stats()
+        assert stats["evicted"] == 1
+        assert stats["bytes_stored"] == 800
+        await load(cache, session, urls[0], "image")
+        await load(cache, session, urls[1], "image")
+        assert hits == {"img0.png": 1, "img1.png": 2, "img2.png": 1}
+        assert len(list((tmp_path / "objects").iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_credentialed_responses_are_not_shared(tmp_path):
+    async with fixture_server() as (server, session, hits):
+        cache = AssetCache(str(tmp_path))
+        user_asset = str(server.make_url("/avatar.png"))
+        await load(cache, session, user_asset, "image", cookie="sid=user-1")
+        await load(cache, session, user_asset, "image", cookie="sid=user-2")
+        assert hits["avatar.png"] == 2
+
+        # Marked public, so it is the same for every user
+        public = str(server.make_url("/public.js"))
+        await load(cache, session, public, cookie="sid=user-1")
+        await load(cache, session, public)
+        assert hits["public.js"] == 1
+
+
+@pytest.mark.asyncio
+async def test_index_writes_are_batched(tmp_path, monkeypatch):
+    async with fixture_server() as (server, session, hits):
+        cache = AssetCache(str(tmp_path))
+        writes = []
+        write_index = cache._write_index
+        monkeypatch.setattr(
+            cache,
+            "_write_index",
+            lambda index, version: (
+                writes.append(len(index)),
+                write_index(index, version),
+            ),
+        )
+        for i in range(5):
+            await load(cache, session, str(server.make_url(f"/img{i}.png")), "image")
+        assert writes == []
+
+        await cache.close()
+        assert writes == [5]
+        await cache.flush()
+        assert writes == [5]
+        reloaded = AssetCache(str(tmp_path))
+        await load(reloaded, session, str(server.make_url("/img0.png")), "image")
+        assert hits["img0.png"] == 1
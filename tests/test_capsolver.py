@@ -0,0 +1,167 @@
+import uuid
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_manager import CaptchaSolver, CaptchaType
+from om11.task.captcha_polling import PollScheduler, SolveTimeModel
+from om11.task.captcha_routing import ProviderRouter
+from om11.task.captcha_token_pool import PoolKey
+
+PARAMS = {"url": "https://shop.example/login", "sitekey": "site-key"}
+
+
+class MockCapSolver:
+    """CapSolver createTask/getTaskResult, ready on the second poll"""
+
+    def __init__(self, unsolvable=False):
+        self.unsolvable = unsolvable
+        self.tasks = {}
+        self.polls = 0
+
+    async def create_task(self, request):
+        payload = await request.json()
+        task = payload["task"]
+        # Turnstile answers synchronously like the real API
+        if task["type"] == "AntiTurnstileTaskProxyLess":
+            return web.json_response(
+                {
+                    "errorId": 0,
+                    "taskId": str(uuid.uuid4()),
+                    "status": "ready",
+                    "solution": {"token": "turnstile-token"},
+                }
+            )
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = task
+        return web.json_response({"errorId": 0, "taskId": task_id})
+
+    async def get_task_result(self, request):
+        self.polls += 1
+        payload = await request.json()
+        if self.unsolvable:
+            return web.json_response(
+                {
+                    "errorId": 1,
+                    "errorCode": "ERROR_CAPTCHA_UNSOLVABLE",
+                    "errorDescription": "Captcha not recognized",
+                }
+            )
+        if self.polls < 2:
+            return web.json_response({"errorId": 0, "status": "processing"})
+        return web.json_response(
+            {
+                "errorId": 0,
+                "status": "ready",
+                "solution": {"gRecaptchaResponse": f"token-{payload['taskId']}"},
+            }
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/createTask", self.create_task)
+        app.router.add_post("/getTaskResult", self.get_task_result)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return str(self.server.make_url("")).rstrip("/")
+
+
+def make_solver(base_url):
+    scheduler = PollScheduler(
+        SolveTimeModel(first_poll=0.02, min_interval=0.02, max_interval=0.05)
+    )
+    return CaptchaSolver(
+        page=None,
+        api_urls={"capsolver": base_url},
+        router=ProviderRouter(path=None),
+        scheduler=scheduler,
+    )
+
+
+@pytest.mark.asyncio
+async def test_task_is_polled_until_ready():
+    provider = MockCapSolver()
+    base_url = await provider.start()
+    try:
+        solution = await make_solver(base_url)._solve_capsolver(
+            CaptchaType.HCAPTCHA, "api-key", PARAMS
+        )
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
+
+    ((task_id, task),) = provider.tasks.items()
+    assert solution.token == f"token-{task_id}"
+    assert task == {
+        "type": "HCaptchaTaskProxyLess",
+        "websiteURL": PARAMS["url"],
+        "websiteKey": "site-key",
+    }
+
+
+@pytest.mark.asyncio
+async def test_recaptcha_v3_task_asks_for_a_min_score():
+    provider = MockCapSolver()
+    base_url = await provider.start()
+    try:
+        await make_solver(base_url)._solve_capsolver(
+            CaptchaType.RECAPTCHA_V3, "api-key", {**PARAMS, "action": "login"}
+        )
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
+
+    ((task_id, task),) = provider.tasks.items()
+    assert task == {
+        "type": "ReCaptchaV3TaskProxyLess",
+        "websiteURL": PARAMS["url"],
+        "websiteKey": "site-key",
+        "minScore": 0.5,
+        "pageAction": "login",
+    }
+
+
+@pytest.mark.asyncio
+async def test_turnstile_ready_on_create():
+    provider = MockCapSolver()
+    base_url = await provider.start()
+    try:
+        solution = await make_solver(base_url)._solve_capsolver(
+            CaptchaType.TURNSTILE, "api-key", PARAMS
+        )
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
+
+    assert solution.token == "turnstile-token"
+    assert provider.polls == 0
+
+
+@pytest.mark.asyncio
+async def test_unsolvable_task_raises():
+    provider = MockCapSolver(unsolvable=True)
+    base_url = await provider.start()
+    try:
+        with pytest.raises(RuntimeError, match="Captcha not recognized"):
+            await make_solver(base_url)._solve_capsolver(
+                CaptchaType.RECAPTCHA_V2, "api-key", PARAMS
+            )
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
+
+
+@pytest.mark.asyncio
+async def test_token_pool_presolve():
+    provider = MockCapSolver()
+    base_url = await provider.start()
+    key = PoolKey("capsolver", "turnstile", "site-key", PARAMS["url"])
+    try:
+        solution = await make_solver(base_url)._presolve(key, "api-key")
+    finally:
+        await captcha_http.close()
+        await provider.server.close()
+
+    assert solution.token == "turnstile-token"
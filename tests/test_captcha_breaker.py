@@ -0,0 +1,206 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from om11.task.captcha_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    MIN_CALLS,
+    OPEN,
+    OPEN_SECONDS,
+    SLOW_CALL_SECONDS,
+    CircuitBreaker,
+    CircuitOpenError,
+    ProviderBreakers,
+)
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_keys import ApiKeyStore
+from om11.task.captcha_manager import (
+    CaptchaSolution,
+    CaptchaSolver,
+    CaptchaType,
+    probe_provider,
+)
+from om11.task.captcha_routing import ProviderRouter
+from om11.task.captcha_solve_service import CaptchaSolveService
+
+
+def test_opens_at_the_failure_threshold():
+    breaker = CircuitBreaker("capmonster")
+    for _ in range(MIN_CALLS - 1):
+        breaker.record(False, 1.0, now=0)
+    # Too few calls to judge the provider
+    assert breaker.state == CLOSED
+
+    breaker = CircuitBreaker("capmonster")
+    for success in (True, True, False, True, False, False):
+        breaker.record(success, 1.0, now=0)
+    assert breaker.state == OPEN
+    assert not breaker.available(now=1)
+    assert not breaker.acquire(now=1)
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("capmonster")
+    for _ in range(MIN_CALLS):
+        breaker.record(True, SLOW_CALL_SECONDS + 1, now=0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("capmonster")
+    for _ in range(MIN_CALLS):
+        breaker.record(False, 1.0, now=0)
+
+    later = OPEN_SECONDS + 1
+    trial = breaker.acquire(now=later)
+    assert trial.trial
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire(now=later) is None
+
+    # A failed trial opens the breaker for twice as long
+    breaker.record(False, 1.0, now=later, permit=trial)
+    assert breaker.state == OPEN
+    assert not breaker.available(now=later + OPEN_SECONDS + 1)
+    trial = breaker.acquire(now=later + 2 * OPEN_SECONDS + 1)
+
+    breaker.record(True, 1.0, now=later + 2 * OPEN_SECONDS + 1, permit=trial)
+    assert breaker.state == CLOSED
+    assert breaker.open_seconds == OPEN_SECONDS
+
+
+def test_only_the_trial_holder_decides_the_trial():
+    breaker = CircuitBreaker("capmonster")
+    stale = breaker.acquire(now=0)
+    for _ in range(MIN_CALLS):
+        breaker.record(False, 1.0, now=0)
+
+    later = OPEN_SECONDS + 1
+    probe = breaker.acquire(now=later)
+    # A solve started while closed finishes during the probe
+    breaker.record(True, 1.0, now=later, permit=stale)
+    breaker.release(stale)
+    assert breaker.state == HALF_OPEN
+    assert breaker.trial is probe
+
+    breaker.record(False, 1.0, now=later, permit=probe)
+    assert breaker.state == OPEN
+
+
+def test_routable_skips_open_providers():
+    breakers = ProviderBreakers()
+    for _ in range(MIN_CALLS):
+        breakers.breaker("capmonster").record(False, 1.0)
+
+    assert breakers.routable(["capmonster", "capsolver"]) == ["capsolver"]
+    # With every provider open, trying one beats not solving at all
+    assert breakers.routable(["capmonster"]) == ["capmonster"]
+    assert breakers.stats()["capmonster"]["state"] == OPEN
+
+
+@pytest.mark.asyncio
+async def test_probes_close_recovered_providers():
+    probed = []
+
+    async def probe(provider):
+        probed.append(provider)
+        if provider == "anticaptcha":
+            raise RuntimeError("HTTP 503")
+
+    breakers = ProviderBreakers(probe)
+    for provider in ("capmonster", "anticaptcha"):
+        for _ in range(MIN_CALLS):
+            breakers.breaker(provider).record(False, 1.0, now=0)
+    breakers.breaker("capsolver")
+
+    # Not due yet
+    assert await breakers.probe_due(now=1) == 0
+    assert await breakers.probe_due(now=OPEN_SECONDS + 1) == 2
+
+    assert sorted(probed) == ["anticaptcha", "capmonster"]
+    assert breakers.breaker("capmonster").state == CLOSED
+    assert breakers.breaker("anticaptcha").state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_probe_provider_checks_the_balance_endpoint(monkeypatch):
+    keys = ApiKeyStore(path=None)
+    keys.load({"capmonster": "key"})
+    monkeypatch.setattr("om11.task.captcha_manager.api_key_store", keys)
+    status = 200
+
+    async def get_balance(request):
+        assert (await request.json())["clientKey"] == "key"
+        if status >= 500:
+            return web.Response(status=status)
+        return web.json_response({"errorId": 0, "balance": 1.5})
+
+    app = web.Application()
+    app.router.add_post("/getBalance", get_balance)
+    server = TestServer(app)
+    await server.start_server()
+    urls = {"capmonster": str(server.make_url("")).rstrip("/")}
+    try:
+        await probe_provider("capmonster", urls)
+        status = 503
+        with pytest.raises(RuntimeError):
+            await probe_provider("capmonster", urls)
+    finally:
+        await captcha_http.close()
+        await server.close()
+
+
+class FakePage:
+    url = "https://shop.example/login"
+
+
+@pytest.mark.asyncio
+async def test_open_provider_fails_without_a_call():
+    breakers = ProviderBreakers()
+    solver = CaptchaSolver(
+        FakePage(),
+        router=ProviderRouter(path=None),
+        solve_service=CaptchaSolveService(),
+        keys=ApiKeyStore(path=None),
+        breakers=breakers,
+    )
+    calls = []
+
+    async def call_service(name, captcha_type, api_key, params):
+        calls.append(name)
+        raise RuntimeError("Cannot connect to host")
+
+    solver._call_service = call_service
+    params = {"sitekey": "site-key", "url": FakePage.url}
+
+    for _ in range(MIN_CALLS):
+        with pytest.raises(RuntimeError):
+            await solver._solve_direct("capmonster", CaptchaType.HCAPTCHA, "k", params)
+    assert breakers.breaker("capmonster").state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await solver._solve_direct("capmonster", CaptchaType.HCAPTCHA, "k", params)
+    assert len(calls) == MIN_CALLS
+
+    # Key errors say nothing about the provider
+    solver._call_service = lambda *args: _raise(
+        RuntimeError("ERROR_KEY_DOES_NOT_EXIST")
+    )
+    for _ in range(MIN_CALLS):
+        with pytest.raises(RuntimeError):
+            await solver._solve_direct("capsolver", CaptchaType.HCAPTCHA, "k", params)
+    assert breakers.breaker("capsolver").state == CLOSED
+
+    solver._call_service = lambda *args: _solved()
+    solution = await solver._solve_direct(
+        "capsolver", CaptchaType.HCAPTCHA, "k", params
+    )
+    assert solution.token == "token"
+
+
+async def _raise(error):
+    raise error
+
+
+async def _solved():
+    return CaptchaSolution(token="token")
@@ -0,0 +1,76 @@
+import pytest
+
+from om11.task.captcha_cache import DetectionCache
+from om11.task.captcha_manager import CaptchaSolver, CaptchaType
+
+URL = "https://shop.example/checkout"
+
+
+class FakePage:
+    """Answers the detect script like a page with one hCaptcha widget"""
+
+    def __init__(self, url=URL, fingerprint="hcaptcha|key-1"):
+        self.url = url
+        self.fingerprint = fingerprint
+        self.evaluations = 0
+
+    async def evaluate(self, script, arg=None):
+        self.evaluations += 1
+        known = arg[2]
+        if self.fingerprint in known:
+            return {"fingerprint": self.fingerprint, "cached": True}
+        return {
+            "type": "hcaptcha",
+            "params": {"sitekey": self.fingerprint.split("|")[1], "url": self.url},
+            "candidates": ["hcaptcha"],
+            "fingerprint": self.fingerprint,
+        }
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    cache = DetectionCache(max_entries=2, ttl=10)
+    cache.put("https://a.example/", "fp-a", "hcaptcha", {}, now=0)
+    cache.put("https://b.example/", "fp-b", "turnstile", {}, now=0)
+    assert cache.get("https://a.example/x", "fp-a", now=1)
+    cache.put("https://c.example/", "fp-c", "hcaptcha", {}, now=1)
+
+    # b was the least recently used
+    assert cache.known("https://b.example/", now=1) == []
+    assert cache.known("https://a.example/", now=1) == ["fp-a"]
+    assert cache.get("https://a.example/", "fp-a", now=11) is None
+    assert len(cache) == 1
+
+
+def test_hit_keeps_params_but_follows_the_current_url():
+    cache = DetectionCache()
+    cache.put(URL, "fp", "hcaptcha", {"sitekey": "k", "url": URL})
+    _, params = cache.get("https://shop.example/cart", "fp")
+    assert params == {"sitekey": "k", "url": "https://shop.example/cart"}
+
+
+@pytest.mark.asyncio
+async def test_solvers_share_detections():
+    cache = DetectionCache()
+    page = FakePage()
+
+    first = await CaptchaSolver(page, cache=cache).detect()
+    second = await CaptchaSolver(page, cache=cache).detect()
+
+    assert first == second == (CaptchaType.HCAPTCHA, {"sitekey": "key-1", "url": URL})
+    assert page.evaluations == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+@pytest.mark.asyncio
+async def test_changed_widget_is_detected_again():
+    cache = DetectionCache()
+    page = FakePage()
+    await CaptchaSolver(page, cache=cache).detect()
+
+    page.fingerprint = "hcaptcha|key-2"
+    _, params = await CaptchaSolver(page, cache=cache).detect()
+
+    assert params["sitekey"] == "key-2"
+    assert cache.misses == 2
+    assert len(cache.known(URL)) == 2
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+from playwright.sync_api import Error, sync_playwright
+
+from om11.task.captchas import (
+    DETECT_CAPTCHA_SCRIPT,
+    DETECTION_PRIORITY,
+    FRAME_SCAN_DEPTH,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "captcha")
+
+EXPECTED = {
+    "recaptcha_v2.html": ("recaptcha_v2", {"sitekey": "6LcV2fixture-sitekey"}),
+    "recaptcha_v3.html": (
+        "recaptcha_v3",
+        {"sitekey": "6LcV3fixture-sitekey", "action": "signup"},
+    ),
+    "hcaptcha.html": (
+        "hcaptcha",
+        {"sitekey": "10000000-ffff-ffff-ffff-000000000001"},
+    ),
+    "turnstile.html": (
+        "turnstile",
+        {"sitekey": "0x4AAAAAAAfixture", "action": "subscribe"},
+    ),
+    "funcaptcha.html": (
+        "funcaptcha",
+        {"public_key": "69A21A01-CC7B-B9C6-0F9A-E7FA06677FFC"},
+    ),
+    "geetest_v3.html": ("geetest_v3", {"gt": "022397c99c9f646f6477822485f30404"}),
+    "geetest_v4.html": (
+        "geetest_v4",
+        {"captcha_id": "e392e1d7fd421dc63325744d5a2b9c73"},
+    ),
+    "iframe_recaptcha.html": ("recaptcha_v2", {"sitekey": "6LcFrame-sitekey"}),
+    "nested_hcaptcha.html": ("hcaptcha", {"sitekey": "nested-hcaptcha-sitekey"}),
+    # The visible hCaptcha beats the hidden reCAPTCHA v2 and widgetless v3
+    "multiple.html": ("hcaptcha", {"sitekey": "visible-hcaptcha-sitekey"}),
+}
+
+
+@pytest.fixture(scope="module")
+def page():
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except Error as e:
+            pytest.skip(f"Chromium is not available: {e}")
+        page = browser.new_page()
+        # Keep the widget scripts and iframes of the fixtures offline
+        page.route("http*://**", lambda route: route.abort())
+        yield page
+        browser.close()
+
+
+def detect(page, filename):
+    with open(os.path.join(FIXTURES_DIR, filename)) as f:
+        page.set_content(f.read())
+    return page.evaluate(
+        DETECT_CAPTCHA_SCRIPT, [list(DETECTION_PRIORITY), FRAME_SCAN_DEPTH]
+    )
+
+
+@pytest.mark.parametrize("filename", sorted(EXPECTED))
+def test_detects_type_and_params_in_one_evaluation(page, filename):
+    expected_type, expected_params = EXPECTED[filename]
+    detected = detect(page, filename)
+    assert detected["type"] == expected_type
+    for key, value in expected_params.items():
+        assert detected["params"][key] == value
+    assert "url" in detected["params"]
+
+
+def test_reports_every_candidate_by_priority(page):
+    detected = detect(page, "multiple.html")
+    assert detected["candidates"] == ["hcaptcha", "recaptcha_v2", "recaptcha_v3"]
+
+
+def test_page_without_captcha(page):
+    assert detect(page, "none.html") is None
+
+
+def test_known_fingerprint_skips_the_scan(page):
+    first = detect(page, "hcaptcha.html")
+    cached = page.evaluate(
+        DETECT_CAPTCHA_SCRIPT,
+        [list(DETECTION_PRIORITY), FRAME_SCAN_DEPTH, [first["fingerprint"]]],
+    )
+    assert cached == {"fingerprint": first["fingerprint"], "cached": True}
+
+    # A different widget on the same page changes the fingerprint
+    page.evaluate("() => document.querySelector('.h-captcha').dataset.sitekey = 'x'")
+    rescanned = page.evaluate(
+        DETECT_CAPTCHA_SCRIPT,
+        [list(DETECTION_PRIORITY), FRAME_SCAN_DEPTH, [first["fingerprint"]]],
+    )
+    assert rescanned["params"]["sitekey"] == "x"
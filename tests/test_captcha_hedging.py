@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from om11.task.captcha_hedging import (
+    DEFAULT_HEDGE_DELAY,
+    MIN_HEDGE_DELAY,
+    HedgeBudget,
+    hedge_delay,
+    hedged_race,
+)
+from om11.task.captcha_polling import SolveTimeModel
+
+
+class FakeSolve:
+    """Resolves to `token` after `seconds`, records if it was cancelled"""
+
+    def __init__(self, seconds, token="token", error=None):
+        self.seconds = seconds
+        self.token = token
+        self.error = error
+        self.started = False
+        self.cancelled = False
+
+    async def __call__(self):
+        self.started = True
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.token
+
+
+def test_hedge_delay_follows_solve_time_percentile():
+    model = SolveTimeModel()
+    assert hedge_delay(model, "capmonster", "hcaptcha") == DEFAULT_HEDGE_DELAY
+
+    for seconds in range(1, 11):
+        model.observe("capmonster", "hcaptcha", float(seconds))
+    assert hedge_delay(model, "capmonster", "hcaptcha") == 10.0
+
+    fast = SolveTimeModel()
+    for _ in range(10):
+        fast.observe("capmonster", "turnstile", 0.5)
+    assert hedge_delay(fast, "capmonster", "turnstile") == MIN_HEDGE_DELAY
+
+
+def test_budget_caps_hedge_rate():
+    budget = HedgeBudget(rate=0.1, burst=2)
+    hedges = 0
+    for _ in range(100):
+        budget.on_solve()
+        hedges += budget.try_spend()
+    # The burst plus one hedge per ten solves
+    assert 10 <= hedges <= 12
+
+
+@pytest.mark.asyncio
+async def test_fast_main_never_starts_fallback():
+    main, fallback = FakeSolve(0.01, "main-token"), FakeSolve(0.01, "fb-token")
+    result = await hedged_race(main, fallback, delay=0.2, budget=HedgeBudget())
+    assert result == ("main-token", "main")
+    assert not fallback.started
+
+
+@pytest.mark.asyncio
+async def test_slow_main_is_hedged_and_loser_cancelled():
+    main, fallback = FakeSolve(1.0, "main-token"), FakeSolve(0.02, "fb-token")
+    result = await hedged_race(main, fallback, delay=0.05, budget=HedgeBudget())
+    await asyncio.sleep(0)
+    assert result == ("fb-token", "fallback")
+    assert main.cancelled
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_waits_for_main():
+    budget = HedgeBudget(rate=0, burst=0)
+    main, fallback = FakeSolve(0.1, "main-token"), FakeSolve(0.01, "fb-token")
+    result = await hedged_race(main, fallback, delay=0.02, budget=budget)
+    assert result == ("main-token", "main")
+    assert not fallback.started
+
+
+@pytest.mark.asyncio
+async def test_main_failure_falls_back_without_budget():
+    budget = HedgeBudget(rate=0, burst=0)
+    main = FakeSolve(0.01, error=RuntimeError("ERROR_ZERO_BALANCE"))
+    fallback = FakeSolve(0.01, "fb-token")
+    result = await hedged_race(main, fallback, delay=1.0, budget=budget)
+    assert result == ("fb-token", "fallback")
+
+
+@pytest.mark.asyncio
+async def test_invalid_result_does_not_win():
+    main, fallback = FakeSolve(0.01, ""), FakeSolve(0.05, "fb-token")
+    result = await hedged_race(main, fallback, delay=1.0, budget=HedgeBudget())
+    assert result == ("fb-token", "fallback")
+
+
+@pytest.mark.asyncio
+async def test_both_failing_raises_last_error():
+    main = FakeSolve(0.01, error=RuntimeError("main down"))
+    fallback = FakeSolve(0.01, error=RuntimeError("fallback down"))
+    with pytest.raises(RuntimeError, match="fallback down"):
+        await hedged_race(main, fallback, delay=1.0, budget=HedgeBudget())
@@ -0,0 +1,52 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from om11.task.captcha_http import CaptchaHTTPPool, captcha_http
+from om11.task.captcha_manager import CaptchaSolver, CaptchaType
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_one_session_until_closed():
+    pool = CaptchaHTTPPool(limit_per_host=4)
+    session = pool.session()
+    assert pool.session() is session
+    assert session.connector.limit_per_host == 4
+
+    await pool.close()
+    assert session.closed
+    assert pool.session() is not session
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_solvers_share_the_pool_and_target_overridden_urls():
+    seen = []
+
+    async def create_task(request):
+        seen.append(request.transport)
+        return web.json_response(
+            {"errorId": 1, "errorDescription": "ERROR_KEY_DOES_NOT_EXIST"}
+        )
+
+    app = web.Application()
+    app.router.add_post("/createTask", create_task)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        api_urls = {"capmonster": str(server.make_url("")).rstrip("/")}
+        for _ in range(3):
+            solver = CaptchaSolver(page=None, api_urls=api_urls)
+            assert solver.session is captcha_http.session()
+            with pytest.raises(RuntimeError, match="ERROR_KEY_DOES_NOT_EXIST"):
+                await solver._solve_capmonster(
+                    CaptchaType.RECAPTCHA_V2,
+                    "bad-key",
+                    {"url": "https://a.com", "sitekey": "k"},
+                )
+            await solver.close()
+        # One keep-alive connection served every solve
+        assert len(set(seen)) == 1
+    finally:
+        await captcha_http.close()
+        await server.close()
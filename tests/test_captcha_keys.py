@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from om11.task.captcha_keys import (
+    AUTH_COOLDOWN,
+    BALANCE_COOLDOWN,
+    RATE_WINDOW,
+    ApiKeyStore,
+)
+
+
+def write_keys(path, keys, mtime=None):
+    with open(path, "w") as f:
+        json.dump(keys, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_keys_rotate_round_robin():
+    store = ApiKeyStore()
+    store.load({"capmonster": "single", "capsolver": ["a", "b", {"key": "c"}]})
+
+    assert [store.next_key("capsolver", now=0) for _ in range(4)] == [
+        "a",
+        "b",
+        "c",
+        "a",
+    ]
+    assert store.pick(now=0) == {"capmonster": "single", "capsolver": "b"}
+    assert store.next_key("anticaptcha") is None
+
+
+def test_rate_limited_keys_are_skipped():
+    store = ApiKeyStore()
+    store.load({"capsolver": [{"key": "a", "max_per_minute": 2}, "b"]})
+    store.record_use("capsolver", "a", now=0)
+    store.record_use("capsolver", "a", now=1)
+
+    assert [store.next_key("capsolver", now=2) for _ in range(3)] == ["b"] * 3
+    # Uses older than the window no longer count
+    assert store.next_key("capsolver", now=RATE_WINDOW + 0.5) == "a"
+
+
+def test_auth_and_balance_errors_rest_the_key():
+    store = ApiKeyStore()
+    store.load({"capmonster": ["a", "b"], "capsolver": ["c"]})
+
+    assert not store.report_failure("capmonster", "a", "ERROR_NO_SLOT_AVAILABLE", 0)
+    assert store.report_failure(
+        "capmonster", "a", RuntimeError("CapMonster error: ERROR_ZERO_BALANCE"), 0
+    )
+    assert store.report_failure("capsolver", "c", "ERROR_KEY_DOES_NOT_EXIST", 0)
+
+    assert [store.next_key("capmonster", now=1) for _ in range(2)] == ["b", "b"]
+    assert store.pick(now=1) == {"capmonster": "b"}
+    assert store.next_key("capmonster", now=BALANCE_COOLDOWN) in ("a", "b")
+    assert store.next_key("capsolver", now=BALANCE_COOLDOWN) is None
+    assert store.next_key("capsolver", now=AUTH_COOLDOWN) == "c"
+
+
+@pytest.mark.asyncio
+async def test_file_is_reloaded_only_when_it_changes(tmp_path):
+    path = str(tmp_path / "api_keys.json")
+    write_keys(path, {"capmonster": ["a", "b"]}, mtime=1000)
+    store = ApiKeyStore(path, check_interval=0)
+    await store.refresh()
+    store.report_failure("capmonster", "a", "ERROR_ZERO_BALANCE")
+    assert store.pick() == {"capmonster": "b"}
+
+    # Same mtime, the file is not read again
+    write_keys(path, {"capmonster": ["x"]}, mtime=1000)
+    await store.refresh()
+    assert store.pick() == {"capmonster": "b"}
+
+    # Keys still listed keep their cooldown across the reload
+    write_keys(path, {"capmonster": ["a", "c"], "capsolver": "d"}, mtime=2000)
+    await store.refresh()
+    assert store.pick() == {"capmonster": "c", "capsolver": "d"}
+
+    # A broken or missing file keeps the current keys
+    with open(path, "w") as f:
+        f.write("{")
+    os.utime(path, (3000, 3000))
+    await store.refresh()
+    os.remove(path)
+    await store.refresh()
+    assert store.pick() == {"capmonster": "c", "capsolver": "d"}
+
+
+@pytest.mark.asyncio
+async def test_file_checks_are_throttled(tmp_path):
+    path = str(tmp_path / "api_keys.json")
+    write_keys(path, {"capmonster": "a"}, mtime=1000)
+    store = ApiKeyStore(path, check_interval=60)
+    await store.refresh()
+    write_keys(path, {"capmonster": "b"}, mtime=2000)
+
+    await store.refresh()
+    assert store.pick() == {"capmonster": "a"}
+    await store.refresh(force=True)
+    assert store.pick() == {"capmonster": "b"}
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+
+from om11.metrics import metrics
+from om11.task.captcha_polling import PollScheduler, SolveTimeModel
+
+
+def fast_model():
+    return SolveTimeModel(first_poll=0.05, min_interval=0.01, max_interval=0.2)
+
+
+class FakeProvider:
+    """Tasks become ready `solve_time` seconds after creation"""
+
+    def __init__(self, solve_time):
+        self.solve_time = solve_time
+        self.created = {}
+        self.polls = []
+
+    def create(self, task_id):
+        self.created[task_id] = time.monotonic()
+
+    async def fetch(self, task_id):
+        self.polls.append((task_id, time.monotonic()))
+        if time.monotonic() - self.created[task_id] >= self.solve_time:
+            return f"token-{task_id}"
+        return None
+
+
+def test_model_aims_polls_at_learned_percentiles():
+    model = SolveTimeModel(first_poll=2.0, min_interval=0.5, max_interval=5.0)
+    assert model.next_poll_delay("capmonster", "hcaptcha", 0) == 2.0
+    assert model.next_poll_delay("capmonster", "hcaptcha", 4) == 2.0
+
+    for seconds in (3.0, 3.2, 3.4, 3.6, 8.0, 9.0, 10.0, 12.0):
+        model.observe("capmonster", "hcaptcha", seconds)
+    # First poll at p25 of the observed solve times
+    assert model.next_poll_delay("capmonster", "hcaptcha", 0) == 3.4
+    # Then at the next percentile still ahead of the task's age
+    assert model.next_poll_delay("capmonster", "hcaptcha", 3.5) == pytest.approx(4.5)
+    assert model.percentile("capmonster", "hcaptcha", 0.5) == 8.0
+    # Other captcha types keep their own history
+    assert model.percentile("capmonster", "turnstile", 0.5) is None
+
+
+@pytest.mark.asyncio
+async def test_short_first_poll_returns_fast_solves_quickly():
+    scheduler = PollScheduler(fast_model())
+    provider = FakeProvider(solve_time=0.03)
+    provider.create(1)
+
+    started = time.monotonic()
+    token = await scheduler.wait("mock", "recaptcha_v2", 1, provider.fetch)
+
+    assert token == "token-1"
+    assert time.monotonic() - started < 0.5
+    assert scheduler.model.samples("mock", "recaptcha_v2")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_solves_share_poll_wakeups():
+    scheduler = PollScheduler(fast_model())
+    provider = FakeProvider(solve_time=0.1)
+    for task_id in range(20):
+        provider.create(task_id)
+
+    batches = metrics.counter("captcha.poll_batches", {"provider": "mock-batch"})
+    tokens = await asyncio.gather(
+        *(
+            scheduler.wait("mock-batch", "hcaptcha", task_id, provider.fetch)
+            for task_id in range(20)
+        )
+    )
+
+    assert tokens == [f"token-{i}" for i in range(20)]
+    # Polls happen in a few coalesced rounds, not on 20 independent timers
+    rounds = (
+        metrics.counter("captcha.poll_batches", {"provider": "mock-batch"}) - batches
+    )
+    assert rounds <= 5
+    assert len(provider.polls) <= 20 * rounds
+    assert scheduler.pending("mock-batch") == 0
+
+
+@pytest.mark.asyncio
+async def test_same_task_id_is_polled_once_for_all_waiters():
+    scheduler = PollScheduler(fast_model())
+    provider = FakeProvider(solve_time=0.05)
+    provider.create("a")
+
+    first, second = await asyncio.gather(
+        scheduler.wait("mock", "hcaptcha", "a", provider.fetch),
+        scheduler.wait("mock", "hcaptcha", "a", provider.fetch),
+    )
+    assert first == second == "token-a"
+    polls = [task_id for task_id, _ in provider.polls]
+    assert len(polls) == len(set(at for _, at in provider.polls))
+
+
+@pytest.mark.asyncio
+async def test_failures_and_timeouts_are_raised():
+    scheduler = PollScheduler(fast_model())
+
+    async def failing(task_id):
+        raise RuntimeError("task failed")
+
+    with pytest.raises(RuntimeError, match="task failed"):
+        await scheduler.wait("mock", "hcaptcha", 1, failing)
+
+    provider = FakeProvider(solve_time=10)
+    provider.create(2)
+    with pytest.raises(TimeoutError):
+        await scheduler.wait("mock", "hcaptcha", 2, provider.fetch, timeout=0.1)
+    assert scheduler.pending("mock") == 0
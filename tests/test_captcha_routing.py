@@ -0,0 +1,181 @@
+import random
+
+import pytest
+
+from om11.task.captcha_breaker import ProviderBreakers
+from om11.task.captcha_manager import (
+    CaptchaSolution,
+    CaptchaSolver,
+    CaptchaType,
+)
+from om11.task.captcha_routing import ProviderRouter
+
+PRIORS = {"hcaptcha": {"main": "capmonster", "fallback": "capsolver"}}
+PROVIDERS = ["capmonster", "anticaptcha", "capsolver"]
+
+
+def make_router(tmp_path, **kwargs):
+    kwargs.setdefault("explore_rate", 0)
+    return ProviderRouter(priors=PRIORS, path=str(tmp_path / "routing.json"), **kwargs)
+
+
+def test_static_table_is_the_prior(tmp_path):
+    router = make_router(tmp_path)
+    assert router.choose("hcaptcha", PROVIDERS) == ("capmonster", "capsolver")
+
+
+def test_degraded_provider_loses_traffic(tmp_path):
+    router = make_router(tmp_path)
+    for _ in range(10):
+        router.record("capsolver", "hcaptcha", True, 10.0)
+        router.record("capmonster", "hcaptcha", True, 9.0)
+    assert router.choose("hcaptcha", PROVIDERS)[0] == "capmonster"
+
+    # The main provider slows down and starts failing
+    for _ in range(8):
+        router.record("capmonster", "hcaptcha", True, 45.0)
+        router.record("capmonster", "hcaptcha", False, 60.0)
+    assert router.choose("hcaptcha", PROVIDERS) == ("capsolver", "capmonster")
+
+
+def test_old_outcomes_expire(tmp_path):
+    router = make_router(tmp_path)
+    for _ in range(20):
+        router.record("capmonster", "hcaptcha", False, 60.0, now=1000.0)
+    assert router.rank("hcaptcha", PROVIDERS, now=1001.0)[0] != "capmonster"
+    assert router.rank("hcaptcha", PROVIDERS, now=1000.0 + 7200)[0] == "capmonster"
+
+
+def test_exploration_routes_a_small_share_elsewhere(tmp_path):
+    router = make_router(tmp_path, explore_rate=0.1, rng=random.Random(7))
+    mains = [router.choose("hcaptcha", PROVIDERS)[0] for _ in range(1000)]
+    explored = sum(main != "capmonster" for main in mains)
+    assert 50 < explored < 150
+
+
+def test_stats_survive_a_restart(tmp_path):
+    router = make_router(tmp_path)
+    for _ in range(10):
+        router.record("capmonster", "hcaptcha", False, 30.0)
+    router.save()
+
+    restarted = make_router(tmp_path)
+    restarted.load()
+    assert restarted.stats("capmonster", "hcaptcha").attempts == 10
+    assert restarted.choose("hcaptcha", PROVIDERS)[0] != "capmonster"
+
+
+@pytest.mark.asyncio
+async def test_solver_records_outcomes(tmp_path):
+    router = make_router(tmp_path)
+    solver = CaptchaSolver(page=None, router=router)
+
+    async def call_service(service, captcha_type, api_key, params):
+        if service == "anticaptcha":
+            raise RuntimeError("ERROR_ZERO_BALANCE")
+        return CaptchaSolution(token="token")
+
+    solver._call_service = call_service
+    await solver._solve_direct("capmonster", CaptchaType.HCAPTCHA, "key", {})
+    with pytest.raises(RuntimeError):
+        await solver._solve_direct("anticaptcha", CaptchaType.HCAPTCHA, "key", {})
+
+    assert router.stats("capmonster", "hcaptcha").successes == 1
+    assert router.stats("anticaptcha", "hcaptcha").attempts == 1
+    assert router.stats("anticaptcha", "hcaptcha").successes == 0
+
+
+@pytest.mark.asyncio
+async def test_persist_writes_a_copy_taken_on_the_loop(tmp_path, monkeypatch):
+    router = make_router(tmp_path)
+    router.record("capmonster", "hcaptcha", True, 10.0)
+    write = router._write
+
+    def slow_write(outcomes):
+        # record() appending meanwhile must not reach the saved copy
+        router.stats("capmonster", "hcaptcha").record(True, 1.0, 0)
+        write(outcomes)
+
+    monkeypatch.setattr(router, "_write", slow_write)
+    await router.persist(force=True)
+
+    restarted = make_router(tmp_path)
+    restarted.load()
+    assert restarted.stats("capmonster", "hcaptcha").attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_save_does_not_fail_the_solve(tmp_path, monkeypatch):
+    router = make_router(tmp_path)
+    solver = CaptchaSolver(page=None, router=router)
+
+    def broken_write(outcomes):
+        raise OSError("disk full")
+
+    async def call_service(service, captcha_type, api_key, params):
+        return CaptchaSolution(token="token")
+
+    monkeypatch.setattr(router, "_write", broken_write)
+    solver._call_service = call_service
+    solution = await solver._solve_direct("capmonster", CaptchaType.HCAPTCHA, "k", {})
+    assert solution.token == "token"
+    await router._persist_task
+    # Kept dirty so the next persist tries again
+    assert router._dirty
+
+
+@pytest.mark.asyncio
+async def test_providers_without_the_task_type_are_not_candidates(tmp_path):
+    page = FakePage()
+    # Anti-Captcha would rank first if it could take the task
+    router = make_router(tmp_path, costs={"anticaptcha": 0.0, "capsolver": 50.0})
+    solver = CaptchaSolver(page, router=router)
+    calls = []
+
+    async def detect():
+        return CaptchaType.TURNSTILE, {"sitekey": "key", "url": page.url}
+
+    async def call_service(service, captcha_type, api_key, params):
+        calls.append(service)
+        return CaptchaSolution(token="token")
+
+    solver.detect = detect
+    solver._call_service = call_service
+    assert not solver.supports("anticaptcha", CaptchaType.TURNSTILE)
+
+    # Anti-Captcha has no Turnstile task, capsolver is the only candidate
+    for _ in range(5):
+        assert await solver.solve(api_keys={"anticaptcha": "a", "capsolver": "c"})
+    assert calls == ["capsolver"] * 5
+
+
+@pytest.mark.asyncio
+async def test_failed_main_gets_one_fallback_with_its_own_key(tmp_path):
+    page = FakePage()
+    router = make_router(tmp_path, costs={"anticaptcha": 50.0})
+    solver = CaptchaSolver(page, router=router, breakers=ProviderBreakers())
+    calls = []
+
+    async def detect():
+        return CaptchaType.HCAPTCHA, {"sitekey": "key", "url": page.url}
+
+    async def call_service(service, captcha_type, api_key, params):
+        calls.append((service, api_key))
+        raise RuntimeError("Cannot connect to host")
+
+    solver.detect = detect
+    solver._call_service = call_service
+    keys = {"capmonster": "CM", "capsolver": "CS", "anticaptcha": "AC"}
+    with pytest.raises(RuntimeError):
+        await solver.solve(api_keys=keys)
+
+    # No chain through the static table, no key sent to another provider
+    assert calls == [("capmonster", "CM"), ("capsolver", "CS")]
+    assert router.stats("anticaptcha", "hcaptcha").attempts == 0
+
+
+class FakePage:
+    url = "https://shop.example/login"
+
+    async def evaluate(self, script, arg=None):
+        return None
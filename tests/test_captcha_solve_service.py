@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+
+from om11.task.captcha_http import captcha_http
+from om11.task.captcha_manager import CaptchaSolution, CaptchaSolver, CaptchaType
+from om11.task.captcha_routing import ProviderRouter
+from om11.task.captcha_solve_service import CaptchaSolveService, ProviderLimit
+
+
+class FakeProvider:
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.starts = []
+
+    async def __call__(self):
+        self.calls += 1
+        number = self.calls
+        self.starts.append(time.monotonic())
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.seconds)
+        finally:
+            self.running -= 1
+        return f"token-{number}"
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_limited_per_provider():
+    service = CaptchaSolveService({"capsolver": ProviderLimit(concurrency=3)})
+    limited, other = FakeProvider(), FakeProvider()
+
+    await asyncio.gather(
+        *(service.submit("capsolver", limited) for _ in range(10)),
+        *(service.submit("capmonster", other) for _ in range(10)),
+    )
+
+    assert limited.max_running == 3
+    assert other.max_running == 10
+    assert service.stats()["capsolver"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_presolves_leave_slots_to_live_solves():
+    service = CaptchaSolveService(
+        {"capsolver": ProviderLimit(concurrency=4, presolve_share=0.5)}
+    )
+    pool, live = FakeProvider(seconds=0.1), FakeProvider(seconds=0)
+
+    refills = [
+        asyncio.create_task(service.submit("capsolver", pool, background=True))
+        for _ in range(10)
+    ]
+    await asyncio.sleep(0.01)
+    started = time.monotonic()
+    await asyncio.gather(*(service.submit("capsolver", live) for _ in range(2)))
+
+    # The live solves did not queue behind the refills
+    assert time.monotonic() - started < 0.05
+    assert pool.max_running == 2
+    assert service.stats()["capsolver"]["presolving"] == 2
+    await asyncio.gather(*refills)
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_spaces_task_creation(monkeypatch):
+    monkeypatch.setattr("om11.task.captcha_solve_service.RATE_WINDOW", 0.2)
+    service = CaptchaSolveService({"capsolver": ProviderLimit(per_minute=2)})
+    provider = FakeProvider(seconds=0)
+
+    await asyncio.gather(*(service.submit("capsolver", provider) for _ in range(5)))
+
+    starts = provider.starts
+    assert starts[2] - starts[0] >= 0.19
+    assert starts[4] - starts[2] >= 0.19
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_solve():
+    service = CaptchaSolveService()
+    provider = FakeProvider()
+
+    results = await asyncio.gather(
+        service.submit("capsolver", provider, dedup_key="a"),
+        service.submit("capsolver", provider, dedup_key="a"),
+        service.submit("capsolver", provider, dedup_key="b"),
+    )
+
+    assert results == ["token-1", "token-1", "token-2"]
+    # Finished solves are not reused, the token is spent
+    assert await service.submit("capsolver", provider, dedup_key="a") == "token-3"
+
+
+@pytest.mark.asyncio
+async def test_shared_solve_survives_one_caller_cancelling():
+    service = CaptchaSolveService()
+    provider = FakeProvider(seconds=0.1)
+
+    first = asyncio.create_task(service.submit("capsolver", provider, "a"))
+    second = asyncio.create_task(service.submit("capsolver", provider, "a"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == "token-1"
+    assert provider.calls == 1
+
+    # Without waiters the solve is cancelled
+    lone = asyncio.create_task(service.submit("capsolver", provider, "b"))
+    await asyncio.sleep(0.01)
+    lone.cancel()
+    await asyncio.sleep(0.15)
+    assert provider.running == 0
+
+
+class FakePage:
+    url = "https://shop.example/login"
+
+
+@pytest.mark.asyncio
+async def test_solver_shares_solves_of_one_page_only():
+    service = CaptchaSolveService()
+    calls = []
+
+    def solver_for(page):
+        solver = CaptchaSolver(
+            page, router=ProviderRouter(path=None), solve_service=service
+        )
+
+        async def call_service(name, captcha_type, api_key, params):
+            calls.append(page)
+            number = len(calls)
+            await asyncio.sleep(0.05)
+            return CaptchaSolution(token=f"token-{number}")
+
+        solver._call_service = call_service
+        return solver
+
+    params = {"sitekey": "site-key", "url": FakePage.url}
+    page, other_page = FakePage(), FakePage()
+    try:
+        solutions = await asyncio.gather(
+            solver_for(page)._solve_direct(
+                "capsolver", CaptchaType.HCAPTCHA, "k", params
+            ),
+            solver_for(page)._solve_direct(
+                "capsolver", CaptchaType.HCAPTCHA, "k", params
+            ),
+            solver_for(other_page)._solve_direct(
+                "capsolver", CaptchaType.HCAPTCHA, "k", params
+            ),
+        )
+    finally:
+        await captcha_http.close()
+
+    assert len(calls) == 2
+    assert solutions[0] is solutions[1]
+    assert solutions[2].token != solutions[0].token
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+
+from om11.task.captcha_manager import CaptchaSolution, CaptchaSolver
+from om11.task.captcha_token_pool import MIN_REMAINING, PoolKey, TokenPool
+
+KEY = PoolKey("capmonster", "recaptcha_v2", "site-key", "https://shop.example/login")
+PARAMS = {"sitekey": "site-key", "url": "https://shop.example/checkout"}
+
+
+class FakePresolver:
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+        self.calls = 0
+
+    async def __call__(self, key, api_key):
+        self.calls += 1
+        number = self.calls
+        await asyncio.sleep(self.seconds)
+        return CaptchaSolution(token=f"token-{number}")
+
+
+def busy_pool(presolver, takes=20, **kwargs):
+    """A pool whose key was taken `takes` times in the last minute"""
+    pool = TokenPool(presolver)
+    pool.configure(KEY, "api-key", **kwargs)
+    now = time.monotonic()
+    for i in range(takes):
+        pool.take("recaptcha_v2", PARAMS, now=now - 60 + i * 60 / takes)
+    return pool
+
+
+def test_keys_match_sitekey_and_host():
+    assert KEY.matches("recaptcha_v2", PARAMS)
+    assert not KEY.matches("hcaptcha", PARAMS)
+    assert not KEY.matches("recaptcha_v2", {**PARAMS, "sitekey": "other"})
+    assert not KEY.matches("recaptcha_v2", {**PARAMS, "url": "https://evil.example/"})
+
+
+def test_recaptcha_v3_tokens_need_the_same_action():
+    v3 = PoolKey("capsolver", "recaptcha_v3", PARAMS["sitekey"], PARAMS["url"])
+    assert v3.matches("recaptcha_v3", PARAMS)
+    assert not v3.matches("recaptcha_v3", {**PARAMS, "action": "login"})
+
+    login = PoolKey(
+        "capsolver", "recaptcha_v3", PARAMS["sitekey"], PARAMS["url"], "login"
+    )
+    assert login.matches("recaptcha_v3", {**PARAMS, "action": "login"})
+    assert not login.matches("recaptcha_v3", {**PARAMS, "action": "checkout"})
+
+
+def test_target_follows_demand():
+    idle = TokenPool(FakePresolver())
+    idle.configure(KEY, "api-key")
+    # One take in five minutes would only waste pre-solved tokens
+    idle.take("recaptcha_v2", PARAMS)
+    assert idle.target_size(KEY) == 0
+
+    # 20 takes per 300s window over a 20s default solve, with headroom
+    assert busy_pool(FakePresolver()).target_size(KEY) == 2
+    assert busy_pool(FakePresolver(), takes=300).target_size(KEY) == 10
+    assert busy_pool(FakePresolver(), takes=300, max_tokens=4).target_size(KEY) == 4
+
+
+def test_min_tokens_keeps_a_warm_pool():
+    pool = TokenPool(FakePresolver())
+    pool.configure(KEY, "api-key", min_tokens=1)
+    assert pool.target_size(KEY) == 1
+
+
+@pytest.mark.asyncio
+async def test_refill_then_take_ready_tokens():
+    presolver = FakePresolver()
+    pool = busy_pool(presolver)
+
+    assert await pool.refill() == 2
+    # Solves already in flight are not started twice
+    assert await pool.refill() == 0
+    await asyncio.sleep(0.01)
+
+    assert pool.take("recaptcha_v2", PARAMS).token == "token-1"
+    assert pool.take("recaptcha_v2", PARAMS).token == "token-2"
+    assert pool.take("recaptcha_v2", PARAMS) is None
+    assert pool.stats()[0]["served"] == 2
+
+
+@pytest.mark.asyncio
+async def test_tokens_near_expiry_are_not_served():
+    pool = busy_pool(FakePresolver())
+    await pool.refill()
+    await asyncio.sleep(0.01)
+
+    later = time.monotonic() + KEY.lifetime - MIN_REMAINING
+    assert pool.take("recaptcha_v2", PARAMS, now=later) is None
+    assert pool.stats()[0]["expired"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_presolve_backs_off():
+    async def failing(key, api_key):
+        raise RuntimeError("ERROR_ZERO_BALANCE")
+
+    pool = busy_pool(failing)
+    assert await pool.refill() == 2
+    await asyncio.sleep(0.01)
+    assert await pool.refill() == 0
+    assert pool.stats()[0]["failed"] == 2
+
+
+class FakePage:
+    url = "https://shop.example/checkout"
+
+    def __init__(self):
+        self.submitted = []
+
+    async def evaluate(self, script, arg=None):
+        if isinstance(arg, list):
+            return {
+                "type": "recaptcha_v2",
+                "params": dict(PARAMS),
+                "candidates": ["recaptcha_v2"],
+                "fingerprint": "fp",
+            }
+        self.submitted.append(arg)
+
+
+@pytest.mark.asyncio
+async def test_solve_uses_a_pooled_token_without_providers():
+    pool = busy_pool(FakePresolver())
+    await pool.refill()
+    await asyncio.sleep(0.01)
+    page = FakePage()
+
+    solver = CaptchaSolver(page, pool=pool)
+    assert await solver.solve(api_keys={})
+    assert page.submitted == [{"token": "token-1", "additional_data": None}]
@@ -0,0 +1,229 @@
+import asyncio
+import gc
+
+import pytest
+from playwright.sync_api import Error, sync_playwright
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.captcha_watcher import CaptchaWatcher
+from om11.task.captchas import CAPTCHA_OBSERVER_BINDING, CAPTCHA_OBSERVER_SCRIPT
+from om11.task.tasks import Tasks
+
+
+class FakeSolver:
+    def __init__(self, seconds=0.05, result=True):
+        self.seconds = seconds
+        self.result = result
+        self.pages = []
+
+    async def __call__(self, page):
+        self.pages.append(page)
+        await asyncio.sleep(self.seconds)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def seen(page, marker="DIV|h-captcha|key|"):
+    return {"page": page}, {"url": "https://shop.example/", "marker": marker}
+
+
+@pytest.mark.asyncio
+async def test_one_solve_per_widget():
+    solver = FakeSolver()
+    watcher = CaptchaWatcher(solver)
+    page = FakePage()
+
+    await watcher.on_seen(*seen(page))
+    await watcher.on_seen(*seen(page))
+    await watcher.on_seen(*seen(page, marker="other"))
+
+    assert await watcher.take(page) is True
+    assert solver.pages == [page]
+    # Each result is taken once
+    assert await watcher.take(page) is None
+
+
+@pytest.mark.asyncio
+async def test_new_widget_replaces_an_untaken_result():
+    solver = FakeSolver(seconds=0)
+    watcher = CaptchaWatcher(solver)
+    page = FakePage()
+
+    await watcher.on_seen(*seen(page))
+    await asyncio.sleep(0.01)
+    await watcher.on_seen(*seen(page, marker="re-rendered"))
+
+    assert await watcher.take(page) is True
+    assert len(solver.pages) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_early_solve_is_left_to_the_solve_step():
+    watcher = CaptchaWatcher(FakeSolver(result=RuntimeError("ERROR_ZERO_BALANCE")))
+    page = FakePage()
+    await watcher.on_seen(*seen(page))
+    assert await watcher.take(page) is None
+
+    watcher = CaptchaWatcher(FakeSolver(result=False))
+    await watcher.on_seen(*seen(page))
+    assert await watcher.take(page) is None
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def expose_binding(self, name, callback):
+        self.binding = callback
+
+    async def add_init_script(self, script):
+        pass
+
+
+class FakePage:
+    def __init__(self):
+        self.context = FakeContext()
+        self.close_handlers = []
+
+    def once(self, event, handler):
+        assert event == "close"
+        self.close_handlers.append(handler)
+
+    def close(self):
+        for handler in self.close_handlers:
+            handler(self)
+        self.close_handlers = []
+
+
+@pytest.mark.asyncio
+async def test_closed_page_drops_its_solve():
+    solver = FakeSolver(seconds=10)
+    watcher = CaptchaWatcher(solver)
+    page = FakePage()
+
+    await watcher.on_seen(*seen(page))
+    await watcher.on_seen(*seen(page, marker="other"))
+    assert len(page.close_handlers) == 1
+    task = watcher._solves[page].task
+
+    page.close()
+    await asyncio.gather(task, return_exceptions=True)
+    assert task.cancelled()
+    assert watcher._solves == {}
+    assert await watcher.take(page) is None
+
+
+def make_browser():
+    browser = BrowserManager(collect_timing=False)
+    browser._page = FakePage()
+    return browser
+
+
+class FakeCaptchaService:
+    def __init__(self):
+        self.users = []
+
+    def can_use_captcha(self, user_id):
+        return True
+
+    def increment_user_usage(self, user_id):
+        self.users.append(user_id)
+
+
+def slow_solve(tasks, service, solves):
+    async def solve_captcha(page, user_id, hedge):
+        solves.append((page, tasks.browser.is_busy))
+        await asyncio.sleep(0.05)
+        service.increment_user_usage(user_id)
+        return True
+
+    return solve_captcha
+
+
+@pytest.mark.asyncio
+async def test_solve_step_collects_the_early_solve():
+    browser, service = make_browser(), FakeCaptchaService()
+    solves = []
+    # Every command gets its own Tasks, the watcher belongs to the session
+    watching = Tasks(browser, service, user_id="user-1")
+    watching._solve_captcha = slow_solve(watching, service, solves)
+    await watching.watch_captchas()
+    watcher = browser.captcha_watcher
+    await Tasks(browser, service, user_id="user-1").watch_captchas()
+    assert browser.captcha_watcher is watcher
+    await browser.page.context.binding(*seen(browser.page))
+
+    solving = Tasks(browser, service, user_id="user-1")
+    solving._solve_captcha = slow_solve(solving, service, solves)
+    result = await solving.solve_best_captcha({"user_id": "someone-else"})
+    assert result == {"status": "ok", "result": True}
+    # Ran as a command, so the memory watchdog left the page alone
+    assert solves == [(browser.page, True)]
+    assert service.users == ["user-1"]
+
+
+@pytest.mark.asyncio
+async def test_closing_the_browser_stops_the_watcher():
+    browser, service = make_browser(), FakeCaptchaService()
+    solves = []
+    tasks = Tasks(browser, service, user_id="user-1")
+    tasks._solve_captcha = slow_solve(tasks, service, solves)
+    await tasks.watch_captchas()
+    await browser.page.context.binding(*seen(browser.page))
+    await asyncio.sleep(0)
+
+    await browser.close_browser()
+    # The running solve was cancelled before it charged anyone
+    assert len(solves) == 1
+    assert service.users == []
+    assert browser.captcha_watcher is None
+    assert not browser.is_busy
+    await browser._on_captcha_seen(*seen(browser.page))
+
+
+@pytest.mark.asyncio
+async def test_recycled_context_gets_the_observer():
+    browser = make_browser()
+    await browser.observe_captchas(CaptchaWatcher(FakeSolver()).on_seen)
+    assert len(browser._captcha_contexts) == 1
+
+    # A recycled context replaces the old one, which may free its id
+    browser._page = FakePage()
+    gc.collect()
+    assert len(browser._captcha_contexts) == 0
+    await browser._observe_captchas(browser.page.context)
+    assert browser.page.context.binding == browser._on_captcha_seen
+
+
+def test_observer_reports_mounted_widgets():
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except Error as e:
+            pytest.skip(f"Chromium is not available: {e}")
+        page = browser.new_page()
+        reports = []
+        page.expose_binding(
+            CAPTCHA_OBSERVER_BINDING, lambda source, report: reports.append(report)
+        )
+        page.set_content("<html><body><form></form></body></html>")
+        page.evaluate(CAPTCHA_OBSERVER_SCRIPT)
+        page.wait_for_timeout(300)
+        assert reports == []
+
+        page.evaluate("""() => {
+            const widget = document.createElement('div');
+            widget.className = 'h-captcha';
+            widget.dataset.sitekey = 'mounted-sitekey';
+            document.querySelector('form').appendChild(widget);
+        }""")
+        page.wait_for_timeout(300)
+        # Unrelated mutations do not report the same widget again
+        page.evaluate("() => document.body.appendChild(document.createElement('p'))")
+        page.wait_for_timeout(300)
+        browser.close()
+
+    assert len(reports) == 1
+    assert "mounted-sitekey" in reports[0]["marker"]
+    assert reports[0]["top"] is True
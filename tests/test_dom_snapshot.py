@@ -0,0 +1,94 @@
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.dom_snapshot import DomSnapshot, SnapshotElement, estimate_tokens
+
+
+def make_result(url="https://example.com/", count=3, hidden=()):
+    return {
+        "url": url,
+        "elements": [
+            {
+                "role": "link",
+                "name": f"Item {i}",
+                "selector": f"#item-{i}",
+                "visible": i not in hidden,
+            }
+            for i in range(count)
+        ],
+    }
+
+
+class FakePage:
+    def __init__(self, results):
+        self.results = list(results)
+
+    async def evaluate(self, script, arg=None):
+        return self.results.pop(0)
+
+
+def test_render_puts_visible_elements_first():
+    snapshot = DomSnapshot.from_script_result(make_result(hidden={0}))
+    lines = snapshot.render().splitlines()
+    assert lines[0] == "Page https://example.com/:"
+    assert lines[1] == 'link "Item 1" #item-1'
+    assert lines[-1] == 'link "Item 0" #item-0 (hidden)'
+
+
+def test_render_respects_token_budget():
+    snapshot = DomSnapshot.from_script_result(make_result(count=500))
+    rendered = snapshot.render(max_tokens=200)
+    assert estimate_tokens(rendered) <= 210
+    assert rendered.endswith("more omitted")
+
+
+def test_diff_reports_added_removed_and_changed():
+    previous = DomSnapshot.from_script_result(make_result(count=3))
+    current_result = make_result(count=3, hidden={1})
+    current_result["elements"][2] = {
+        "role": "button",
+        "name": "Load more",
+        "selector": "#more",
+        "visible": True,
+    }
+    current = DomSnapshot.from_script_result(current_result)
+
+    diff = current.diff(previous)
+    assert [e.selector for e in diff.added] == ["#more"]
+    assert [e.selector for e in diff.removed] == ["#item-2"]
+    assert diff.changed == [SnapshotElement("link", "Item 1", "#item-1", False)]
+    assert current.diff(DomSnapshot("https://other.com/", [])) is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_dom_sends_only_changes_after_first_call():
+    manager = BrowserManager()
+    manager._page = FakePage(
+        [make_result(count=2), make_result(count=2), make_result(count=3)]
+    )
+
+    full = await manager.snapshot_dom()
+    assert full.count("\n") == 2
+    assert await manager.snapshot_dom() == "Page https://example.com/: no changes"
+    assert await manager.snapshot_dom() == (
+        'Page https://example.com/ changes:\n+ link "Item 2" #item-2'
+    )
+
+
+@pytest.mark.asyncio
+async def test_elements_cut_by_the_budget_come_in_later_diffs():
+    manager = BrowserManager()
+    manager._page = FakePage([make_result(count=40)] * 3)
+
+    full = await manager.snapshot_dom(max_tokens=60)
+    assert full.endswith("more omitted")
+    shown = full.count("#item-")
+
+    # The omitted elements were never sent, so they count as new
+    diff = await manager.snapshot_dom(max_tokens=60)
+    assert f'+ link "Item {shown}" #item-{shown}' in diff
+    assert f"#item-{shown - 1}\n" not in diff
+
+    rest = await manager.snapshot_dom(max_tokens=10**6)
+    sent = shown + diff.count("+ link")
+    assert rest.count("+ link") == 40 - sent
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from om11.task.downloads import Downloader, filename_from_url, part_path_for
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+@asynccontextmanager
+async def file_server(tmp_path):
+    """Local HTTP server with Range support, a cookie-protected file and a flaky one"""
+    source = tmp_path / "source.bin"
+    source.write_bytes(PAYLOAD)
+    state = {
+        "active": 0,
+        "max_active": 0,
+        "flaky_requests": 0,
+        "ranges": [],
+        "etag": '"v1"',
+        "range_shift": 0,
+    }
+
+    async def plain(request):
+        state["ranges"].append(request.headers.get("Range"))
+        return web.FileResponse(source)
+
+    def ranged_response(request):
+        """206 for a Range whose If-Range still matches, else the whole file"""
+        headers = {"ETag": state["etag"]}
+        requested = request.headers.get("Range")
+        state["ranges"].append(requested)
+        if requested and request.headers.get("If-Range") == state["etag"]:
+            start = int(requested[len("bytes=") : -1])
+            if start >= len(PAYLOAD):
+                return web.Response(status=416, headers=headers)
+            # A broken server may answer with another range than asked for
+            start += state["range_shift"]
+            headers["Content-Range"] = f"bytes {start}-{len(PAYLOAD) - 1}/*"
+            return web.Response(status=206, body=PAYLOAD[start:], headers=headers)
+        return web.Response(body=PAYLOAD, headers=headers)
+
+    async def versioned(request):
+        return ranged_response(request)
+
+    async def private(request):
+        if request.cookies.get("sid") != "abc":
+            raise web.HTTPForbidden()
+        return web.FileResponse(source)
+
+    async def redirect(request):
+        raise web.HTTPFound("/private.bin")
+
+    async def flaky(request):
+        state["flaky_requests"] += 1
+        if request.headers.get("Range"):
+            return ranged_response(request)
+        # Drop the connection halfway through the first transfer
+        response = web.StreamResponse(
+            headers={"Content-Length": str(len(PAYLOAD)), "ETag": state["etag"]}
+        )
+        await response.prepare(request)
+        await response.write(PAYLOAD[: len(PAYLOAD) // 2])
+        request.transport.close()
+        return response
+
+    async def slow(request):
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        await asyncio.sleep(0.05)
+        state["active"] -= 1
+        return web.Response(body=b"slow")
+
+    app = web.Application()
+    app.router.add_get("/file.bin", plain)
+    app.router.add_get("/versioned.bin", versioned)
+    app.router.add_get("/private.bin", private)
+    app.router.add_get("/redirect", redirect)
+    app.router.add_get("/flaky.bin", flaky)
+    app.router.add_get("/slow/{name}", slow)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        yield server, state
+    finally:
+        await server.close()
+
+
+def test_filename_from_url():
+    assert filename_from_url("https://a.com/files/report%202024.pdf?x=1") == (
+        "report_2024.pdf"
+    )
+    assert len(filename_from_url("https://a.com/")) == 16
+
+
+@pytest.mark.asyncio
+async def test_download_streams_to_disk_with_checksum(tmp_path):
+    async with file_server(tmp_path) as (server, _):
+        downloader = Downloader(str(tmp_path / "out"), chunk_size=256 * 1024)
+        result = await downloader.download(
+            str(server.make_url("/file.bin")), expected_sha256=PAYLOAD_SHA256
+        )
+        assert result.size == len(PAYLOAD)
+        assert result.sha256 == PAYLOAD_SHA256
+        assert (tmp_path / "out" / "file.bin").read_bytes() == PAYLOAD
+        assert not (tmp_path / "out" / "file.bin.part").exists()
+
+        with pytest.raises(ValueError):
+            await downloader.download(
+                str(server.make_url("/file.bin")), expected_sha256="0" * 64
+            )
+
+
+def write_part(out, url, data, validator='"v1"'):
+    out.mkdir(exist_ok=True)
+    part_path = part_path_for(str(out / "versioned.bin"), url)
+    with open(part_path, "wb") as f:
+        f.write(data)
+    if validator:
+        with open(f"{part_path}.validator", "w") as f:
+            f.write(validator)
+    return part_path
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_existing_part_file(tmp_path):
+    async with file_server(tmp_path) as (server, state):
+        out = tmp_path / "out"
+        url = str(server.make_url("/versioned.bin"))
+        write_part(out, url, PAYLOAD[:1000])
+        # Another url saved under the same name has its own .part file
+        other_part = write_part(out, url + "?other", b"x" * 500)
+
+        result = await Downloader(str(out)).download(url)
+        assert state["ranges"] == ["bytes=1000-"]
+        assert result.resumed_from == 1000
+        assert result.sha256 == PAYLOAD_SHA256
+        with open(other_part, "rb") as f:
+            assert f.read() == b"x" * 500
+
+
+@pytest.mark.asyncio
+async def test_download_does_not_splice_a_changed_file(tmp_path):
+    async with file_server(tmp_path) as (server, state):
+        out = tmp_path / "out"
+        url = str(server.make_url("/versioned.bin"))
+
+        # The file changed since the .part was written
+        write_part(out, url, b"old" * 100, validator='"v0"')
+        result = await Downloader(str(out)).download(url)
+        assert result.resumed_from == 0
+        assert result.sha256 == PAYLOAD_SHA256
+
+        # No validator, nothing proves the bytes belong to this version
+        write_part(out, url, b"old" * 100, validator=None)
+        result = await Downloader(str(out)).download(url)
+        assert state["ranges"][-1] is None
+        assert result.sha256 == PAYLOAD_SHA256
+
+
+@pytest.mark.asyncio
+async def test_download_restarts_on_a_bad_range_answer(tmp_path):
+    async with file_server(tmp_path) as (server, state):
+        out = tmp_path / "out"
+        url = str(server.make_url("/versioned.bin"))
+
+        state["range_shift"] = 10
+        write_part(out, url, PAYLOAD[:1000])
+        result = await Downloader(str(out)).download(url)
+        assert state["ranges"] == ["bytes=1000-", None]
+        assert result.sha256 == PAYLOAD_SHA256
+
+        # A .part longer than the file is not a finished download
+        state["ranges"].clear()
+        write_part(out, url, PAYLOAD + b"extra")
+        result = await Downloader(str(out)).download(url)
+        assert state["ranges"] == [f"bytes={len(PAYLOAD) + 5}-", None]
+        assert result.sha256 == PAYLOAD_SHA256
+
+
+@pytest.mark.asyncio
+async def test_download_keeps_files_inside_the_download_dir(tmp_path):
+    async with file_server(tmp_path) as (server, _):
+        out = tmp_path / "out"
+        url = str(server.make_url("/file.bin"))
+        downloader = Downloader(str(out))
+
+        results = await asyncio.gather(
+            downloader.download(url, filename="../escaped.bin"),
+            downloader.download(url, filename="/tmp/escaped.bin"),
+        )
+        assert {result.path for result in results} == {str(out / "escaped.bin")}
+        assert not (tmp_path / "escaped.bin").exists()
+        assert (out / "escaped.bin").read_bytes() == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_after_dropped_connection(tmp_path):
+    async with file_server(tmp_path) as (server, state):
+        downloader = Downloader(str(tmp_path / "out"), chunk_size=64 * 1024)
+        result = await downloader.download(str(server.make_url("/flaky.bin")))
+        assert state["flaky_requests"] == 2
+        assert result.sha256 == PAYLOAD_SHA256
+
+
+@pytest.mark.asyncio
+async def test_headers_are_requested_for_every_redirect_hop(tmp_path):
+    async with file_server(tmp_path) as (server, _):
+        requested = []
+
+        async def headers_for(url):
+            requested.append(url)
+            return {"Cookie": "sid=abc"} if url.endswith("/private.bin") else {}
+
+        result = await Downloader(str(tmp_path / "out")).download(
+            str(server.make_url("/redirect")), headers_for, filename="private.bin"
+        )
+        assert result.sha256 == PAYLOAD_SHA256
+        assert [url.rsplit("/", 1)[1] for url in requested] == [
+            "redirect",
+            "private.bin",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_download_many_limits_concurrency(tmp_path):
+    async with file_server(tmp_path) as (server, state):
+        downloader = Downloader(str(tmp_path / "out"), max_concurrent=2)
+        urls = [str(server.make_url(f"/slow/{i}")) for i in range(6)]
+        results = await downloader.download_many(urls)
+        assert [r.size for r in results] == [4] * 6
+        assert state["max_active"] == 2
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.extraction import ExtractionResult, parse_field, parse_fields
+from om11.task.tasks import Tasks
+
+TOTAL_ROWS = 25
+
+
+class FakePage:
+    """Answers the extraction script from a generated listing"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def wait_for_selector(self, selector, timeout=None):
+        return True
+
+    async def evaluate(self, script, args):
+        self.calls.append(args)
+        offset, limit = args["offset"], args["limit"]
+        end = TOTAL_ROWS if limit is None else min(TOTAL_ROWS, offset + limit)
+        columns = {
+            name: [f"{name}-{i}" for i in range(offset, end)] for name in args["fields"]
+        }
+        return {"total": TOTAL_ROWS, "offset": offset, "columns": columns}
+
+
+@pytest.fixture
+def manager():
+    manager = BrowserManager()
+    manager._page = FakePage()
+    return manager
+
+
+def test_field_shorthand():
+    assert parse_field("h2") == {"selector": "h2", "kind": "text", "attr": None}
+    assert parse_field("a@href") == {"selector": "a", "kind": "href", "attr": "href"}
+    assert parse_field("@data-id") == {
+        "selector": None,
+        "kind": "attr",
+        "attr": "data-id",
+    }
+    assert parse_field({"selector": ".tag", "kind": "count"})["kind"] == "count"
+    with pytest.raises(ValueError):
+        parse_field({"selector": "a", "kind": "attr"})
+    with pytest.raises(ValueError):
+        parse_fields({})
+
+
+def test_result_rows_from_columns():
+    result = ExtractionResult(
+        total=3, offset=1, columns={"title": ["b", "c"], "price": [2, 3]}
+    )
+    assert len(result) == 2
+    assert not result.has_more
+    assert list(result.rows()) == [
+        {"title": "b", "price": 2},
+        {"title": "c", "price": 3},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_extract_records_is_a_single_round_trip(manager):
+    result = await manager.extract_records(
+        ".card", {"title": "h2", "url": "a@href"}, offset=5, limit=10
+    )
+    assert len(manager._page.calls) == 1
+    assert result.columns["title"][0] == "title-5"
+    assert len(result) == 10 and result.has_more
+
+
+@pytest.mark.asyncio
+async def test_iter_records_pages_and_reuses_row_list(manager):
+    pages = [
+        page async for page in manager.iter_records(".card", {"t": "h2"}, page_size=10)
+    ]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [call["reuse"] for call in manager._page.calls] == [False, True, True]
+
+
+@pytest.mark.asyncio
+async def test_extract_data_task_streams_to_file(manager, tmp_path):
+    tasks = Tasks(
+        browser_manager=manager, captcha_service=None, exports_dir=str(tmp_path)
+    )
+
+    inline = json.loads(await tasks.extract_data(".card", {"t": "h2"}, limit=2))
+    assert inline == {"total": 25, "offset": 0, "columns": {"t": ["t-0", "t-1"]}}
+
+    path = tmp_path / "rows.jsonl"
+    message = await tasks.extract_data(
+        ".card", {"t": "h2"}, save_to="rows.jsonl", page_size=10
+    )
+    assert message == f"Extracted 25 rows of .card to {path}."
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["offset"] for line in lines] == [0, 10, 20]
+
+
+@pytest.mark.asyncio
+async def test_extract_data_task_stays_in_exports_dir(manager, tmp_path):
+    exports = tmp_path / "exports"
+    tasks = Tasks(
+        browser_manager=manager, captcha_service=None, exports_dir=str(exports)
+    )
+
+    await tasks.extract_data(".card", {"t": "h2"}, save_to="../../etc/rows.jsonl")
+    assert [p.name for p in exports.iterdir()] == ["rows.jsonl"]
+    assert not (tmp_path / "etc").exists()
+
+    with pytest.raises(ValueError):
+        await tasks.extract_data(".card", {"t": "h2"}, save_to="../")
@@ -0,0 +1,67 @@
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.launch_presets import BASE_ARGS, LAUNCH_PRESETS, get_preset
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.page_kwargs = None
+
+    async def new_page(self, **kwargs):
+        self.page_kwargs = kwargs
+        return object()
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launch_kwargs = None
+        self.browser = FakeBrowser()
+
+    async def launch(self, **kwargs):
+        self.launch_kwargs = kwargs
+        return self.browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+
+def test_presets_keep_sandbox_args():
+    for preset in LAUNCH_PRESETS.values():
+        assert preset.launch_kwargs()["args"][: len(BASE_ARGS)] == BASE_ARGS
+    with pytest.raises(ValueError):
+        get_preset("tiny")
+
+
+@pytest.mark.asyncio
+async def test_default_preset_matches_previous_launch():
+    manager = BrowserManager()
+    manager._playwright = FakePlaywright()
+    await manager.init_browser()
+
+    chromium = manager._playwright.chromium
+    assert chromium.launch_kwargs == {
+        "headless": False,
+        "args": BASE_ARGS,
+        "ignore_default_args": ["--enable-automation"],
+    }
+    assert chromium.browser.page_kwargs["viewport"] == {"width": 1280, "height": 800}
+
+
+@pytest.mark.asyncio
+async def test_dense_preset_with_overrides():
+    manager = BrowserManager()
+    manager._playwright = FakePlaywright()
+    await manager.init_browser(
+        headless=False, args=["--lang=de"], preset="dense-headless"
+    )
+
+    chromium = manager._playwright.chromium
+    assert chromium.launch_kwargs["headless"] is False
+    assert "--disable-gpu" in chromium.launch_kwargs["args"]
+    assert chromium.launch_kwargs["args"][-1] == "--lang=de"
+    assert chromium.browser.page_kwargs["viewport"] == {"width": 1024, "height": 640}
+    # The preset itself is not modified by the extra args
+    assert "--lang=de" not in get_preset("dense-headless").launch_kwargs()["args"]
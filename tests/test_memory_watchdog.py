@@ -0,0 +1,307 @@
+import asyncio
+import os
+
+import pytest
+
+from om11.metrics import metrics
+from om11.task.browser_manager import BrowserManager
+from om11.task.launch_presets import LaunchPreset
+from om11.task.memory_watchdog import MemorySample, MemoryWatchdog, read_process_rss
+from om11.task.session_store import SESSION_STORAGE_SCRIPT
+
+MB = 1024 * 1024
+
+
+class FakeManager:
+    def __init__(self, heap_mb, rss_mb=None, busy=False):
+        self.sample = MemorySample(
+            js_heap_used=heap_mb * MB,
+            js_heap_total=heap_mb * MB,
+            process_rss=None if rss_mb is None else rss_mb * MB,
+        )
+        self.is_busy = busy
+        self.recycles = 0
+
+    async def sample_memory(self):
+        if self.sample is None:
+            raise RuntimeError("page crashed")
+        return self.sample
+
+    async def recycle_page(self):
+        self.recycles += 1
+        return True
+
+
+class FakeCDPSession:
+    async def send(self, method, params=None):
+        if method == "Performance.getMetrics":
+            return {
+                "metrics": [
+                    {"name": "JSHeapUsedSize", "value": 700 * MB},
+                    {"name": "JSHeapTotalSize", "value": 800 * MB},
+                ]
+            }
+        return {}
+
+    async def detach(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, cookies=None, local_storage=None):
+        self.cookies = list(cookies or [])
+        self.local_storage = local_storage or {}
+        self.init_scripts = []
+        self.pages = []
+        self.closed = False
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def new_cdp_session(self, page):
+        return FakeCDPSession()
+
+    async def storage_state(self):
+        return {
+            "cookies": self.cookies,
+            "origins": [
+                {
+                    "origin": origin,
+                    "localStorage": [{"name": k, "value": v} for k, v in items.items()],
+                }
+                for origin, items in self.local_storage.items()
+            ],
+        }
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def add_init_script(self, script=None):
+        self.init_scripts.append(script)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    def __init__(self, context, url="about:blank"):
+        self.context = context
+        self.url = url
+        self.viewport_size = {"width": 1280, "height": 800}
+        self.init_scripts = []
+        self.closed = False
+
+    async def add_init_script(self, script=None):
+        self.init_scripts.append(script)
+
+    async def close(self):
+        self.closed = True
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.url = url
+
+    async def evaluate(self, script, arg=None):
+        if script == SESSION_STORAGE_SCRIPT:
+            return {"origin": "https://app.example.com", "items": {"tab": "2"}}
+        if script == "() => location.origin":
+            return "null"
+        return None
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.context_options = []
+
+    async def new_context(self, **options):
+        context = FakeContext()
+        self.contexts.append(context)
+        self.context_options.append(options)
+        return context
+
+    async def new_browser_cdp_session(self):
+        raise RuntimeError("not supported")
+
+
+def test_read_process_rss():
+    assert read_process_rss(1) is None or read_process_rss(1) > 0
+    assert read_process_rss(-1) is None
+
+
+@pytest.mark.asyncio
+async def test_watchdog_recycles_only_idle_browsers_over_limit():
+    browsers = {
+        "small": FakeManager(heap_mb=100),
+        "heap": FakeManager(heap_mb=900),
+        "rss": FakeManager(heap_mb=100, rss_mb=4000),
+        "busy": FakeManager(heap_mb=900, busy=True),
+        "crashed": FakeManager(heap_mb=0),
+    }
+    browsers["crashed"].sample = None
+    before = metrics.counter("memory_watchdog.recycles", {"reason": "js_heap"})
+    watchdog = MemoryWatchdog(browsers, heap_limit_mb=512, process_limit_mb=1536)
+
+    recycled = await watchdog.check_all()
+
+    assert recycled == {"heap": "js_heap", "rss": "process_rss"}
+    assert browsers["busy"].recycles == 0
+    assert (
+        metrics.counter("memory_watchdog.recycles", {"reason": "js_heap"}) == before + 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_in_use_marks_browser_busy():
+    manager = BrowserManager()
+    assert not manager.is_busy
+    async with manager.in_use():
+        assert manager.is_busy
+    assert not manager.is_busy
+
+
+@pytest.mark.asyncio
+async def test_sample_memory_reads_js_heap_over_cdp():
+    manager = BrowserManager()
+    manager._browser = FakeBrowser()
+    manager._page = FakePage(FakeContext())
+    sample = await manager.sample_memory()
+    assert sample.js_heap_used_mb == 700
+    assert sample.process_rss is None
+
+
+class ProcessInfoBrowser(FakeBrowser):
+    """Reports this test process as the browser's renderer"""
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = 0
+
+    async def new_browser_cdp_session(self):
+        self.sessions += 1
+        return ProcessInfoSession()
+
+
+class ProcessInfoSession:
+    async def send(self, method, params=None):
+        return {"processInfo": [{"id": os.getpid(), "type": "renderer"}]}
+
+    async def detach(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_renderer_rss_is_only_read_for_launched_browsers():
+    manager = BrowserManager()
+    manager._browser = ProcessInfoBrowser()
+    manager._page = FakePage(FakeContext())
+    # Connected over CDP, the pids belong to another host
+    sample = await manager.sample_memory()
+    assert sample.process_rss is None
+    assert manager._browser.sessions == 0
+
+    manager._launched = True
+    sample = await manager.sample_memory()
+    assert manager._browser.sessions == 1
+    if read_process_rss(os.getpid()) is not None:
+        assert sample.process_rss > 0
+
+
+@pytest.mark.asyncio
+async def test_recycle_page_carries_session_to_fresh_context():
+    old_context = FakeContext(
+        cookies=[{"name": "sid", "value": "abc", "domain": "app.example.com"}],
+        local_storage={"https://app.example.com": {"token": "t1"}},
+    )
+    manager = BrowserManager(collect_timing=False)
+    manager._browser = FakeBrowser()
+    manager._launched = True
+    manager._page = FakePage(old_context, url="https://app.example.com/inbox")
+
+    assert await manager.recycle_page()
+
+    new_context = manager._page.context
+    assert old_context.closed
+    assert new_context is not old_context
+    assert new_context.cookies == old_context.cookies
+    assert manager._page.url == "https://app.example.com/inbox"
+    # Storage is restored by an init script on the first navigation
+    assert len(new_context.init_scripts) == 1
+    assert '"token": "t1"' in new_context.init_scripts[0]
+    assert '"tab": "2"' in new_context.init_scripts[0]
+
+
+@pytest.mark.asyncio
+async def test_recycle_keeps_the_preset_context_options():
+    manager = BrowserManager(collect_timing=False)
+    manager._browser = FakeBrowser()
+    manager._launched = True
+    preset = LaunchPreset(name="hidpi", headless=True, device_scale_factor=2.0)
+    manager._context_options = preset.page_kwargs()
+    manager._page = FakePage(FakeContext())
+    manager._page.viewport_size = {"width": 1024, "height": 700}
+
+    assert await manager.recycle_page()
+
+    options = manager._browser.context_options[0]
+    assert options["device_scale_factor"] == 2.0
+    # A viewport resized since launch is kept
+    assert options["viewport"] == {"width": 1024, "height": 700}
+
+
+@pytest.mark.asyncio
+async def test_recycle_keeps_the_context_of_a_connected_browser():
+    context = FakeContext()
+    manager = BrowserManager(collect_timing=False)
+    manager._browser = FakeBrowser()
+    old_page = FakePage(context, url="https://app.example.com/inbox")
+    manager._page = old_page
+
+    assert await manager.recycle_page()
+
+    # The profile's context, with its proxy and fingerprint, is kept
+    assert manager._browser.contexts == []
+    assert not context.closed
+    assert old_page.closed
+    assert manager._page.context is context
+    assert manager._page.url == "https://app.example.com/inbox"
+    assert '"tab": "2"' in manager._page.init_scripts[0]
+
+
+@pytest.mark.asyncio
+async def test_recycle_and_commands_exclude_each_other():
+    context = FakeContext()
+    manager = BrowserManager(collect_timing=False)
+    manager._browser = FakeBrowser()
+    old_page = FakePage(context, url="https://app.example.com/inbox")
+    manager._page = old_page
+
+    async with manager.in_use():
+        assert not await manager.recycle_page()
+    assert manager._page is old_page
+
+    # A command arriving mid-recycle starts on the new page
+    opened = asyncio.Event()
+    resume = asyncio.Event()
+    goto = FakePage.goto
+
+    async def slow_goto(page, url, wait_until=None, timeout=None):
+        opened.set()
+        await resume.wait()
+        await goto(page, url, wait_until, timeout)
+
+    FakePage.goto = slow_goto
+    try:
+        recycle = asyncio.create_task(manager.recycle_page())
+        await opened.wait()
+        command = asyncio.create_task(manager.in_use().__aenter__())
+        await asyncio.sleep(0.01)
+        assert not command.done()
+        resume.set()
+        assert await recycle
+        await command
+        assert manager.is_busy
+        assert manager._page is not old_page
+    finally:
+        FakePage.goto = goto
@@ -0,0 +1,115 @@
+import gc
+
+import pytest
+
+from om11.metrics import metrics
+from om11.task.browser_manager import BrowserManager
+from om11.task.perf_timing import (
+    LONG_TASK_OBSERVER_SCRIPT,
+    PHASES,
+    NavigationStats,
+    NavigationTiming,
+)
+from om11.task.tasks import Tasks
+
+SCRIPT_RESULT = {
+    "url": "https://shop.example.com/item/1",
+    "redirect": 0,
+    "dns": 10,
+    "connect": 30,
+    "tls": 20,
+    "ttfb": 200,
+    "download": 40,
+    "dom_processing": 300,
+    "load_event": 120,
+    "load": 700,
+    "document_size": 5120,
+    "resources": {"count": 12, "transfer_size": 40960, "by_type": {}, "slowest": []},
+    "long_tasks": {"count": 2, "total": 180, "longest": 120},
+}
+
+
+class FakeContext:
+    def __init__(self):
+        self.init_scripts = []
+
+    async def add_init_script(self, script):
+        self.init_scripts.append(script)
+
+
+class FakePage:
+    def __init__(self):
+        self.context = FakeContext()
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        return dict(SCRIPT_RESULT)
+
+
+def test_idle_tail_is_wall_time_after_load():
+    timing = NavigationTiming.from_script_result(SCRIPT_RESULT, 1000.0)
+    assert timing.idle_tail == 300.0
+    assert timing.domain == "shop.example.com"
+    assert list(timing.phases()) == list(PHASES)
+    assert "slowest phase dom_processing" in timing.summary()
+    assert "2 long tasks (180ms)" in timing.summary()
+
+
+def test_report_shows_phase_share_per_domain():
+    stats = NavigationStats()
+    stats.record(NavigationTiming.from_script_result(SCRIPT_RESULT, 1000.0))
+    stats.record(NavigationTiming.from_script_result(SCRIPT_RESULT, 1200.0))
+    other = dict(SCRIPT_RESULT, url="https://other.org/")
+    stats.record(NavigationTiming.from_script_result(other, 700.0))
+
+    report = stats.report()
+    assert list(report) == ["shop.example.com", "other.org"]
+    shop = report["shop.example.com"]
+    assert shop["navigations"] == 2
+    assert shop["mean_ms"]["idle_tail"] == 400.0
+    assert shop["wall_ms_p50"] == 1200.0
+    assert abs(sum(shop["share"].values()) - 1) < 0.01
+    assert shop["long_tasks_per_navigation"] == 2
+
+
+@pytest.mark.asyncio
+async def test_open_url_attaches_timing_to_result_and_metrics():
+    manager = BrowserManager()
+    manager._page = FakePage()
+    tasks = Tasks(browser_manager=manager, captcha_service=None)
+
+    result = await tasks.open_url("https://shop.example.com/item/1")
+    await manager.open_url("https://shop.example.com/item/2")
+
+    assert "ttfb 200ms" in result
+    assert manager.last_navigation.ttfb == 200
+    # The observer is installed once per context
+    assert manager._page.context.init_scripts == [LONG_TASK_OBSERVER_SCRIPT]
+    timings = metrics.snapshot()["timings"]
+    assert timings["navigation.ttfb_ms{domain=shop.example.com}"]["count"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_open_url_without_timing_collection():
+    manager = BrowserManager(collect_timing=False)
+    manager._page = FakePage()
+    await manager.open_url("https://shop.example.com/")
+    assert manager.last_navigation is None
+    assert manager._page.context.init_scripts == []
+
+
+@pytest.mark.asyncio
+async def test_closed_contexts_are_forgotten():
+    manager = BrowserManager()
+    manager._page = FakePage()
+    await manager.open_url("https://shop.example.com/")
+    assert len(manager._observed_contexts) == 1
+
+    # A recycled context replaces the old one, which may free its id
+    manager._page = FakePage()
+    gc.collect()
+    assert len(manager._observed_contexts) == 0
+    await manager.open_url("https://shop.example.com/")
+    assert manager._page.context.init_scripts == [LONG_TASK_OBSERVER_SCRIPT]
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.session_store import SessionSnapshot
+
+
+class FakePage:
+    def __init__(self, context, url="about:blank"):
+        self.context = context
+        self.url = url
+
+    def is_closed(self):
+        return False
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.url = url
+
+    async def evaluate(self, script, arg=None):
+        if script == "() => location.origin":
+            return "null"
+        return None
+
+
+class FakeContext:
+    def __init__(self, urls=()):
+        self.pages = [FakePage(self, url) for url in urls]
+        self.cookies = []
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def add_init_script(self, script=None):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, contexts):
+        self.contexts = contexts
+        self.handlers = []
+
+    def on(self, event, handler):
+        assert event == "disconnected"
+        self.handlers.append(handler)
+
+    def disconnect(self):
+        for handler in self.handlers:
+            handler(self)
+
+
+class FakeChromium:
+    def __init__(self, browsers):
+        # Each connect returns the next browser, None simulates a failed connect
+        self.browsers = list(browsers)
+        self.attempts = 0
+
+    async def connect_over_cdp(self, ws_url):
+        self.attempts += 1
+        browser = self.browsers.pop(0)
+        if browser is None:
+            raise ConnectionError("connection refused")
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self, browsers):
+        self.chromium = FakeChromium(browsers)
+
+
+def make_manager(browsers):
+    manager = BrowserManager(collect_timing=False)
+    manager._playwright = FakePlaywright(browsers)
+    manager.reconnect_base_delay = 0.01
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_connect_reuses_open_page():
+    context = FakeContext(["https://a.com/", "https://b.com/"])
+    manager = make_manager([FakeBrowser([context])])
+    await manager.connect_ws("ws://remote")
+    assert manager._page is context.pages[-1]
+    assert len(context.pages) == 2
+
+
+@pytest.mark.asyncio
+async def test_reconnect_with_backoff_replays_checkpoint():
+    first = FakeBrowser([FakeContext(["https://app.com/inbox"])])
+    # The browser restarted: its only context has a blank page and no cookies
+    restarted = FakeBrowser([FakeContext(["about:blank"])])
+    manager = make_manager([first, None, None, restarted])
+    await manager.connect_ws("ws://remote")
+    manager._checkpoint = SessionSnapshot(
+        cookies=[{"name": "sid", "value": "1", "domain": "app.com", "path": "/"}]
+    )
+    manager._checkpoint_url = "https://app.com/inbox"
+
+    first.disconnect()
+    assert not manager.is_connected
+    # A command arriving now is held until the reconnect is done
+    await manager.wait_until_connected(timeout=5)
+
+    assert manager._playwright.chromium.attempts == 4
+    assert manager._browser is restarted
+    assert manager._page.url == "https://app.com/inbox"
+    assert manager._page.context.cookies == manager._checkpoint.cookies
+
+
+@pytest.mark.asyncio
+async def test_commands_fail_when_reconnect_gives_up():
+    first = FakeBrowser([FakeContext(["https://app.com/"])])
+    manager = make_manager([first] + [None] * 8)
+    manager.reconnect_base_delay = 0.001
+    await manager.connect_ws("ws://remote")
+
+    first.disconnect()
+    with pytest.raises(RuntimeError, match="reconnecting"):
+        await manager.wait_until_connected(timeout=0)
+    await manager._reconnect_task
+    with pytest.raises(RuntimeError, match="connection lost"):
+        await manager.wait_until_connected()
+
+
+@pytest.mark.asyncio
+async def test_close_does_not_reconnect():
+    first = FakeBrowser([FakeContext(["https://app.com/"])])
+    manager = make_manager([first])
+    await manager.connect_ws("ws://remote")
+
+    async def close():
+        first.disconnect()
+
+    first.close = close
+    manager._playwright.stop = lambda: asyncio.sleep(0)
+    await manager.close_browser()
+    assert manager._reconnect_task is None
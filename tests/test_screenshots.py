@@ -0,0 +1,111 @@
+import base64
+
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.screenshots import ScreenshotOptions, ScreenshotStore
+
+
+class FakeCDPSession:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, method, params):
+        self.sent.append((method, params))
+        return {"data": base64.b64encode(b"webp-bytes").decode()}
+
+    async def detach(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.session = FakeCDPSession()
+
+    async def new_cdp_session(self, page):
+        return self.session
+
+
+class FakePage:
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.screenshot_calls = []
+        self.context = FakeContext()
+
+    async def screenshot(self, **kwargs):
+        self.screenshot_calls.append(kwargs)
+        return self.frames.pop(0)
+
+    async def evaluate(self, script):
+        return {"width": 1280, "height": 4000}
+
+
+@pytest.fixture
+def browser_manager():
+    manager = BrowserManager()
+    manager._page = FakePage([b"frame-1", b"frame-1", b"frame-2"])
+    return manager
+
+
+def test_options_infer_format_from_path():
+    assert ScreenshotOptions.from_path("audit/step.jpg").image_format == "jpeg"
+    assert ScreenshotOptions.from_path("audit/step.webp").image_format == "webp"
+    assert ScreenshotOptions.from_path("audit/step").image_format == "png"
+    options = ScreenshotOptions.from_path("step.png", image_format="jpeg", quality=60)
+    assert options.playwright_kwargs() == {
+        "type": "jpeg",
+        "scale": "device",
+        "quality": 60,
+        "full_page": False,
+    }
+
+
+def test_options_validation():
+    with pytest.raises(ValueError):
+        ScreenshotOptions(image_format="gif")
+    with pytest.raises(ValueError):
+        ScreenshotOptions(image_format="png", quality=80)
+    with pytest.raises(ValueError):
+        ScreenshotOptions(clip={"x": 0, "y": 0})
+
+
+def test_element_kwargs_drop_page_only_options():
+    options = ScreenshotOptions(
+        full_page=True, clip={"x": 0, "y": 0, "width": 1, "height": 1}
+    )
+    assert "full_page" not in options.playwright_kwargs(element=True)
+    assert "clip" not in options.playwright_kwargs(element=True)
+
+
+@pytest.mark.asyncio
+async def test_store_skips_identical_consecutive_frames(tmp_path):
+    store = ScreenshotStore()
+    first = str(tmp_path / "1.png")
+    second = str(tmp_path / "2.png")
+    third = str(tmp_path / "3.png")
+
+    assert await store.save(b"same", first) == (first, True)
+    assert await store.save(b"same", second) == (first, False)
+    assert await store.save(b"changed", third) == (third, True)
+    assert not (tmp_path / "2.png").exists()
+    assert (tmp_path / "3.png").read_bytes() == b"changed"
+
+
+@pytest.mark.asyncio
+async def test_browser_manager_screenshot_dedups(browser_manager, tmp_path):
+    paths = [str(tmp_path / f"step_{i}.png") for i in range(3)]
+    saved = [await browser_manager.screenshot(path) for path in paths]
+    assert saved == [paths[0], paths[0], paths[2]]
+    assert browser_manager.page.screenshot_calls[0]["type"] == "png"
+
+
+@pytest.mark.asyncio
+async def test_capture_webp_uses_cdp(browser_manager):
+    options = ScreenshotOptions(image_format="webp", quality=50, full_page=True)
+    data = await browser_manager.capture_screenshot(options)
+    assert data == b"webp-bytes"
+    method, params = browser_manager.page.context.session.sent[0]
+    assert method == "Page.captureScreenshot"
+    assert params["format"] == "webp"
+    assert params["quality"] == 50
+    assert params["clip"]["height"] == 4000
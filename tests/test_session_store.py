@@ -0,0 +1,264 @@
+import asyncio
+import copy
+import gzip
+import os
+
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.session_store import COOKIES_PART, SessionSnapshot, SessionStore
+from om11.task.tasks import Tasks
+
+COOKIES = [{"name": "sid", "value": "abc", "domain": "example.com", "path": "/"}]
+STORAGE_STATE = {
+    "cookies": COOKIES,
+    "origins": [
+        {
+            "origin": "https://example.com",
+            "localStorage": [
+                {"name": "token", "value": "t1"},
+                {"name": "__om11_restored", "value": "old-marker"},
+            ],
+        },
+        {"origin": "https://other.com", "localStorage": [{"name": "k", "value": "v"}]},
+    ],
+}
+
+
+class FakeScript:
+    def __init__(self, context, script):
+        self.context = context
+        self.script = script
+
+    async def dispose(self):
+        self.context.init_scripts.remove(self.script)
+
+
+class FakeContext:
+    def __init__(self, state=None):
+        self.state = copy.deepcopy(state or {"cookies": [], "origins": []})
+        self.added_cookies = []
+        self.init_scripts = []
+
+    async def storage_state(self):
+        return copy.deepcopy(self.state)
+
+    async def add_cookies(self, cookies):
+        self.added_cookies.append(cookies)
+        names = {cookie["name"] for cookie in cookies}
+        kept = [c for c in self.state["cookies"] if c["name"] not in names]
+        self.state["cookies"] = kept + copy.deepcopy(cookies)
+
+    async def add_init_script(self, script):
+        self.init_scripts.append(script)
+        return FakeScript(self, script)
+
+    async def cookies(self):
+        return self.state["cookies"]
+
+    def local_storage(self, origin):
+        for entry in self.state["origins"]:
+            if entry["origin"] == origin:
+                return entry["localStorage"]
+        entry = {"origin": origin, "localStorage": []}
+        self.state["origins"].append(entry)
+        return entry["localStorage"]
+
+
+class FakePage:
+    """Keeps what RESTORE_STORAGE_SCRIPT writes, marker check included"""
+
+    def __init__(self, state=None):
+        self.context = FakeContext(state)
+        self.session_items = {"step": "2"} if state else {}
+        self.restored = []
+
+    async def evaluate(self, script, arg=None):
+        if script == "() => location.origin":
+            return "https://example.com"
+        if arg is None:
+            return {"origin": "https://example.com", "items": self.session_items}
+        origin, storage, marker = arg
+        items = self.context.local_storage(origin)
+        current = {item["name"]: item["value"] for item in items}
+        if current.get("__om11_restored") == marker:
+            return True
+        self.restored.append(arg)
+        current.update(storage.get("localStorage", {}))
+        current["__om11_restored"] = marker
+        items[:] = [{"name": k, "value": v} for k, v in current.items()]
+        self.session_items.update(storage.get("sessionStorage", {}))
+        return True
+
+
+@pytest.fixture
+def browser_manager(tmp_path):
+    manager = BrowserManager(session_store=SessionStore(str(tmp_path)))
+    manager._page = FakePage(STORAGE_STATE)
+    return manager
+
+
+def test_snapshot_from_storage_state_drops_markers():
+    snapshot = SessionSnapshot.from_storage_state(
+        STORAGE_STATE, {"origin": "https://example.com", "items": {"step": "2"}}
+    )
+    assert snapshot.origins["https://example.com"] == {
+        "localStorage": {"token": "t1"},
+        "sessionStorage": {"step": "2"},
+    }
+    assert snapshot.cookies == COOKIES
+
+
+@pytest.mark.asyncio
+async def test_store_is_content_addressed_and_compressed(tmp_path):
+    store = SessionStore(str(tmp_path))
+    snapshot = SessionSnapshot(
+        cookies=COOKIES, origins={"https://a.com": {"localStorage": {"x": "1"}}}
+    )
+
+    first = await store.save("user-1", "main", snapshot)
+    second = await store.save("user-1", "backup", snapshot)
+    assert first == second
+    objects = os.listdir(tmp_path / "objects")
+    assert len(objects) == 2
+
+    with open(tmp_path / "objects" / f"{first[COOKIES_PART]}.json.gz", "rb") as f:
+        assert b"sid" in gzip.decompress(f.read())
+
+
+@pytest.mark.asyncio
+async def test_store_load_skips_known_parts(tmp_path):
+    store = SessionStore(str(tmp_path))
+    snapshot = SessionSnapshot(
+        cookies=COOKIES,
+        origins={
+            "https://a.com": {"localStorage": {"x": "1"}},
+            "https://b.com": {"localStorage": {"y": "2"}},
+        },
+    )
+    digests = await store.save("user-1", "main", snapshot)
+
+    known = {key: value for key, value in digests.items() if key != "https://b.com"}
+    loaded_digests, changed = await store.load("user-1", "main", known=known)
+    assert loaded_digests == digests
+    assert changed.cookies == []
+    assert list(changed.origins) == ["https://b.com"]
+
+    with pytest.raises(FileNotFoundError):
+        await store.load("user-1", "missing")
+
+
+@pytest.mark.asyncio
+async def test_store_keeps_similar_ids_apart(tmp_path):
+    store = SessionStore(str(tmp_path))
+    ids = ["a/b", "a_b", "../a_b", "", "%"]
+    for index, user_id in enumerate(ids):
+        snapshot = SessionSnapshot(cookies=[{"name": "n", "value": str(index)}])
+        await store.save(user_id, user_id, snapshot)
+
+    for index, user_id in enumerate(ids):
+        _, loaded = await store.load(user_id, user_id)
+        assert loaded.cookies == [{"name": "n", "value": str(index)}]
+    # "../a_b" stays inside the store
+    assert sorted(os.listdir(tmp_path)) == ["objects", "refs"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_saves_leave_no_temp_files(tmp_path):
+    store = SessionStore(str(tmp_path))
+    snapshots = [
+        SessionSnapshot(origins={"https://a.com": {"localStorage": {"x": str(i)}}})
+        for i in range(8)
+    ]
+    await asyncio.gather(
+        *(store.save("user-1", "main", snapshot) for snapshot in snapshots)
+    )
+
+    _, loaded = await store.load("user-1", "main")
+    assert loaded.origins["https://a.com"]["localStorage"]["x"] in {
+        str(i) for i in range(8)
+    }
+    assert os.listdir(tmp_path / "refs" / "user-1") == ["main.json"]
+
+
+@pytest.mark.asyncio
+async def test_load_session_is_incremental(browser_manager, tmp_path):
+    await browser_manager.save_session("user-1", "main")
+
+    fresh = BrowserManager(session_store=SessionStore(str(tmp_path)))
+    fresh._page = FakePage()
+    assert await fresh.load_session("user-1", "main") == 2
+    context = fresh.page.context
+    assert context.added_cookies == [COOKIES]
+    # Current origin is written directly, the other one waits for navigation
+    assert fresh.page.restored[0][0] == "https://example.com"
+    assert len(context.init_scripts) == 1
+    assert "https://other.com" in context.init_scripts[0]
+
+    # Only the origin that was never opened is still missing
+    assert await fresh.load_session("user-1", "main") == 1
+    assert len(context.added_cookies) == 1
+    assert len(fresh.page.restored) == 1
+    assert len(context.init_scripts) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_restores_state_changed_since_the_save(browser_manager):
+    await browser_manager.save_session("user-1", "main")
+    await browser_manager.load_session("user-1", "main")
+    page = browser_manager.page
+
+    # The site logs out and rewrites its storage
+    page.context.state["cookies"] = []
+    page.context.local_storage("https://example.com")[0]["value"] = "t2"
+    page.session_items.clear()
+
+    assert await browser_manager.load_session("user-1", "main") == 1
+    assert page.context.added_cookies[-1] == COOKIES
+    assert page.context.state["cookies"] == COOKIES
+    token = page.context.local_storage("https://example.com")[0]
+    assert token == {"name": "token", "value": "t1"}
+    assert page.session_items == {"step": "2"}
+
+
+@pytest.mark.asyncio
+async def test_context_keeps_one_restore_script(browser_manager, tmp_path):
+    store = browser_manager._session_store
+    for profile, value in (("first", "1"), ("second", "2")):
+        await store.save(
+            "user-1",
+            profile,
+            SessionSnapshot(origins={"https://b.com": {"localStorage": {"x": value}}}),
+        )
+    await store.save(
+        "user-1",
+        "third",
+        SessionSnapshot(origins={"https://c.com": {"localStorage": {"y": "3"}}}),
+    )
+
+    for profile in ("first", "second", "third"):
+        await browser_manager.load_session("user-1", profile)
+
+    scripts = browser_manager.page.context.init_scripts
+    assert len(scripts) == 1
+    assert '"x": "2"' in scripts[0]
+    assert "https://c.com" in scripts[0]
+
+
+@pytest.mark.asyncio
+async def test_tasks_key_sessions_by_their_user(browser_manager, tmp_path):
+    await Tasks(browser_manager, None, user_id="user-1").save_session("main")
+    assert os.path.exists(tmp_path / "refs" / "user-1" / "main.json")
+
+    other = BrowserManager(session_store=SessionStore(str(tmp_path)))
+    other._page = FakePage()
+    with pytest.raises(Exception, match="No session saved"):
+        await Tasks(other, None, user_id="user-2").load_session("main")
+
+    # Chains written before the session store still pass a cookie file
+    path = str(tmp_path / "cookies.json")
+    with pytest.warns(DeprecationWarning):
+        await Tasks(browser_manager, None).save_session(path=path)
+    with pytest.warns(DeprecationWarning):
+        await Tasks(other, None).load_session(path=path)
+    assert other.page.context.added_cookies == [COOKIES]
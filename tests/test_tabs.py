@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.execute_task_chain import MergedResults, execute_task_chain
+from om11.task.tasks import Tasks
+
+PAGE_LOAD_SECONDS = 0.2
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+        self.max_open = 0
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        self.max_open = max(self.max_open, len(self.pages))
+        return page
+
+    async def add_init_script(self, script):
+        pass
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        await asyncio.sleep(PAGE_LOAD_SECONDS)
+        self.url = url
+
+    async def wait_for_selector(self, selector, timeout=None):
+        return True
+
+    async def evaluate(self, script, arg=None):
+        return None
+
+    async def inner_text(self, selector):
+        return f"{selector} of {self.url}"
+
+    async def close(self):
+        self.context.pages.remove(self)
+
+
+@pytest.fixture
+def tasks():
+    manager = BrowserManager(max_tabs=4)
+    context = FakeContext()
+    manager._page = FakePage(context)
+    context.pages.append(manager._page)
+    return Tasks(browser_manager=manager, captcha_service=None)
+
+
+@pytest.mark.asyncio
+async def test_run_in_tabs_runs_concurrently(tasks):
+    urls = [f"https://example.com/{i}" for i in range(4)]
+    chain = [{"action": "get_inner_text", "params": {"selector": "h1"}}]
+
+    started = time.monotonic()
+    results = await tasks.run_in_tabs(urls, chain)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < PAGE_LOAD_SECONDS * 2
+    assert isinstance(results, MergedResults)
+    assert (
+        results[0]
+        == "[tab 1: https://example.com/0] ✅ get_inner_text: h1 of https://example.com/0"
+    )
+    assert len(results) == 4
+    # Every tab page is closed again, only the main page is left
+    assert len(tasks.browser.page.context.pages) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_in_tabs_respects_max_tabs(tasks):
+    urls = [f"https://example.com/{i}" for i in range(6)]
+    await tasks.run_in_tabs(urls, [], max_tabs=2)
+    # Main page plus at most two tabs
+    assert tasks.browser.page.context.max_open == 3
+
+
+@pytest.mark.asyncio
+async def test_run_in_tabs_merges_into_parent_chain(tasks):
+    registry = {"run_in_tabs": tasks.run_in_tabs}
+    chain = [
+        {
+            "action": "run_in_tabs",
+            "params": {
+                "urls": ["https://a.com", "https://b.com"],
+                "chain": [{"action": "missing"}],
+            },
+        }
+    ]
+    results = await execute_task_chain(chain, registry)
+    assert results[0].startswith("✅ run_in_tabs: 2 tabs")
+    assert results[1].startswith("[tab 1: https://a.com] ❌ ")
+    assert results[2].startswith("[tab 2: https://b.com] ❌ ")
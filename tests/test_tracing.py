@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from om11.task.browser_manager import BrowserManager
+from om11.task.tracing import TraceStore
+
+
+class FakeTracing:
+    def __init__(self):
+        self.started = 0
+
+    async def start(self, **kwargs):
+        self.started += 1
+
+    async def stop(self, path=None):
+        with open(path, "wb") as f:
+            f.write(b"PK trace")
+
+
+class FakeContext:
+    def __init__(self):
+        self.tracing = FakeTracing()
+
+
+class FakePage:
+    def __init__(self):
+        self.context = FakeContext()
+
+
+def write_trace(store, job_id, size, mtime):
+    os.makedirs(store.base_dir, exist_ok=True)
+    path = store.path_for(job_id)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_job_ids_cannot_escape_the_store(tmp_path):
+    store = TraceStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.path_for("../../etc/passwd")
+    assert store.get("missing") is None
+
+
+def test_retention_by_age_count_and_size(tmp_path):
+    store = TraceStore(str(tmp_path), max_traces=3, max_age=100, max_bytes=250)
+    now = 10_000
+    write_trace(store, "expired", 10, now - 500)
+    for i in range(4):
+        write_trace(store, f"job{i}", 100 if i == 3 else 50, now - 40 + i)
+
+    assert store.enforce_retention(now) == 2
+    assert sorted(os.listdir(tmp_path)) == ["job1.zip", "job2.zip", "job3.zip"]
+
+    store.max_bytes = 150
+    assert store.enforce_retention(now) == 1
+    assert sorted(os.listdir(tmp_path)) == ["job2.zip", "job3.zip"]
+
+
+@pytest.mark.asyncio
+async def test_tracing_records_one_trace_per_context(tmp_path):
+    store = TraceStore(str(tmp_path / "traces"))
+    manager = BrowserManager()
+    manager._page = FakePage()
+
+    async with manager.tracing("job1", store) as traced:
+        assert traced
+        # A nested or concurrent command on the same context is not traced
+        async with manager.tracing("job2", store) as nested:
+            assert not nested
+
+    assert manager._page.context.tracing.started == 1
+    assert store.get("job1") is not None
+    assert store.get("job2") is None